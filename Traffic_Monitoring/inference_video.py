@@ -1,26 +1,34 @@
+import os
+import sys
+
 from ultralytics import YOLO
 import cv2
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pv_annotation.utils import iter_batches, run_pipeline
+
 model = YOLO("runs/detect/train/weights/best.pt")
 video_path = "test_resource/ambulance_driveby.mp4"
 cap = cv2.VideoCapture(video_path)
 
 fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-out = cv2.VideoWriter('test_resource/output.mp4', fourcc, cap.get(cv2.CAP_PROP_FPS), 
-                      (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), 
+out = cv2.VideoWriter('test_resource/output.mp4', fourcc, cap.get(cv2.CAP_PROP_FPS),
+                      (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
                        int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))))
 
-while cap.isOpened():
-    ret, frame = cap.read()
-    if not ret:
-        print("Done!")
-        break
 
-    results = model(frame, verbose=False)
+def infer(frames):
+    return model(frames, verbose=False)
+
+
+def write(frames, results):
+    for r in results:
+        out.write(r.plot())
 
-    annotated_frame = results[0].plot()
 
-    out.write(annotated_frame)
+# Decode and plot/encode run on their own threads, overlapping inference
+run_pipeline(iter_batches(cap, 4), infer, write)
+print("Done!")
 
 cap.release()
 out.release()
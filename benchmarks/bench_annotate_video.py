@@ -0,0 +1,86 @@
+"""
+Video annotation throughput (frames/s) for different predict() batch sizes,
+serial (decode → infer → encode in one loop) and pipelined (decode and encode
+on their own threads).
+
+Without --video, a drive-by clip is synthesised from
+Traffic_Monitoring/test_resource/test*.jpg: a 640x360 window pans across each
+photo for --frames-per-image frames.
+
+--weights defaults to the dashboard's model (custom best.pt, else yolov8n.pt).
+Offline, pass a model YAML such as yolov8n.yaml: untrained weights give no
+detections but the same inference cost.
+
+Usage:
+    python -m benchmarks.bench_annotate_video --batches 1 2 4 8 16
+    python -m benchmarks.bench_annotate_video --video clip.mp4 --weights yolov8n.yaml
+"""
+
+import argparse
+import glob
+import os
+import tempfile
+
+import cv2
+import numpy as np
+
+from pv_annotation import utils
+
+TEST_IMAGES = os.path.join("Traffic_Monitoring", "test_resource", "test[0-9].jpg")
+
+
+def make_clip(path: str, frames_per_image: int = 30, size=(640, 360), fps: float = 20.0,
+              images=None, hold: int = 0) -> str:
+    """Write a synthetic clip panning across the test images; ``hold`` adds that
+    many unchanged frames after each pan (a static camera between vehicles)."""
+    w, h = size
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, size)
+    for name in sorted(images or glob.glob(TEST_IMAGES)):
+        img = cv2.imread(name)
+        if img is None:
+            continue
+        scale = max(h / img.shape[0], 1.5 * w / img.shape[1])
+        img = cv2.resize(img, (int(img.shape[1] * scale) + 1, int(img.shape[0] * scale) + 1))
+        span = img.shape[1] - w
+        for x in np.linspace(0, span, frames_per_image).astype(int):
+            writer.write(np.ascontiguousarray(img[:h, x:x + w]))
+        for _ in range(hold):
+            writer.write(np.ascontiguousarray(img[:h, span:span + w]))
+    writer.release()
+    return path
+
+
+def load_model(weights=None):
+    if not weights:
+        return utils._load_model()
+    from ultralytics import YOLO
+    return YOLO(weights)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Video annotation frames/s per batch size")
+    parser.add_argument("--video", nargs="*", help="Clips to annotate (default: synthetic drive-by clip)")
+    parser.add_argument("--weights", default=None, help="Model weights or YAML (default: dashboard model)")
+    parser.add_argument("--batches", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--frames-per-image", type=int, default=30)
+    args = parser.parse_args()
+
+    model = load_model(args.weights)
+    with tempfile.TemporaryDirectory() as tmp:
+        videos = args.video or [make_clip(os.path.join(tmp, "driveby.mp4"), args.frames_per_image)]
+        out = os.path.join(tmp, "out", "annotated.mp4")
+        utils.annotate_video(videos[0], out, model=model, batch_size=1)  # warm-up
+        for video in videos:
+            print(os.path.basename(video))
+            base = None
+            for b in args.batches:
+                serial = utils.annotate_video(video, out, model=model, batch_size=b, pipelined=False)
+                piped = utils.annotate_video(video, out, model=model, batch_size=b)
+                base = base or serial["fps"]
+                print(f"  batch {b:>2}: {serial['frames']} frames, serial {serial['fps']:.1f} frames/s "
+                      f"({serial['fps'] / base:.2f}x), pipelined {piped['fps']:.1f} frames/s "
+                      f"({piped['fps'] / base:.2f}x, {piped['fps'] / serial['fps']:.2f}x over serial)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""
+Cost of one shared tick of the multi-intersection controller host.
+
+Usage:
+    python -m benchmarks.bench_controller_host --counts 1000 10000 100000
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from traffic_controller.host import IntersectionHost
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-intersection host tick benchmark")
+    parser.add_argument("--counts", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--ticks", type=int, default=200)
+    args = parser.parse_args()
+
+    for n in args.counts:
+        now = [0.0]
+        # Staggered offsets so a share of intersections changes phase every tick
+        host = IntersectionHost([f"I{i}" for i in range(n)], offsets=np.random.default_rng(0).uniform(0, 5, n),
+                                clock=lambda: now[0])
+        for i in range(0, n, 100):  # 1% of intersections hold priority
+            host.request(f"I{i}", "NS", None, vehicle_id="AMB001")
+        t0 = time.perf_counter()
+        for _ in range(args.ticks):
+            now[0] += 0.1
+            host.tick()
+        dt = time.perf_counter() - t0
+        print(f"{n:>7} intersections: {dt / args.ticks * 1000:.3f} ms/tick, "
+              f"{host.transitions / dt:,.0f} transitions/s, {n * args.ticks / dt:,.0f} intersection-updates/s")
+
+
+if __name__ == "__main__":
+    main()
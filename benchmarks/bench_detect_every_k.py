@@ -0,0 +1,102 @@
+"""
+Detect-every-K-frames with tracking in between: speedup and agreement with
+full-rate detection.
+
+For each K the clip's frames go through pv_annotation.utils.FrameDetector
+(decode and encode excluded, so the figures isolate detection cost). The
+per-frame boxes are compared with detect_every=1: recall and precision of
+boxes matched at IoU >= --match-iou, and the mean IoU of the matches.
+
+Agreement needs a trained model that actually detects vehicles in the clip;
+untrained weights (e.g. --weights yolov8n.yaml offline) still give the speedup.
+
+Usage:
+    python -m benchmarks.bench_detect_every_k --ks 1 2 4 8 --weights Traffic_Monitoring/best.pt
+    python -m benchmarks.bench_detect_every_k --video clip.mp4
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from benchmarks.bench_annotate_video import load_model, make_clip
+from pv_annotation import utils
+from pv_annotation.tracking import iou_matrix
+
+
+def read_frames(path: str) -> list:
+    cap = cv2.VideoCapture(path)
+    frames = []
+    while True:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def detect(model, frames: list, k: int, batch: int):
+    detector = utils.FrameDetector(model, k)
+    t0 = time.perf_counter()
+    out = []
+    for i in range(0, len(frames), batch):
+        out.extend(detector(frames[i:i + batch]))
+    return out, time.perf_counter() - t0, detector
+
+
+def agreement(reference: list, candidate: list, match_iou: float) -> dict:
+    matched = ref_total = cand_total = 0
+    ious = []
+    for (rb, rc, _), (cb, cc, _) in zip(reference, candidate):
+        ref_total += len(rb)
+        cand_total += len(cb)
+        iou = iou_matrix(rb, cb)
+        if iou.size:
+            iou[rc[:, None] != cc[None, :]] = 0.0
+            best = iou.max(axis=1)
+            hits = best[best >= match_iou]
+            matched += len(hits)
+            ious.extend(hits.tolist())
+    return {
+        "recall": matched / ref_total if ref_total else float("nan"),
+        "precision": matched / cand_total if cand_total else float("nan"),
+        "mean_iou": float(np.mean(ious)) if ious else float("nan"),
+        "reference_boxes": ref_total,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detect-every-K speedup and agreement with full-rate detection")
+    parser.add_argument("--video", default=None, help="Clip to use (default: synthetic drive-by clip)")
+    parser.add_argument("--weights", default=None, help="Model weights or YAML (default: dashboard model)")
+    parser.add_argument("--ks", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--batch", type=int, default=utils.VIDEO_BATCH)
+    parser.add_argument("--match-iou", type=float, default=0.5)
+    parser.add_argument("--frames-per-image", type=int, default=30)
+    args = parser.parse_args()
+
+    model = load_model(args.weights)
+    with tempfile.TemporaryDirectory() as tmp:
+        video = args.video or make_clip(os.path.join(tmp, "driveby.mp4"), args.frames_per_image)
+        frames = read_frames(video)
+    detect(model, frames[:args.batch], 1, args.batch)  # warm-up
+
+    reference, base_s, _ = detect(model, frames, 1, args.batch)
+    print(f"{len(frames)} frames, full-rate detection {len(frames) / base_s:.1f} frames/s")
+    for k in args.ks:
+        boxes, seconds, det = detect(model, frames, k, args.batch)
+        a = agreement(reference, boxes, args.match_iou)
+        print(f"  K={k:<2} model on {det.detected:>4}/{len(frames)} frames, {len(frames) / seconds:7.1f} frames/s "
+              f"({base_s / seconds:.2f}x) | recall {a['recall']:.3f} precision {a['precision']:.3f} "
+              f"mean IoU {a['mean_iou']:.3f}")
+    if not sum(len(b) for b, _, _ in reference):
+        print("No detections at full rate: pass trained --weights to measure agreement.")
+
+
+if __name__ == "__main__":
+    main()
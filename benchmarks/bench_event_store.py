@@ -0,0 +1,103 @@
+"""
+Sustained insert throughput of the SQLite event store with the server and
+controller processes writing to the same database at the same time.
+
+Usage:
+    python -m benchmarks.bench_event_store --events 50000 --batch 200
+"""
+
+import argparse
+import multiprocessing as mp
+import os
+import sqlite3
+import tempfile
+import time
+
+from results_logger import SQLiteEventStore
+
+
+def _server_writer(path, n, batch, start_evt, out):
+    store = SQLiteEventStore(path, batch_size=batch, flush_interval=0.5, source="server")
+    start_evt.wait()
+    t0 = time.perf_counter()
+    for i in range(n):
+        store.write("VEHICLE_DETECTION", {
+            "vehicle_id": "AMB001" if i % 2 else "FIRT001",
+            "lat": 12.9716, "lon": 77.5945, "speed": 40.0,
+            "distance_m": float(i % 300), "bearing": 0.0, "direction": "NS",
+            "priority_triggered": i % 300 < 120, "status": "normal",
+        })
+    store.close()
+    out.put(("server", n, time.perf_counter() - t0))
+
+
+def _controller_writer(path, n, batch, start_evt, out):
+    store = SQLiteEventStore(path, batch_size=batch, flush_interval=0.5, source="controller")
+    start_evt.wait()
+    t0 = time.perf_counter()
+    for i in range(n):
+        store.write("CONTROLLER_STATE_CHANGE", {"mode": "normal", "direction": "NS" if i % 2 else "EW"})
+    store.close()
+    out.put(("controller", n, time.perf_counter() - t0))
+
+
+def _reader(path, stop_evt, out):
+    conn = sqlite3.connect(path, timeout=30)
+    queries = 0
+    while not stop_evt.is_set():
+        conn.execute("SELECT COUNT(*) FROM events WHERE vehicle_id = ? AND ts > ?", ("AMB001", 0)).fetchone()
+        queries += 1
+    conn.close()
+    out.put(("reader", queries, 0.0))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLite event store throughput benchmark")
+    parser.add_argument("--events", type=int, default=50000, help="Events per writer process (default 50000)")
+    parser.add_argument("--batch", type=int, default=200, help="Inserts per transaction (default 200)")
+    parser.add_argument("--db", default=None, help="Database path (default: temporary file)")
+    args = parser.parse_args()
+
+    tmpdir = None
+    path = args.db
+    if path is None:
+        tmpdir = tempfile.mkdtemp()
+        path = os.path.join(tmpdir, "events.db")
+    # Create the schema once before the writers race to open it
+    SQLiteEventStore(path, flush_interval=0).close()
+
+    start_evt, stop_evt = mp.Event(), mp.Event()
+    out = mp.Queue()
+    writers = [
+        mp.Process(target=_server_writer, args=(path, args.events, args.batch, start_evt, out)),
+        mp.Process(target=_controller_writer, args=(path, args.events, args.batch, start_evt, out)),
+    ]
+    reader = mp.Process(target=_reader, args=(path, stop_evt, out))
+    for p in writers:
+        p.start()
+    reader.start()
+
+    t0 = time.perf_counter()
+    start_evt.set()
+    results = [out.get() for _ in writers]
+    wall = time.perf_counter() - t0
+    stop_evt.set()
+    results.append(out.get())
+    for p in writers + [reader]:
+        p.join()
+
+    conn = sqlite3.connect(path)
+    stored = conn.execute("SELECT COUNT(*) FROM events").fetchone()[0]
+    conn.close()
+
+    print(f"Database: {path} (batch={args.batch})")
+    for name, n, dt in results:
+        if name == "reader":
+            print(f"  reader      {n} indexed queries while writers ran")
+        else:
+            print(f"  {name:<11} {n} events in {dt:.2f}s -> {n / dt:,.0f} events/s")
+    print(f"Combined: {stored} rows in {wall:.2f}s -> {stored / wall:,.0f} events/s sustained")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+PyTorch (Ultralytics) vs ONNX Runtime FP32 vs ONNX Runtime INT8 on CPU.
+
+For each backend: model load time, single-image latency (median) and batched
+throughput on Traffic_Monitoring/test_resource/test*.jpg, plus accuracy:
+- mAP@0.5 on the test images, taking the PyTorch detections as ground truth
+  (the drop caused by export and quantization),
+- mAP@0.5 against the labels of --valid images from
+  Traffic_Monitoring/dataset/valid (meaningful for the custom best.pt, whose
+  classes match the dataset).
+
+ONNX files are exported (and INT8 calibrated on dataset/valid) into a
+temporary directory, so the run leaves nothing behind.
+
+Usage:
+    python -m benchmarks.bench_onnx_backend --weights Traffic_Monitoring/best.pt
+    python -m benchmarks.bench_onnx_backend --weights yolov8n.yaml --valid 0   # offline, timing only
+"""
+
+import argparse
+import glob
+import os
+import statistics
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from pv_annotation import utils
+from pv_annotation.onnx_backend import CALIB_DIR, load_onnx_model
+from pv_annotation.tracking import iou_matrix
+
+TEST_IMAGES = os.path.join("Traffic_Monitoring", "test_resource", "test[0-9].jpg")
+VALID_DIR = os.path.dirname(CALIB_DIR)
+
+
+def detections(model, images, conf):
+    return [utils._result_arrays(r) for img in images
+            for r in model.predict(source=img, imgsz=utils.IMGSZ, conf=conf, iou=utils.IOU, verbose=False)]
+
+
+def mean_ap(preds, truths, iou_thr=0.5) -> float:
+    """mAP@iou_thr over the classes present in truths (all-point interpolated AP)."""
+    classes = sorted({int(k) for _, cls in truths for k in cls})
+    aps = []
+    for c in classes:
+        scored, total = [], 0
+        for (pb, pc, ps), (tb, tc) in zip(preds, truths):
+            p, t = pc == c, tc == c
+            total += int(t.sum())
+            pb, ps, tb = pb[p], ps[p], tb[t]
+            order = np.argsort(-ps)
+            iou = iou_matrix(pb[order], tb)
+            used = np.zeros(len(tb), dtype=bool)
+            for k, i in enumerate(order):
+                hit = False
+                if iou.shape[1]:
+                    j = int(np.argmax(np.where(used, -1, iou[k])))
+                    if not used[j] and iou[k, j] >= iou_thr:
+                        used[j] = hit = True
+                scored.append((ps[i], hit))
+        if not total:
+            continue
+        scored.sort(key=lambda x: -x[0])
+        tp = np.cumsum([h for _, h in scored]) if scored else np.zeros(0)
+        recall = tp / total
+        precision = tp / np.arange(1, len(tp) + 1)
+        r = np.concatenate(([0.0], recall, [1.0]))
+        p = np.concatenate(([1.0], precision, [0.0]))
+        p = np.maximum.accumulate(p[::-1])[::-1]
+        aps.append(float(np.sum((r[1:] - r[:-1]) * p[1:])))
+    return float(np.mean(aps)) if aps else float("nan")
+
+
+def load_labels(image_path):
+    """YOLO txt labels for a dataset image -> (xyxy pixels, cls)."""
+    label = os.path.join(os.path.dirname(os.path.dirname(image_path)), "labels",
+                         os.path.splitext(os.path.basename(image_path))[0] + ".txt")
+    h, w = cv2.imread(image_path).shape[:2]
+    rows = np.loadtxt(label, ndmin=2) if os.path.exists(label) and os.path.getsize(label) else np.zeros((0, 5))
+    cx, cy, bw, bh = rows[:, 1] * w, rows[:, 2] * h, rows[:, 3] * w, rows[:, 4] * h
+    return np.column_stack((cx - bw / 2, cy - bh / 2, cx + bw / 2, cy + bh / 2)), rows[:, 0]
+
+
+def time_backend(model, images, repeats, batch):
+    for img in images[:2]:
+        model.predict(source=img, imgsz=utils.IMGSZ, conf=utils.CONF, iou=utils.IOU, verbose=False)  # warm-up
+    lat = []
+    for _ in range(repeats):
+        for img in images:
+            t0 = time.perf_counter()
+            model.predict(source=img, imgsz=utils.IMGSZ, conf=utils.CONF, iou=utils.IOU, verbose=False)
+            lat.append(time.perf_counter() - t0)
+    t0 = time.perf_counter()
+    n = 0
+    for _ in range(repeats):
+        for i in range(0, len(images), batch):
+            chunk = images[i:i + batch]
+            model.predict(source=chunk, imgsz=utils.IMGSZ, conf=utils.CONF, iou=utils.IOU, verbose=False)
+            n += len(chunk)
+    return statistics.median(lat) * 1000, n / (time.perf_counter() - t0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PyTorch vs ONNX Runtime (FP32/INT8) latency, throughput and mAP")
+    parser.add_argument("--weights", default=None, help="Ultralytics weights or YAML (default: dashboard model)")
+    parser.add_argument("--images", default=TEST_IMAGES, help=f"Benchmark images glob (default {TEST_IMAGES})")
+    parser.add_argument("--valid", type=int, default=50, help="Labelled dataset/valid images for mAP (0 = skip)")
+    parser.add_argument("--calib-images", type=int, default=100)
+    parser.add_argument("--batch", type=int, default=4)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    weights = args.weights or utils._find_custom_model() or "yolov8n.pt"
+    images = [cv2.imread(p) for p in sorted(glob.glob(args.images))]
+    valid = sorted(glob.glob(os.path.join(VALID_DIR, "images", "*.jpg")))[:args.valid]
+    valid_imgs = [cv2.imread(p) for p in valid]
+    valid_truth = [load_labels(p) for p in valid]
+    print(f"{weights}: {len(images)} test images, {len(valid)} labelled valid images, imgsz {utils.IMGSZ}\n")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        t0 = time.perf_counter()
+        torch_model = utils.load_backend(weights, "torch")
+        torch_load = time.perf_counter() - t0
+        # Export up front so load times below are session creation only
+        onnx_path = load_onnx_model(weights, out_dir=tmp).path
+        int8_path = load_onnx_model(weights, int8=True, out_dir=tmp, calib_images=args.calib_images).path
+        backends = [("torch", torch_model, torch_load, weights)]
+        for name, path in (("onnx", onnx_path), ("onnx-int8", int8_path)):
+            t0 = time.perf_counter()
+            model = load_onnx_model(path)
+            backends.append((name, model, time.perf_counter() - t0, path))
+
+        reference = detections(torch_model, images, utils.CONF)
+        print(f"{'backend':<10} {'load s':>7} {'latency ms':>11} {'img/s (b=' + str(args.batch) + ')':>12} "
+              f"{'mAP50 vs torch':>15} {'mAP50 valid':>12} {'size MB':>8}")
+        for name, model, load_s, path in backends:
+            latency_ms, throughput = time_backend(model, images, args.repeats, args.batch)
+            agreement = mean_ap(detections(model, images, 0.001), [(b, c) for b, c, _ in reference])
+            valid_map = mean_ap(detections(model, valid_imgs, 0.001), valid_truth) if valid else float("nan")
+            size = os.path.getsize(path) / 1e6 if os.path.exists(path) else float("nan")
+            print(f"{name:<10} {load_s:>7.2f} {latency_ms:>11.1f} {throughput:>12.1f} "
+                  f"{agreement:>15.3f} {valid_map:>12.3f} {size:>8.1f}")
+        if not sum(len(b) for b, _, _ in reference):
+            print("\nPyTorch found no boxes on the test images (untrained weights?): mAP vs torch is undefined.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Messages per trip vs trigger timing accuracy: fixed reporting intervals
+against the server's adaptive next_report_s.
+
+Each simulated trip approaches the intersection from 1-5 km out along the NS
+road, changes speed once on the way (30-90 km/h), crosses, and drives on
+until the hold is released. Every report goes through the server's own rules
+(server.utils.assess_fix / suggest_report_interval with server.config).
+
+Trigger lag = time from the vehicle crossing THRESHOLD_METERS to the first
+report that triggers priority (release lag likewise for the release).
+
+Usage:
+    python -m benchmarks.bench_report_rate --trips 500 --fixed 1 3 5 10
+"""
+
+import argparse
+import random
+
+import numpy as np
+
+from server import config
+from server.utils import assess_fix, suggest_report_interval
+
+M_PER_DEG_LAT = 111195.0
+
+
+def make_trip(rng: random.Random) -> dict:
+    return {
+        "d0": rng.uniform(1000, 5000),
+        "v0": rng.uniform(30, 90) / 3.6,
+        "v1": rng.uniform(30, 90) / 3.6,
+        "t_change": rng.uniform(0, 120),
+    }
+
+
+def position(trip: dict, t: float):
+    """Signed distance to the stop line (negative once past) and speed in m/s."""
+    if t < trip["t_change"]:
+        return trip["d0"] - trip["v0"] * t, trip["v0"]
+    return trip["d0"] - trip["v0"] * trip["t_change"] - trip["v1"] * (t - trip["t_change"]), trip["v1"]
+
+
+def crossing_time(trip: dict, s: float) -> float:
+    """When the vehicle is at signed distance s."""
+    at_change = trip["d0"] - trip["v0"] * trip["t_change"]
+    if s >= at_change:
+        return (trip["d0"] - s) / trip["v0"]
+    return trip["t_change"] + (at_change - s) / trip["v1"]
+
+
+def run_trip(trip: dict, interval, first_report: float) -> dict:
+    """interval: fixed seconds, or None for the server's next_report_s."""
+    lat0, lon0 = config.INTERSECTION["lat"], config.INTERSECTION["lon"]
+    release_m = getattr(config, "RELEASE_THRESHOLD_METERS", config.THRESHOLD_METERS + 40)
+    t, messages = first_report, 0
+    trigger_t = release_t = None
+    while release_t is None:
+        s, v = position(trip, t)
+        speed_kmh = v * 3.6
+        fix = assess_fix(lat0 - s / M_PER_DEG_LAT, lon0, speed_kmh, config.INTERSECTION,
+                         config.THRESHOLD_METERS, True, release_m)
+        messages += 1
+        if fix["action"] == "hold" and trigger_t is None:
+            trigger_t = t
+        elif fix["action"] == "release" and trigger_t is not None and s < 0:
+            release_t = t
+        if interval is None:
+            t += suggest_report_interval(fix["distance_m"], speed_kmh, config.THRESHOLD_METERS,
+                                         config.REPORT_INTERVAL_MIN_S, config.REPORT_INTERVAL_MAX_S,
+                                         config.REPORT_LEAD_FRACTION, config.REPORT_FLOOR_SPEED_KMH)
+        else:
+            t += interval
+    return {
+        "messages": messages,
+        "trigger_lag_s": trigger_t - crossing_time(trip, config.THRESHOLD_METERS),
+        "release_lag_s": release_t - crossing_time(trip, -release_m),
+    }
+
+
+def evaluate(trips, interval, seed: int) -> dict:
+    rng = random.Random(seed)
+    results = [run_trip(trip, interval, rng.uniform(0, interval or 3.0)) for trip in trips]
+    msgs = np.array([r["messages"] for r in results])
+    lag = np.array([r["trigger_lag_s"] for r in results])
+    rel = np.array([r["release_lag_s"] for r in results])
+    return {
+        "policy": "adaptive" if interval is None else f"fixed {interval:g}s",
+        "messages_per_trip": float(msgs.mean()),
+        "trigger_lag_mean_s": float(lag.mean()),
+        "trigger_lag_p95_s": float(np.percentile(lag, 95)),
+        "trigger_lag_max_s": float(lag.max()),
+        "release_lag_mean_s": float(rel.mean()),
+        "release_lag_max_s": float(rel.max()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fixed vs adaptive reporting: messages vs trigger accuracy")
+    parser.add_argument("--trips", type=int, default=500)
+    parser.add_argument("--fixed", type=float, nargs="+", default=[1, 3, 5, 10], help="Fixed intervals to compare")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    trips = [make_trip(rng) for _ in range(args.trips)]
+    print(f"{args.trips} trips, threshold {config.THRESHOLD_METERS} m\n")
+    print(f"{'policy':<12} {'msgs/trip':>10} {'trigger lag mean/p95/max (s)':>30} {'release lag mean/max (s)':>26}")
+    for interval in list(args.fixed) + [None]:
+        r = evaluate(trips, interval, args.seed)
+        print(f"{r['policy']:<12} {r['messages_per_trip']:>10.1f} "
+              f"{r['trigger_lag_mean_s']:>12.2f} {r['trigger_lag_p95_s']:>7.2f} {r['trigger_lag_max_s']:>7.2f}"
+              f"{r['release_lag_mean_s']:>17.2f} {r['release_lag_max_s']:>7.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+"""
+Simulated seconds per wall second of the virtual-time day simulation.
+
+Usage:
+    python -m benchmarks.bench_virtual_time --hours 24 168 --trips-per-hour 0 6 60
+"""
+
+import argparse
+
+from virtual_day import DaySimulation
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Virtual-time simulation throughput")
+    parser.add_argument("--hours", type=float, nargs="+", default=[24, 168])
+    parser.add_argument("--trips-per-hour", type=float, nargs="+", default=[0, 6, 60])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for hours in args.hours:
+        for rate in args.trips_per_hour:
+            s = DaySimulation(hours=hours, trips_per_hour=rate, seed=args.seed).run()
+            print(f"{hours:>5.0f} h, {rate:>4.0f} trips/h: {s['wall_s']:7.3f} s wall, "
+                  f"{s['sim_s_per_wall_s']:>10,.0f} simulated s/wall s, "
+                  f"{s['events'] / s['wall_s']:>9,.0f} events/s, {s['transitions']:,} transitions")
+
+
+if __name__ == "__main__":
+    main()
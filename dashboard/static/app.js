@@ -134,14 +134,28 @@ const SLOW_INTERVAL_MS = 4000; // slower updates so the trend progresses clearly
 let currentTimer = null;
 let lastDistances = { amb: Infinity, fir: Infinity };
 
+// Controller state arrives by long-poll: one pending /api/state?since=&wait=
+// request that the controller answers as soon as its state version changes
+let ctrlState = null;
+async function watchCtrlState() {
+	const version = ctrlState?.version ?? -1;
+	try {
+		ctrlState = await fetchJSON(`${CTRL}/api/state?since=${version}&wait=25`);
+	} catch (e) {
+		ctrlState = null;
+		await new Promise(r => setTimeout(r, NORMAL_INTERVAL_MS));
+	}
+	watchCtrlState();
+}
+
 async function adaptiveLoop() {
 	try {
         // Reuse refresh logic but also capture latest distances to decide next delay
-        const [ambEvent, firEvent, ctrlState] = await Promise.all([
+        const [ambEvent, firEvent] = await Promise.all([
             fetchJSON(`${SERVER}/api/last_event?id=${amb.vehicleId}`),
             fetchJSON(`${SERVER}/api/last_event?id=${fir.vehicleId}`),
-            fetchJSON(`${CTRL}/api/state`),
         ]);
+        if (!ctrlState) ctrlState = await fetchJSON(`${CTRL}/api/state`);
 
         function updatePanel(p, serverEvent) {
             el(`${p === amb ? 'amb' : 'fir'}-serverEvent`).textContent = JSON.stringify(serverEvent, null, 2);
@@ -208,5 +222,6 @@ async function adaptiveLoop() {
     }
 }
 
-// start the adaptive loop
+// start the controller watcher and the adaptive loop
+watchCtrlState();
 adaptiveLoop();
\ No newline at end of file
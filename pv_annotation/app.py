@@ -1,15 +1,32 @@
-from flask import Flask, render_template, request, redirect, url_for, send_from_directory
+from flask import Flask, Response, render_template, request, redirect, url_for, send_from_directory, jsonify
+import multiprocessing
 import os
+import sys
+import threading
+import time
+import uuid
 from werkzeug.utils import secure_filename
-from utils import annotate_image, annotate_video
-
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Repo root on the path so pv_annotation.* imports work for `python pv_annotation/app.py` too
+sys.path.append(os.path.dirname(BASE_DIR))
+from pv_annotation.jobs import DONE, JobManager
+from pv_annotation.result_cache import ResultCache
+from pv_annotation.stream import BOUNDARY, StreamBusy, StreamHub
+from pv_annotation.utils import annotate_image, annotate_video, annotation_params, get_registry
+
 UPLOAD_DIR = os.path.join(BASE_DIR, 'uploads')
 OUTPUT_DIR = os.path.join(BASE_DIR, 'outputs')
+# Annotated results keyed by upload content + model + parameters (PV_CACHE=0 disables)
+CACHE_DIR = os.getenv('PV_CACHE_DIR', os.path.join(BASE_DIR, 'cache'))
+CACHE_MB = float(os.getenv('PV_CACHE_MB', '1024'))
+# Video annotation worker processes (0 = half the cores)
+JOB_WORKERS = int(os.getenv('PV_JOB_WORKERS', '0'))
 
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 os.makedirs(OUTPUT_DIR, exist_ok=True)
+RESULT_CACHE = ResultCache(CACHE_DIR, int(CACHE_MB * 1024 * 1024)) if os.getenv('PV_CACHE', '1') != '0' else None
+STREAMS = StreamHub()
 
 
 ALLOWED_IMAGE_EXT = {'.jpg', '.jpeg', '.png', '.bmp'}
@@ -30,9 +47,120 @@ app = Flask(__name__)
 app.config['TEMPLATES_AUTO_RELOAD'] = True
 
 
+def _preload_models():
+    """Load and warm models in the background so the first upload does not pay for it.
+
+    PV_PRELOAD: "1" (default model, default), "all", a comma-separated list of names, or "0".
+    """
+    choice = os.getenv('PV_PRELOAD', '1').strip()
+    # Spawned job workers re-import this module as __mp_main__; they preload on their own
+    if choice == '0' or multiprocessing.parent_process() is not None:
+        return
+    registry = get_registry()
+    names = registry.names() if choice == 'all' else None if choice == '1' else choice.split(',')
+    try:
+        for entry in registry.preload(names):
+            print(f"Model {entry.name} ready: loaded in {entry.load_s:.2f}s, warmed in {entry.warm_s:.2f}s")
+    except Exception as e:
+        print("Model preload failed (models will load on first request):", e)
+
+
+threading.Thread(target=_preload_models, daemon=True).start()
+
+
+def _model_choices():
+    return get_registry().names()
+
+
 @app.route('/')
 def index():
-    return render_template('index.html', result=None)
+    return render_template('index.html', result=None, models=_model_choices())
+
+
+@app.route('/models')
+def models():
+    registry = get_registry()
+    return jsonify({
+        'default': registry.default,
+        'available': registry.names(),
+        'loaded': [e.info() for e in registry.entries()],
+        'loads': registry.loads,
+        'evictions': registry.evictions,
+    })
+
+
+_JOBS = None
+_jobs_lock = threading.Lock()
+
+
+def get_jobs() -> JobManager:
+    """The video job pool, started on first use."""
+    global _JOBS
+    with _jobs_lock:
+        if _JOBS is None:
+            _JOBS = JobManager(JOB_WORKERS or None, on_done=_job_done)
+        return _JOBS
+
+
+def _job_done(job):
+    # Store the finished video like a synchronous result, so re-uploads are served from cache
+    key = job.meta.get('cache_key')
+    if RESULT_CACHE is not None and key:
+        entry = RESULT_CACHE.put(key, job.out_path, job.stats['detections'], {'kind': 'video', 'source': job.filename})
+        # The cache holds its own copy (and is size-limited); outputs/ is not
+        os.remove(job.out_path)
+        job.result = {'folder': 'cache', 'output': entry['output'], 'detections': entry['detections']}
+    else:
+        job.result = {'folder': 'outputs', 'output': os.path.basename(job.out_path), 'detections': None}
+
+
+def _job_status(job) -> dict:
+    status = job.info()
+    status.update(status_url=url_for('job_status', job_id=job.id),
+                  result_url=url_for('job_result', job_id=job.id),
+                  cancel_url=url_for('job_cancel', job_id=job.id))
+    if job.status == DONE and job.result:
+        status['output_url'] = url_for('static_file', folder=job.result['folder'], filename=job.result['output'])
+        if job.result['detections']:
+            status['detections_url'] = url_for('static_file', folder=job.result['folder'],
+                                               filename=job.result['detections'])
+    return status
+
+
+def _cache_lookup(kind: str, in_path: str, model):
+    """(cache key, cached result or None); the key is None when caching is off."""
+    if RESULT_CACHE is None:
+        return None, None
+    key = RESULT_CACHE.key(in_path, annotation_params(model, kind))
+    entry = RESULT_CACHE.get(key)
+    if entry is None:
+        return key, None
+    return key, {
+        'output_url': url_for('static_file', folder='cache', filename=entry['output']),
+        'detections_url': url_for('static_file', folder='cache', filename=entry['detections']),
+        'cached': True,
+    }
+
+
+def _annotate_image(in_path: str, filename: str, model) -> dict:
+    """Annotate an uploaded image, or serve the cached result for the same content and settings."""
+    key, cached = _cache_lookup('image', in_path, model)
+    if cached is not None:
+        return cached
+    out_name = os.path.splitext(filename)[0] + '_annotated.png'
+    out_path = os.path.join(OUTPUT_DIR, out_name)
+    info = annotate_image(in_path, out_path, model=model)
+    if key is None:
+        return {'output_url': url_for('static_file', folder='outputs', filename=out_name), 'cached': False}
+    entry = RESULT_CACHE.put(key, out_path, info['detections'], {'kind': 'image', 'source': filename})
+    os.remove(out_path)
+    return {'output_url': url_for('static_file', folder='cache', filename=entry['output']),
+            'detections_url': url_for('static_file', folder='cache', filename=entry['detections']),
+            'cached': False}
+
+
+def _wants_json() -> bool:
+    return request.accept_mimetypes.best == 'application/json'
 
 
 @app.route('/analyze', methods=['POST'])
@@ -41,38 +169,113 @@ def analyze():
     if not file or file.filename.strip() == '':
         return redirect(url_for('index'))
 
+    model = request.form.get('model') or None
+    if model is not None and model not in _model_choices():
+        return redirect(url_for('index'))
+
     filename = secure_filename(file.filename)
+    if is_video(filename):
+        # Unique name: a video may still be processing in a job when the same name is uploaded again
+        stem, ext = os.path.splitext(filename)
+        filename = f"{stem}_{uuid.uuid4().hex[:8]}{ext}"
     in_path = os.path.join(UPLOAD_DIR, filename)
     file.save(in_path)
 
     if is_image(filename):
-        out_name = os.path.splitext(filename)[0] + '_annotated.png'
-        out_path = os.path.join(OUTPUT_DIR, out_name)
-        annotate_image(in_path, out_path)
-        result = {
-            'kind': 'image',
-            'input_url': url_for('static_file', folder='uploads', filename=filename),
-            'output_url': url_for('static_file', folder='outputs', filename=out_name)
-        }
+        result = dict(_annotate_image(in_path, filename, model), kind='image',
+                      input_url=url_for('static_file', folder='uploads', filename=filename))
     elif is_video(filename):
-        out_name = os.path.splitext(filename)[0] + '_annotated.mp4'
-        out_path = os.path.join(OUTPUT_DIR, out_name)
-        annotate_video(in_path, out_path)
-        from time import time
-        result = {
-            'kind': 'video',
-            'input_url': url_for('static_file', folder='uploads', filename=filename) + f"?t={int(time())}",
-            'output_url': url_for('static_file', folder='outputs', filename=out_name) + f"?t={int(time())}"
-        }
+        key, result = _cache_lookup('video', in_path, model)
+        if result is None:
+            # Annotate in the background; the page (or API client) polls the job
+            out_path = os.path.join(OUTPUT_DIR, os.path.splitext(filename)[0] + '_annotated.mp4')
+            job = get_jobs().submit(in_path, out_path, model=model, filename=filename, cache_key=key)
+            status = dict(_job_status(job), stream_url=url_for('stream', source=filename, model=model))
+            if _wants_json():
+                return jsonify(status), 202
+            return render_template('index.html', result=None, job=status, models=_model_choices())
+        # The cached result stands in for this upload, so don't keep a uniquely named duplicate
+        os.remove(in_path)
+        result.update(kind='video', output_url=result['output_url'] + f"?t={int(time.time())}")
     else:
         return redirect(url_for('index'))
 
-    return render_template('index.html', result=result)
+    if _wants_json():
+        return jsonify(result)
+    return render_template('index.html', result=result, models=_model_choices())
+
+
+@app.route('/jobs')
+def jobs():
+    return jsonify([_job_status(j) for j in get_jobs().jobs()])
+
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = get_jobs().get(job_id)
+    if job is None:
+        return jsonify({'error': 'unknown job'}), 404
+    return jsonify(_job_status(job))
+
+
+@app.route('/jobs/<job_id>/result')
+def job_result(job_id):
+    """The annotated video of a finished job (409 with the status while it is not done)."""
+    job = get_jobs().get(job_id)
+    if job is None:
+        return jsonify({'error': 'unknown job'}), 404
+    if job.status != DONE:
+        return jsonify(_job_status(job)), 409
+    root = CACHE_DIR if job.result['folder'] == 'cache' else OUTPUT_DIR
+    return send_from_directory(root, job.result['output'])
+
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def job_cancel(job_id):
+    jobs = get_jobs()
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'unknown job'}), 404
+    cancelled = jobs.cancel(job_id)
+    return jsonify(dict(_job_status(job), cancelled=cancelled))
+
+
+@app.route('/stream')
+def stream():
+    """Live annotated MJPEG of ?source=: a camera index or the name of an uploaded video.
+
+    Use as <img src="/stream?source=0">; frames are dropped when the viewer or the
+    model falls behind, so the picture stays current.
+    """
+    source = request.args.get('source', '0')
+    model = request.args.get('model') or None
+    if model is not None and model not in _model_choices():
+        return jsonify({'error': f'unknown model {model!r}'}), 400
+    # The default model by name, so "no model" and its explicit name share one stream
+    model = model or get_registry().default
+    if not source.isdigit():
+        # Files are limited to uploads so the endpoint cannot read arbitrary paths
+        source = os.path.join(UPLOAD_DIR, secure_filename(source))
+        if not os.path.isfile(source):
+            return jsonify({'error': 'unknown video'}), 404
+    try:
+        body = STREAMS.view(source, model)
+    except StreamBusy as e:
+        return jsonify({'error': str(e)}), 409
+    except RuntimeError as e:
+        return jsonify({'error': str(e)}), 404
+    return Response(body, mimetype=f'multipart/x-mixed-replace; boundary={BOUNDARY}',
+                    headers={'Cache-Control': 'no-cache'})
+
+
+@app.route('/streams')
+def streams():
+    return jsonify([s.stats() for s in STREAMS.streams()])
 
 
 @app.route('/files/<path:folder>/<path:filename>')
 def static_file(folder, filename):
-    root = UPLOAD_DIR if folder == 'uploads' else OUTPUT_DIR
+    root = {'uploads': UPLOAD_DIR, 'cache': CACHE_DIR}.get(folder, OUTPUT_DIR)
     return send_from_directory(root, filename)
 
 
@@ -0,0 +1,219 @@
+"""
+Background jobs for video annotation.
+
+/analyze submits a video to the JobManager and returns at once. Jobs run in a
+pool of worker processes (spawned, so each has its own model registry and
+loads a model once, not per job) and report per-batch progress back to the
+app through a queue; clients poll the job status and fetch the result when
+it is done. Several uploads therefore annotate in parallel on separate cores.
+
+Cancelling a queued job drops it before it starts; a running job stops at
+its next batch and its partial output is deleted.
+"""
+
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = 'queued', 'running', 'done', 'failed', 'cancelled'
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def default_workers() -> int:
+    """Half the cores (at least one): torch already uses several threads per process."""
+    return max(1, (os.cpu_count() or 1) // 2)
+
+
+def _init_worker(threads: int):
+    # Split the cores between the workers instead of every process claiming all of them
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    if os.getenv('PV_PRELOAD', '1') != '0':
+        try:
+            from pv_annotation.utils import get_registry
+            get_registry().preload()
+        except Exception as e:
+            print("Worker model preload failed (will load on first job):", e)
+
+
+def _run_video(job_id: str, in_path: str, out_path: str, model, events, cancel) -> dict:
+    """Worker side of a job: annotate_video with progress events and cancellation checks."""
+    from pv_annotation.utils import annotate_video
+
+    def progress(done, total):
+        if cancel.is_set():
+            raise JobCancelled(job_id)
+        events.put((job_id, done, total))
+
+    if cancel.is_set():
+        raise JobCancelled(job_id)
+    events.put((job_id, 0, 0))
+    return annotate_video(in_path, out_path, model=model, progress=progress)
+
+
+class Job:
+    def __init__(self, job_id: str, in_path: str, out_path: str, model, filename: str, meta: dict):
+        self.id = job_id
+        self.in_path = in_path
+        self.out_path = out_path
+        self.model = model
+        self.filename = filename
+        self.meta = meta          # caller data, e.g. the result cache key
+        self.status = QUEUED
+        self.frames_done = 0
+        self.frames_total = 0
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.error = None
+        self.stats = None         # annotate_video() return value once done
+        self.result = None        # set by the manager's on_done callback
+        self.future = None
+        self.cancel_event = None
+
+    @property
+    def active(self) -> bool:
+        return self.status in (QUEUED, RUNNING)
+
+    def info(self) -> dict:
+        progress = 1.0 if self.status == DONE else (
+            min(1.0, self.frames_done / self.frames_total) if self.frames_total else None)
+        end = self.finished or time.time()
+        info = {"id": self.id, "status": self.status, "filename": self.filename,
+                "model": self.model if isinstance(self.model, str) else None,
+                "frames_done": self.frames_done, "frames_total": self.frames_total, "progress": progress,
+                "elapsed_s": round(end - self.started, 2) if self.started else None, "error": self.error}
+        if self.stats:
+            info.update(frames=self.stats["frames"], seconds=round(self.stats["seconds"], 2),
+                        fps=round(self.stats["fps"], 1))
+        return info
+
+
+class JobManager:
+    def __init__(self, workers: Optional[int] = None, processes: bool = True,
+                 on_done: Optional[Callable[[Job], None]] = None, keep: int = 200):
+        """workers: pool size (default: half the cores); processes=False runs jobs on
+        threads instead; on_done(job) runs in the app process when a job succeeds;
+        keep: finished jobs remembered for status queries."""
+        self.workers = workers or default_workers()
+        self.on_done = on_done
+        self.keep = keep
+        if processes:
+            ctx = multiprocessing.get_context('spawn')
+            self._manager = ctx.Manager()
+            self._events = self._manager.Queue()
+            self._new_event = self._manager.Event
+            threads = max(1, (os.cpu_count() or 1) // self.workers)
+            self._pool = ProcessPoolExecutor(self.workers, mp_context=ctx, initializer=_init_worker,
+                                             initargs=(threads,))
+        else:
+            self._manager = None
+            self._events = queue.Queue()
+            self._new_event = threading.Event
+            self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix='pv-job')
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._listener = threading.Thread(target=self._listen, daemon=True)
+        self._listener.start()
+
+    def submit(self, in_path: str, out_path: str, model=None, filename: Optional[str] = None, **meta) -> Job:
+        job = Job(uuid.uuid4().hex[:12], in_path, out_path, model, filename or os.path.basename(in_path), meta)
+        job.cancel_event = self._new_event()
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        job.future = self._pool.submit(_run_video, job.id, in_path, out_path, model, self._events,
+                                       job.cancel_event)
+        job.future.add_done_callback(lambda f, job=job: self._finish(job, f))
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self) -> List[Job]:
+        """Known jobs, newest first."""
+        with self._lock:
+            return list(reversed(self._jobs.values()))
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a queued or running job; False if it is unknown or already finished."""
+        job = self.get(job_id)
+        if job is None or not job.active:
+            return False
+        job.cancel_event.set()
+        job.future.cancel()  # only succeeds while still queued; running jobs see the event
+        return True
+
+    def shutdown(self, wait: bool = True):
+        for job in self.jobs():
+            if job.active:
+                self.cancel(job.id)
+        self._pool.shutdown(wait=wait, cancel_futures=True)
+        self._events.put(None)
+        self._listener.join(timeout=5)
+        if self._manager is not None:
+            self._manager.shutdown()
+
+    def _listen(self):
+        while True:
+            try:
+                item = self._events.get()
+            except (EOFError, OSError):
+                return
+            if item is None:
+                return
+            job_id, done, total = item
+            with self._lock:
+                job = self._jobs.get(job_id)
+                # Late events from a finished job must not move it back to running
+                if job is None or not job.active:
+                    continue
+                if job.status == QUEUED:
+                    job.status, job.started = RUNNING, time.time()
+                job.frames_done, job.frames_total = done, total
+
+    def _finish(self, job: Job, future):
+        error = None if future.cancelled() else future.exception()
+        message = None
+        if future.cancelled() or isinstance(error, JobCancelled):
+            status = CANCELLED
+        elif error is not None:
+            status, message = FAILED, f"{type(error).__name__}: {error}"
+        else:
+            status = DONE
+            job.stats = future.result()
+            try:
+                # Outside the lock: storing results can be slow, and the job stays active until below
+                if self.on_done is not None:
+                    self.on_done(job)
+            except Exception as e:
+                status, message = FAILED, f"{type(e).__name__}: {e}"
+            # Per-frame boxes can be large; on_done has stored them if they are wanted
+            job.stats.pop("detections", None)
+        with self._lock:
+            # One atomic change with the listener's check, so progress can never follow it
+            if status == DONE:
+                job.frames_done = job.stats["frames"]
+            job.finished = time.time()
+            job.started = job.started or job.finished
+            job.status, job.error = status, message
+        if status != DONE and os.path.exists(job.out_path):
+            os.remove(job.out_path)
+
+    def _prune(self):
+        finished = [j.id for j in self._jobs.values() if not j.active]
+        for job_id in finished[:max(0, len(finished) - self.keep)]:
+            del self._jobs[job_id]
@@ -0,0 +1,239 @@
+"""
+ONNX Runtime CPU backend for the priority-vehicle detector.
+
+The Ultralytics weights are exported once to ONNX (dynamic batch, next to the
+.pt file) and optionally quantized to static INT8, calibrated on
+Traffic_Monitoring/dataset/valid. OnnxDetector runs the graph on the
+CPUExecutionProvider and does letterboxing, decoding and NMS in NumPy, so
+serving needs neither torch nor ultralytics.
+
+OnnxDetector.predict() mirrors the subset of the Ultralytics API that
+pv_annotation.utils uses (results with .boxes.xyxy/.cls/.conf), so it drops
+into annotate_image/annotate_video unchanged. Select it with
+PV_BACKEND=onnx or PV_BACKEND=onnx-int8.
+
+Usage:
+    python -m pv_annotation.onnx_backend --weights Traffic_Monitoring/best.pt --int8
+"""
+
+import argparse
+import ast
+import glob
+import os
+import re
+from typing import List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+CALIB_DIR = os.path.join('Traffic_Monitoring', 'dataset', 'valid', 'images')
+MAX_DET = 300
+
+
+def letterbox(img: np.ndarray, size: int) -> Tuple[np.ndarray, float, Tuple[int, int]]:
+    """Resize keeping aspect ratio and pad to size x size (grey 114, as in training)."""
+    h, w = img.shape[:2]
+    r = min(size / h, size / w)
+    nh, nw = round(h * r), round(w * r)
+    if (nh, nw) != (h, w):
+        img = cv2.resize(img, (nw, nh), interpolation=cv2.INTER_LINEAR)
+    top, left = (size - nh) // 2, (size - nw) // 2
+    canvas = np.full((size, size, 3), 114, dtype=np.uint8)
+    canvas[top:top + nh, left:left + nw] = img
+    return canvas, r, (left, top)
+
+
+def preprocess(frames: Sequence[np.ndarray], size: int):
+    """BGR frames -> (n, 3, size, size) float32 RGB blob in [0, 1], plus per-frame (scale, pad, shape)."""
+    blob = np.empty((len(frames), 3, size, size), dtype=np.float32)
+    metas = []
+    for i, frame in enumerate(frames):
+        canvas, r, pad = letterbox(frame, size)
+        blob[i] = canvas[..., ::-1].transpose(2, 0, 1)
+        metas.append((r, pad, frame.shape[:2]))
+    blob *= 1.0 / 255.0
+    return blob, metas
+
+
+def nms(boxes: np.ndarray, scores: np.ndarray, iou: float) -> np.ndarray:
+    """Greedy non-maximum suppression; returns kept indices, best score first."""
+    order = np.argsort(-scores)
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        xx1 = np.maximum(boxes[i, 0], boxes[rest, 0])
+        yy1 = np.maximum(boxes[i, 1], boxes[rest, 1])
+        xx2 = np.minimum(boxes[i, 2], boxes[rest, 2])
+        yy2 = np.minimum(boxes[i, 3], boxes[rest, 3])
+        inter = np.clip(xx2 - xx1, 0, None) * np.clip(yy2 - yy1, 0, None)
+        overlap = inter / np.maximum(areas[i] + areas[rest] - inter, 1e-9)
+        order = rest[overlap <= iou]
+    return np.asarray(keep, dtype=np.int64)
+
+
+def postprocess(output: np.ndarray, metas: list, conf: float, iou: float,
+                classes: Optional[Sequence[int]] = None, max_det: int = MAX_DET) -> List[tuple]:
+    """Decode YOLOv8 output (n, 4 + nc, anchors) into per-image (xyxy, cls, conf) in frame pixels."""
+    results = []
+    for pred, (r, (left, top), (h, w)) in zip(output, metas):
+        pred = pred.T
+        scores = pred[:, 4:]
+        cls = scores.argmax(axis=1)
+        score = scores[np.arange(len(cls)), cls]
+        keep = score > conf
+        if classes is not None:
+            # Like Ultralytics: filter on the best class, not the best allowed class
+            keep &= np.isin(cls, list(classes))
+        cxcywh, cls, score = pred[keep, :4], cls[keep], score[keep]
+        xyxy = np.concatenate((cxcywh[:, :2] - cxcywh[:, 2:] / 2, cxcywh[:, :2] + cxcywh[:, 2:] / 2), axis=1)
+        # Per-class NMS in one pass: offset each class into its own coordinate range
+        kept = nms(xyxy + cls[:, None] * 7680.0, score, iou)[:max_det]
+        xyxy, cls, score = xyxy[kept], cls[kept], score[kept]
+        xyxy = (xyxy - [left, top, left, top]) / r
+        xyxy[:, [0, 2]] = xyxy[:, [0, 2]].clip(0, w)
+        xyxy[:, [1, 3]] = xyxy[:, [1, 3]].clip(0, h)
+        results.append((xyxy.astype(np.float32), cls.astype(np.float32), score.astype(np.float32)))
+    return results
+
+
+class _Boxes:
+    def __init__(self, xyxy, cls, conf):
+        self.xyxy, self.cls, self.conf = xyxy, cls, conf
+
+    def __len__(self):
+        return len(self.xyxy)
+
+
+class _Result:
+    def __init__(self, xyxy, cls, conf):
+        self.boxes = _Boxes(xyxy, cls, conf)
+
+
+class OnnxDetector:
+    """YOLOv8 ONNX graph on an ONNX Runtime CPU session."""
+
+    def __init__(self, path: str, threads: Optional[int] = None):
+        import onnxruntime as ort
+        opts = ort.SessionOptions()
+        if threads:
+            opts.intra_op_num_threads = threads
+        self.path = path
+        self.session = ort.InferenceSession(path, opts, providers=['CPUExecutionProvider'])
+        meta = self.session.get_modelmeta().custom_metadata_map
+        self.names = ast.literal_eval(meta['names']) if 'names' in meta else {}
+        inp = self.session.get_inputs()[0]
+        self.input = inp.name
+        # Static exports only accept their own size; dynamic ones take any multiple of 32
+        self.fixed_size = inp.shape[2] if isinstance(inp.shape[2], int) else None
+        self.imgsz = self.fixed_size or ast.literal_eval(meta.get('imgsz', '[640, 640]'))[0]
+
+    def predict(self, source, imgsz: Optional[int] = None, conf: float = 0.25, iou: float = 0.45,
+                classes: Optional[Sequence[int]] = None, verbose: bool = False) -> list:
+        frames = source if isinstance(source, list) else [source]
+        size = self.fixed_size or imgsz or self.imgsz
+        blob, metas = preprocess(frames, size)
+        output = self.session.run(None, {self.input: blob})[0]
+        return [_Result(*d) for d in postprocess(output, metas, conf, iou, classes)]
+
+
+def export_onnx(weights: str, imgsz: int = 640, out_path: Optional[str] = None) -> str:
+    """Export Ultralytics weights to ONNX with a dynamic batch axis; returns the .onnx path."""
+    from ultralytics import YOLO
+    path = str(YOLO(weights).export(format='onnx', imgsz=imgsz, dynamic=True, simplify=True))
+    if out_path and os.path.abspath(out_path) != os.path.abspath(path):
+        os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+        os.replace(path, out_path)
+        path = out_path
+    return path
+
+
+def _head_nodes(model) -> List[str]:
+    """Detection-head nodes that stay in float: box decoding, DFL and concat (the head's Convs are quantized)."""
+    blocks = [int(m.group(1)) for m in (re.match(r'/model\.(\d+)/', n.name) for n in model.graph.node) if m]
+    if not blocks:
+        return []
+    head = f"/model.{max(blocks)}/"
+    return [n.name for n in model.graph.node
+            if n.name.startswith(head) and (n.op_type != 'Conv' or '/dfl/' in n.name)]
+
+
+def quantize_int8(onnx_path: str, out_path: Optional[str] = None, calib_dir: str = CALIB_DIR,
+                  imgsz: int = 640, max_images: int = 100) -> str:
+    """Static INT8 (QDQ, per-channel weights) calibrated on up to max_images images from calib_dir."""
+    import onnx
+    from onnxruntime.quantization import (CalibrationDataReader, CalibrationMethod, QuantFormat, QuantType,
+                                          quantize_static)
+
+    images = sorted(p for ext in ('jpg', 'jpeg', 'png') for p in glob.glob(os.path.join(calib_dir, f'*.{ext}')))
+    if not images:
+        raise RuntimeError(f"No calibration images in {calib_dir}")
+    images = images[:max_images]
+    model = onnx.load(onnx_path)
+    input_name = model.graph.input[0].name
+
+    class Reader(CalibrationDataReader):
+        def __init__(self):
+            self.paths = iter(images)
+
+        def get_next(self):
+            for p in self.paths:
+                img = cv2.imread(p)
+                if img is not None:
+                    return {input_name: preprocess([img], imgsz)[0]}
+            return None
+
+    out_path = out_path or os.path.splitext(onnx_path)[0] + '.int8.onnx'
+    quantize_static(onnx_path, out_path, Reader(), quant_format=QuantFormat.QDQ, per_channel=True,
+                    activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8,
+                    calibrate_method=CalibrationMethod.MinMax, nodes_to_exclude=_head_nodes(model))
+    # Keep class names and image size for OnnxDetector
+    quantized = onnx.load(out_path)
+    del quantized.metadata_props[:]
+    quantized.metadata_props.extend(model.metadata_props)
+    onnx.save(quantized, out_path)
+    return out_path
+
+
+def load_onnx_model(weights: str, int8: bool = False, imgsz: int = 640, out_dir: Optional[str] = None,
+                    threads: Optional[int] = None, calib_images: int = 100) -> OnnxDetector:
+    """OnnxDetector for Ultralytics weights, exporting/quantizing on first use.
+
+    Files go next to the weights (best.onnx, best.int8.onnx) or into out_dir.
+    Pass an .onnx file as weights to use it directly.
+    """
+    if weights.endswith('.onnx'):
+        return OnnxDetector(weights, threads)
+    base = os.path.splitext(weights)[0]
+    if out_dir:
+        base = os.path.join(out_dir, os.path.basename(base))
+    path = base + '.onnx'
+    if not os.path.exists(path):
+        export_onnx(weights, imgsz, path)
+    if int8:
+        qpath = base + '.int8.onnx'
+        if not os.path.exists(qpath):
+            quantize_int8(path, qpath, imgsz=imgsz, max_images=calib_images)
+        path = qpath
+    return OnnxDetector(path, threads)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the detector to ONNX (and INT8)")
+    parser.add_argument("--weights", required=True, help="Ultralytics weights (.pt) or model YAML")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--int8", action="store_true", help="Also write a static INT8 model")
+    parser.add_argument("--calib-dir", default=CALIB_DIR, help=f"Calibration images (default {CALIB_DIR})")
+    parser.add_argument("--calib-images", type=int, default=100)
+    args = parser.parse_args()
+
+    path = export_onnx(args.weights, args.imgsz, os.path.splitext(args.weights)[0] + '.onnx')
+    print("ONNX model:", path)
+    if args.int8:
+        print("INT8 model:", quantize_int8(path, None, args.calib_dir, args.imgsz, args.calib_images))
+
+
+if __name__ == "__main__":
+    main()
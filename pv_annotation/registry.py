@@ -0,0 +1,143 @@
+"""
+Model registry for the annotation dashboard.
+
+Models are registered by name (e.g. "custom" -> Traffic_Monitoring/best.pt,
+"yolov8n" -> yolov8n.pt), loaded on first use or preloaded at startup, and
+warmed with a dummy inference so the first real request does not pay for
+lazy initialisation. Each entry keeps the model's resolved class names and
+allowed (priority-vehicle) class IDs. Once the estimated memory of loaded
+models exceeds max_bytes, the least recently used ones are evicted.
+"""
+
+import gc
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional
+
+
+def model_bytes(model, weights: str) -> int:
+    """Estimated resident size: torch parameter bytes, else the model file size."""
+    net = getattr(model, 'model', None)
+    if net is not None and hasattr(net, 'parameters'):
+        try:
+            return sum(p.numel() * p.element_size() for p in net.parameters())
+        except Exception:
+            pass
+    path = getattr(model, 'path', weights)
+    return os.path.getsize(path) if isinstance(path, str) and os.path.exists(path) else 0
+
+
+class ModelEntry:
+    def __init__(self, name: str, weights: str, model, names: dict, allowed: list, size: int,
+                 load_s: float, warm_s: float):
+        self.name = name
+        self.weights = weights
+        self.model = model
+        self.names = names
+        self.allowed = allowed
+        self.size = size
+        self.load_s = load_s
+        self.warm_s = warm_s
+
+    def info(self) -> dict:
+        return {"name": self.name, "weights": self.weights, "size_mb": round(self.size / 1e6, 1),
+                "load_s": round(self.load_s, 3), "warm_s": round(self.warm_s, 3),
+                "allowed_classes": [self.names.get(c, str(c)) for c in self.allowed]}
+
+
+class ModelRegistry:
+    def __init__(self, specs: Dict[str, str], loader: Callable, describe: Callable,
+                 warm: Optional[Callable] = None, max_bytes: int = 512 * 1024 * 1024,
+                 default: Optional[str] = None):
+        """specs: name -> weights; loader(weights) -> model; describe(model) -> (names, allowed);
+        warm(model) runs one dummy inference."""
+        self.specs = dict(specs)
+        self.loader = loader
+        self.describe = describe
+        self.warm = warm
+        self.max_bytes = max_bytes
+        self.default = default or next(iter(self.specs), None)
+        self._loaded: "OrderedDict[str, ModelEntry]" = OrderedDict()
+        self._loading: Dict[str, Future] = {}  # name -> in-flight load, so a model loads once
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.evictions = 0
+
+    def names(self) -> List[str]:
+        return list(self.specs)
+
+    def loaded(self) -> List[str]:
+        """Loaded model names, least recently used first."""
+        with self._lock:
+            return list(self._loaded)
+
+    def entries(self) -> List[ModelEntry]:
+        """Loaded entries without touching their LRU order."""
+        with self._lock:
+            return list(self._loaded.values())
+
+    def get(self, name: Optional[str] = None) -> ModelEntry:
+        name = name or self.default
+        if name not in self.specs:
+            raise KeyError(f"Unknown model {name!r} (available: {', '.join(self.specs)})")
+        with self._lock:
+            entry = self._loaded.get(name)
+            if entry is not None:
+                self._loaded.move_to_end(name)
+                return entry
+            pending = self._loading.get(name)
+            loading = pending is None
+            if loading:
+                pending = self._loading[name] = Future()
+        if not loading:
+            # Another request is loading this model: share its result (or its error)
+            return pending.result()
+        # Load and warm outside the lock so requests for loaded models are not held up
+        try:
+            entry = self._load(name)
+        except BaseException as e:
+            with self._lock:
+                del self._loading[name]
+            pending.set_exception(e)
+            raise
+        with self._lock:
+            self._loaded[name] = entry
+            del self._loading[name]
+            self.loads += 1
+            self._evict(keep=name)
+        pending.set_result(entry)
+        return entry
+
+    def preload(self, names: Optional[List[str]] = None) -> List[ModelEntry]:
+        """Load and warm models ahead of the first request (default: the default model)."""
+        return [self.get(n) for n in (names or [self.default])]
+
+    def _load(self, name: str) -> ModelEntry:
+        weights = self.specs[name]
+        t0 = time.perf_counter()
+        model = self.loader(weights)
+        load_s = time.perf_counter() - t0
+        names, allowed = self.describe(model)
+        t0 = time.perf_counter()
+        if self.warm:
+            self.warm(model)
+        return ModelEntry(name, weights, model, names, allowed, model_bytes(model, weights),
+                          load_s, time.perf_counter() - t0)
+
+    def _evict(self, keep: str):
+        total = sum(e.size for e in self._loaded.values())
+        evicted = False
+        for name in list(self._loaded):
+            if total <= self.max_bytes:
+                break
+            if name == keep:
+                continue
+            total -= self._loaded.pop(name).size
+            self.evictions += 1
+            evicted = True
+            print(f"Model registry: evicted {name} (LRU, {total / 1e6:.0f} MB of {self.max_bytes / 1e6:.0f} MB in use)")
+        if evicted:
+            gc.collect()
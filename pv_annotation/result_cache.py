@@ -0,0 +1,108 @@
+"""
+On-disk cache of annotation results.
+
+An entry is keyed by the SHA-256 of the uploaded file's content plus
+everything that affects the output (model weights and backend, imgsz, conf,
+iou, video settings), so re-uploading the same file with the same settings
+serves the stored annotated file and detection JSON without inference.
+
+Layout: <root>/<key>/<output file> + detections.json + meta.json. The
+meta.json mtime is the last use; once the cache exceeds max_bytes the least
+recently used entries are deleted.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from typing import Optional
+
+
+def file_sha256(path: str, chunk: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+class ResultCache:
+    def __init__(self, root: str, max_bytes: int = 1024 * 1024 * 1024):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(root, exist_ok=True)
+
+    @staticmethod
+    def key(path: str, params: dict) -> str:
+        """Content hash of the file combined with the annotation parameters."""
+        material = file_sha256(path) + json.dumps(params, sort_keys=True, default=str)
+        return hashlib.sha256(material.encode()).hexdigest()[:32]
+
+    def _dir(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def get(self, key: str) -> Optional[dict]:
+        """The cached entry ({"output", "detections", ...}, paths relative to root) or None."""
+        meta_path = os.path.join(self._dir(key), 'meta.json')
+        try:
+            with open(meta_path, encoding='utf-8') as f:
+                meta = json.load(f)
+            if not os.path.exists(os.path.join(self.root, meta['output'])):
+                raise FileNotFoundError(meta['output'])
+            os.utime(meta_path)  # mark as recently used
+        except (OSError, ValueError, KeyError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return meta
+
+    def put(self, key: str, output_path: str, detections, info: Optional[dict] = None) -> dict:
+        """Store a copy of output_path and the detections; returns the entry like get()."""
+        entry_dir = self._dir(key)
+        tmp_dir = f"{entry_dir}.{os.getpid()}.{threading.get_ident()}.tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        name = os.path.basename(output_path)
+        shutil.copy2(output_path, os.path.join(tmp_dir, name))
+        with open(os.path.join(tmp_dir, 'detections.json'), 'w', encoding='utf-8') as f:
+            json.dump(detections, f)
+        meta = dict(info or {}, key=key, output=f"{key}/{name}", detections=f"{key}/detections.json",
+                    created=time.time())
+        with open(os.path.join(tmp_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        with self._lock:
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            os.replace(tmp_dir, entry_dir)
+            self._evict(keep=key)
+        return meta
+
+    def entries(self) -> list:
+        """(last_used, size_bytes, key) for every complete entry, oldest first."""
+        out = []
+        for key in os.listdir(self.root):
+            entry_dir = self._dir(key)
+            meta_path = os.path.join(entry_dir, 'meta.json')
+            if key.endswith('.tmp') or not os.path.exists(meta_path):
+                continue
+            size = sum(os.path.getsize(os.path.join(entry_dir, n)) for n in os.listdir(entry_dir))
+            out.append((os.path.getmtime(meta_path), size, key))
+        return sorted(out)
+
+    def size(self) -> int:
+        return sum(size for _, size, _ in self.entries())
+
+    def _evict(self, keep: str):
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, key in entries:
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            shutil.rmtree(self._dir(key), ignore_errors=True)
+            total -= size
@@ -0,0 +1,249 @@
+"""
+Live annotated MJPEG stream.
+
+A capture thread reads the source (a video file, paced to its frame rate, or
+a local camera) and keeps only the newest frame; an annotation thread
+detects and draws on whatever frame is newest and JPEG-encodes it; every
+viewer is sent the newest JPEG whenever its connection is ready for one.
+Each hand-off holds a single value, so when inference or a viewer is slower
+than the source the intermediate frames are dropped and viewers always see
+the latest frame instead of falling further and further behind.
+
+Viewers of the same source and model share one stream, which stops when the
+last of them disconnects. A camera is opened by one stream at a time.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+import cv2
+
+from pv_annotation.motion import MotionGate
+from pv_annotation.utils import DETECT_EVERY, MOTION_GATE, FrameDetector, _class_table, _draw_boxes, _resolve_model
+
+BOUNDARY = 'frame'
+JPEG_QUALITY = int(os.getenv('PV_STREAM_QUALITY', '80'))
+# A viewer's response ends when no new frame arrives for this long (stalled camera)
+IDLE_TIMEOUT = 10.0
+
+
+class Latest:
+    """Single-slot hand-off: put() replaces the value, get() waits for one newer than the caller has seen."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._seq = 0
+        self._value = None
+        self.closed = False
+
+    def put(self, value):
+        with self._cond:
+            self._seq += 1
+            self._value = value
+            self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    def get(self, after: int = 0, timeout: Optional[float] = None) -> Tuple[int, object]:
+        """(seq, value) for the newest value after seq `after`; (after, None) on timeout or once closed."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq > after or self.closed, timeout)
+            if self._seq > after:
+                return self._seq, self._value
+            return after, None
+
+
+def open_source(source):
+    """VideoCapture for a camera index (0, "0") or a video file path."""
+    cap = cv2.VideoCapture(int(source) if str(source).isdigit() else source)
+    if not cap.isOpened():
+        raise RuntimeError(f"Could not open video source: {source}")
+    return cap
+
+
+class AnnotatedStream:
+    def __init__(self, source, model=None, detect_every: Optional[int] = None,
+                 motion_gate: Optional[bool] = None, quality: int = JPEG_QUALITY,
+                 realtime: Optional[bool] = None):
+        """realtime: pace reading to the source frame rate (default: for files; cameras pace themselves)."""
+        self.source = source
+        self.cap = open_source(source)
+        fps = self.cap.get(cv2.CAP_PROP_FPS)
+        self.fps = fps if fps and fps > 1 else 20.0
+        self.realtime = not str(source).isdigit() if realtime is None else realtime
+        self.quality = quality
+        model = _resolve_model(model)
+        self.classes = _class_table(model)
+        gate = MotionGate() if (MOTION_GATE if motion_gate is None else motion_gate) else None
+        self.detector = FrameDetector(model, detect_every or DETECT_EVERY, gate=gate)
+        self.frames = Latest()
+        self.jpegs = Latest()
+        self.captured = 0
+        self.annotated = 0
+        self.dropped = 0      # captured frames never annotated because a newer one was ready
+        self.viewers = 0
+        self.error = None
+        self._stop = threading.Event()
+        self._threads = [threading.Thread(target=self._capture, daemon=True),
+                         threading.Thread(target=self._annotate, daemon=True)]
+
+    @property
+    def finished(self) -> bool:
+        return self.jpegs.closed
+
+    def start(self) -> "AnnotatedStream":
+        for t in self._threads:
+            t.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self) -> dict:
+        return {"source": str(self.source), "captured": self.captured, "annotated": self.annotated,
+                "dropped": self.dropped, "viewers": self.viewers, **self.detector.stats()}
+
+    def _capture(self):
+        t0 = time.perf_counter()
+        try:
+            while not self._stop.is_set():
+                ok, frame = self.cap.read()
+                if not ok:
+                    break
+                self.captured += 1
+                if self.realtime:
+                    self._stop.wait(max(0.0, t0 + self.captured / self.fps - time.perf_counter()))
+                self.frames.put(frame)
+        finally:
+            self.cap.release()
+            self.frames.close()
+
+    def _annotate(self):
+        seq = 0
+        try:
+            while not self._stop.is_set():
+                newest, frame = self.frames.get(seq)
+                if frame is None:
+                    break
+                self.dropped += newest - seq - 1
+                seq = newest
+                _draw_boxes(frame, *self.detector([frame])[0], self.classes)
+                ok, buf = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+                if ok:
+                    self.annotated += 1
+                    self.jpegs.put(buf.tobytes())
+        except Exception as e:
+            self.error = e
+            print(f"Stream {self.source} stopped:", e)
+        finally:
+            self.stop()
+            self.jpegs.close()
+
+    def mjpeg(self, timeout: float = IDLE_TIMEOUT) -> Iterator[bytes]:
+        """multipart/x-mixed-replace body parts: the newest JPEG each time the viewer takes one."""
+        seq = 0
+        while True:
+            seq, jpeg = self.jpegs.get(seq, timeout)
+            if jpeg is None:
+                return
+            yield (b'--' + BOUNDARY.encode() + b'\r\nContent-Type: image/jpeg\r\nContent-Length: '
+                   + str(len(jpeg)).encode() + b'\r\n\r\n' + jpeg + b'\r\n')
+
+
+class StreamBusy(RuntimeError):
+    """The camera is already streaming with another model (a device is opened only once)."""
+
+
+class StreamHub:
+    """One AnnotatedStream per (source, model), shared by its viewers and stopped after the last one leaves."""
+
+    def __init__(self, factory: Callable[..., AnnotatedStream] = AnnotatedStream):
+        self.factory = factory
+        self._streams: Dict[tuple, AnnotatedStream] = {}
+        self._opening: Dict[tuple, Future] = {}  # key -> in-flight open, so a source opens once
+        self._lock = threading.Lock()
+
+    def streams(self) -> list:
+        with self._lock:
+            return list(self._streams.values())
+
+    def view(self, source, model=None) -> Iterator[bytes]:
+        """MJPEG body for a new viewer.
+
+        Raises RuntimeError if the source cannot be opened, StreamBusy if it is
+        a camera already streaming with a different model.
+        """
+        key = (str(source), model)
+        while True:
+            with self._lock:
+                stream = self._streams.get(key)
+                if stream is not None and not stream.finished:
+                    stream.viewers += 1
+                    return _Viewer(self, key, stream)
+                pending = self._opening.get(key)
+                opening = pending is None
+                if opening:
+                    self._check_camera_locked(key)
+                    pending = self._opening[key] = Future()
+            if opening:
+                break
+            # Another viewer is opening this stream: wait for it, then join (or retry if it already ended)
+            pending.result()
+        # Open the capture and load the model outside the lock: it can take seconds
+        try:
+            stream = self.factory(source, model).start()
+        except BaseException as e:
+            with self._lock:
+                del self._opening[key]
+            pending.set_exception(e)
+            raise
+        with self._lock:
+            del self._opening[key]
+            self._streams[key] = stream
+            stream.viewers += 1
+        pending.set_result(stream)
+        return _Viewer(self, key, stream)
+
+    def _check_camera_locked(self, key: tuple):
+        source, model = key
+        if not source.isdigit():
+            return
+        for other in list(self._opening) + [k for k, s in self._streams.items() if not s.finished]:
+            if other[0] == source and other != key:
+                raise StreamBusy(f"Camera {source} is already streaming with model {other[1]!r}; "
+                                 f"view it with that model or wait until it stops")
+
+    def _leave(self, key, stream: AnnotatedStream):
+        with self._lock:
+            stream.viewers -= 1
+            if stream.viewers == 0:
+                stream.stop()
+                if self._streams.get(key) is stream:
+                    del self._streams[key]
+
+
+class _Viewer:
+    """Response body of one viewer. The WSGI server calls close() when the client goes away
+    (even before the first part was sent), which releases the viewer's share of the stream."""
+
+    def __init__(self, hub: StreamHub, key: tuple, stream: AnnotatedStream):
+        self._hub, self._key, self._stream = hub, key, stream
+        self._parts = stream.mjpeg()
+        self._closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> bytes:
+        return next(self._parts)
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._hub._leave(self._key, self._stream)
@@ -0,0 +1,91 @@
+"""
+Lightweight box tracker for propagating detections between detector runs.
+
+Tracks are associated with new detections by IoU against their predicted
+position (greedy, same class) and move at constant velocity between
+detections: the velocity is the shift of the box since its previous
+detection divided by the frames in between. Each predicted frame multiplies
+a track's confidence by ``decay`` so callers can re-run the detector once
+the tracks are no longer trustworthy; tracks that fall below ``drop_below``
+(the detector's confidence threshold) are dropped rather than shown stale.
+"""
+
+from typing import Tuple
+
+import numpy as np
+
+
+def iou_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU of (n, 4) and (m, 4) xyxy boxes."""
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)))
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+
+class BoxTracker:
+    def __init__(self, iou_threshold: float = 0.3, decay: float = 0.95, drop_below: float = 0.0):
+        self.iou_threshold = iou_threshold
+        self.decay = decay
+        self.drop_below = drop_below
+        self.boxes = np.empty((0, 4))
+        self.velocity = np.empty((0, 4))
+        self.cls = np.empty(0)
+        self.conf = np.empty(0)
+        self._anchor = np.empty((0, 4))  # box at the last detection
+        self._since = np.empty(0)        # frames since the last detection
+
+    def __len__(self):
+        return len(self.boxes)
+
+    @property
+    def min_conf(self) -> float:
+        """Lowest track confidence (1.0 with no tracks)."""
+        return float(self.conf.min()) if len(self.conf) else 1.0
+
+    def update(self, xyxy: np.ndarray, cls: np.ndarray, conf: np.ndarray):
+        """Replace the tracks with the next frame's detections; matched boxes get a velocity.
+
+        Unmatched tracks are dropped: the detector is the source of truth.
+        """
+        xyxy = np.asarray(xyxy, dtype=np.float64).reshape(-1, 4)
+        cls = np.asarray(cls, dtype=np.float64).reshape(-1)
+        velocity = np.zeros_like(xyxy)
+        # Compare against where each track would be on this frame
+        iou = iou_matrix(self.boxes + self.velocity, xyxy)
+        if iou.size:
+            iou[self.cls[:, None] != cls[None, :]] = 0.0
+            # Greedy: best-overlapping pairs first, each track and detection used once
+            used_t, used_d = set(), set()
+            for t, d in zip(*np.unravel_index(np.argsort(-iou, axis=None), iou.shape)):
+                if iou[t, d] < self.iou_threshold:
+                    break
+                if t in used_t or d in used_d:
+                    continue
+                velocity[d] = (xyxy[d] - self._anchor[t]) / (self._since[t] + 1)
+                used_t.add(t)
+                used_d.add(d)
+        self.boxes = xyxy.copy()
+        self.velocity = velocity
+        self.cls = cls
+        self.conf = np.asarray(conf, dtype=np.float64).reshape(-1).copy()
+        self._anchor = xyxy.copy()
+        self._since = np.zeros(len(xyxy))
+
+    def predict(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Advance every track one frame, dropping those below drop_below; returns (xyxy, cls, conf)."""
+        self.boxes = self.boxes + self.velocity
+        self.conf = self.conf * self.decay
+        self._since = self._since + 1
+        keep = self.conf >= self.drop_below
+        if not keep.all():
+            self.boxes, self.velocity, self.cls, self.conf = (self.boxes[keep], self.velocity[keep],
+                                                              self.cls[keep], self.conf[keep])
+            self._anchor, self._since = self._anchor[keep], self._since[keep]
+        return self.boxes.copy(), self.cls.copy(), self.conf.copy()
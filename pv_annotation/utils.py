@@ -1,8 +1,35 @@
 import os
+import queue
+import threading
+import time
+import weakref
 import cv2
-from typing import Optional
+import numpy as np
+from typing import Callable, Iterable, List, Optional, Tuple
 
-_MODEL = None
+from pv_annotation.motion import MotionGate
+from pv_annotation.registry import ModelRegistry
+from pv_annotation.tracking import BoxTracker
+
+# Inference settings shared by image and video annotation
+IMGSZ = 640
+CONF = 0.6
+IOU = 0.45
+MIN_BOX_FRACTION = 0.005  # drop boxes smaller than 0.5% of the frame (likely false positives)
+# Frames per model.predict() call for videos; amortises per-call overhead on CPU
+VIDEO_BATCH = int(os.getenv("PV_VIDEO_BATCH", "4"))
+# Batches queued between the decode, inference and encode stages (bounds memory)
+PIPELINE_DEPTH = int(os.getenv("PV_PIPELINE_DEPTH", "2"))
+# Run the detector every K video frames and track boxes in between (1 = every frame)
+DETECT_EVERY = int(os.getenv("PV_DETECT_EVERY", "1"))
+TRACK_DECAY = 0.95   # tracked confidence multiplier per frame without detection
+REDETECT_CONF = 0.4  # detect early once any tracked box falls below this confidence
+# Skip the model on frames with no motion since the last detection (fixed cameras)
+MOTION_GATE = os.getenv("PV_MOTION_GATE", "0").lower() in ("1", "true", "yes")
+# "torch" (Ultralytics), or ONNX Runtime on CPU: "onnx" / "onnx-int8" (see onnx_backend.py)
+BACKEND = os.getenv("PV_BACKEND", "torch").lower()
+# Loaded models are evicted least-recently-used above this estimated size
+MODEL_CACHE_MB = float(os.getenv("PV_MODEL_CACHE_MB", "512"))
 
 
 def _find_custom_model() -> Optional[str]:
@@ -18,19 +45,74 @@ def _find_custom_model() -> Optional[str]:
     return None
 
 
-def _load_model():
-    global _MODEL
-    if _MODEL is not None:
-        return _MODEL
+def load_backend(weights: str, backend: str = BACKEND):
+    """Model object for weights on the given backend; all expose the predict() used here."""
+    if backend in ('onnx', 'onnx-int8'):
+        try:
+            from pv_annotation.onnx_backend import load_onnx_model
+            return load_onnx_model(weights, int8=backend == 'onnx-int8', imgsz=IMGSZ)
+        except ImportError as e:
+            raise RuntimeError("ONNX Runtime not installed. Please install 'onnxruntime' (and 'onnx' to export).") from e
+    if backend != 'torch':
+        raise ValueError(f"Unknown backend {backend!r} (expected torch, onnx or onnx-int8)")
     try:
         from ultralytics import YOLO
     except Exception as e:
         raise RuntimeError("Ultralytics not installed. Please install 'ultralytics'.") from e
+    return YOLO(weights)
+
 
+def _model_specs() -> dict:
+    """Registered models: the custom best.pt (if trained) and the yolov8n.pt fallback."""
+    specs = {}
     custom = _find_custom_model()
-    weights = custom if custom else 'yolov8n.pt'
-    _MODEL = YOLO(weights)
-    return _MODEL
+    if custom:
+        specs['custom'] = custom
+    specs['yolov8n'] = 'yolov8n.pt'
+    return specs
+
+
+def _warm_up(model):
+    # One dummy inference initialises the backend (threads, kernels, allocations)
+    model.predict(source=np.zeros((IMGSZ, IMGSZ, 3), dtype=np.uint8), imgsz=IMGSZ, conf=CONF, iou=IOU, verbose=False)
+
+
+_REGISTRY = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> ModelRegistry:
+    global _REGISTRY
+    with _registry_lock:
+        if _REGISTRY is None:
+            _REGISTRY = ModelRegistry(_model_specs(), load_backend, _model_classes, warm=_warm_up,
+                                      max_bytes=int(MODEL_CACHE_MB * 1024 * 1024))
+        return _REGISTRY
+
+
+def _load_model(name: Optional[str] = None):
+    return get_registry().get(name).model
+
+
+def _resolve_model(model):
+    """A model object, a registered model name, or None for the default model."""
+    return _load_model(model) if model is None or isinstance(model, str) else model
+
+
+def annotation_params(model_name: Optional[str], kind: str) -> dict:
+    """Everything that changes the annotated output of a registered model (used as a cache key)."""
+    registry = get_registry()
+    name = model_name or registry.default
+    weights = registry.specs.get(name, name)
+    stamp = None
+    if os.path.exists(weights):
+        st = os.stat(weights)
+        stamp = [st.st_size, int(st.st_mtime)]
+    params = {"model": name, "weights": weights, "weights_stamp": stamp, "backend": BACKEND,
+              "imgsz": IMGSZ, "conf": CONF, "iou": IOU, "min_box": MIN_BOX_FRACTION, "kind": kind}
+    if kind == "video":
+        params.update(detect_every=DETECT_EVERY, motion_gate=MOTION_GATE)
+    return params
 
 
 def _is_priority_vehicle(name: str) -> bool:
@@ -46,21 +128,53 @@ def _is_priority_vehicle(name: str) -> bool:
     return any(k in n for k in keywords)
 
 
-def _allowed_class_ids(model) -> list:
-    """Return class ids from the model whose names match priority vehicle keywords."""
-    names = None
+def _model_names(model) -> dict:
+    """Class id -> name for an Ultralytics model (names can be a dict or a list)."""
     if hasattr(model, 'model') and hasattr(model.model, 'names'):
         names = model.model.names
     else:
         names = getattr(model, 'names', None)
     if not names:
-        return []
-    allowed = []
-    # names can be dict {id: name}
-    for cid, cname in (names.items() if isinstance(names, dict) else enumerate(names)):
-        if _is_priority_vehicle(str(cname)):
-            allowed.append(int(cid))
-    return allowed
+        return {}
+    return dict(names) if isinstance(names, dict) else dict(enumerate(names))
+
+
+class _ClassTable:
+    """A model's class names plus a boolean priority-vehicle mask indexed by class id."""
+
+    def __init__(self, names: dict):
+        self.names = names
+        allowed = [int(cid) for cid, cname in names.items() if _is_priority_vehicle(str(cname))]
+        self.classes = (names, allowed)
+        self.mask = np.zeros(max((int(cid) for cid in names), default=-1) + 1, dtype=bool)
+        self.mask[allowed] = True
+
+
+_classes_cache = weakref.WeakKeyDictionary()
+
+
+def _class_table(model) -> _ClassTable:
+    """Class lookup for a model, computed once per model object."""
+    try:
+        return _classes_cache[model]
+    except (KeyError, TypeError):
+        pass
+    table = _ClassTable(_model_names(model))
+    try:
+        _classes_cache[model] = table
+    except TypeError:
+        pass  # not weak-referenceable: recompute next time
+    return table
+
+
+def _model_classes(model) -> Tuple[dict, list]:
+    """(names, allowed class ids) for a model."""
+    return _class_table(model).classes
+
+
+def _allowed_class_ids(model) -> list:
+    """Return class ids from the model whose names match priority vehicle keywords."""
+    return _class_table(model).classes[1]
 
 
 def _draw_labelled_box(img, x1, y1, x2, y2, label='Detected Vehicle', color=(0, 255, 0)):
@@ -82,86 +196,315 @@ def _draw_labelled_box(img, x1, y1, x2, y2, label='Detected Vehicle', color=(0,
     cv2.putText(img, label, (x1 + 5, y1 - 6), font, font_scale, (255, 255, 255), thickness, cv2.LINE_AA)
 
 
-def annotate_image(input_path: str, output_path: str) -> None:
+def _to_numpy(x) -> np.ndarray:
+    return x.cpu().numpy() if hasattr(x, 'cpu') else np.asarray(x)
+
+
+def _result_arrays(res) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """xyxy (n, 4), cls (n,) and conf (n,) arrays of one Ultralytics result."""
+    boxes = res.boxes
+    if boxes is None or len(boxes) == 0:
+        return np.empty((0, 4)), np.empty(0), np.empty(0)
+    n = len(boxes)
+    cls = _to_numpy(boxes.cls).reshape(-1) if boxes.cls is not None else np.full(n, -1.0)
+    conf = _to_numpy(boxes.conf).reshape(-1) if boxes.conf is not None else np.zeros(n)
+    return _to_numpy(boxes.xyxy).reshape(-1, 4), cls, conf
+
+
+def _select_boxes(xyxy, cls, conf, mask: np.ndarray, shape) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Priority-vehicle boxes covering at least MIN_BOX_FRACTION of the frame.
+
+    Vectorized over all detections; returns int xyxy, int class ids and conf
+    of the survivors.
+    """
+    h, w = shape[:2]
+    boxes = xyxy.astype(np.int64).reshape(-1, 4)
+    ids = cls.astype(np.int64).reshape(-1)
+    keep = (ids >= 0) & (ids < len(mask))
+    keep[keep] = mask[ids[keep]]
+    # Filter tiny boxes (likely false positives)
+    wh = np.clip(boxes[:, 2:] - boxes[:, :2], 0, None)
+    keep &= wh[:, 0] * wh[:, 1] >= MIN_BOX_FRACTION * (w * h)
+    return boxes[keep], ids[keep], np.asarray(conf).reshape(-1)[keep]
+
+
+def _draw_boxes(img, xyxy, cls, conf, classes: _ClassTable) -> list:
+    """Draw the priority-vehicle boxes onto img; returns them as [{"label", "conf", "box"}]."""
+    boxes, ids, scores = _select_boxes(xyxy, cls, conf, classes.mask, img.shape)
+    drawn = []
+    for (x1, y1, x2, y2), cls_id, score in zip(boxes.tolist(), ids.tolist(), scores.tolist()):
+        cls_name = classes.names[cls_id]
+        _draw_labelled_box(img, x1, y1, x2, y2, f"{cls_name} {score:.2f}")
+        drawn.append({"label": cls_name, "conf": round(score, 4), "box": [x1, y1, x2, y2]})
+    return drawn
+
+
+def _draw_detections(img, res, classes: _ClassTable) -> list:
+    return _draw_boxes(img, *_result_arrays(res), classes)
+
+
+def annotate_image(input_path: str, output_path: str, model=None) -> dict:
+    """Annotate one image; returns {"detections": [...]} for the drawn boxes."""
     img = cv2.imread(input_path)
     if img is None:
         raise RuntimeError(f"Could not read image: {input_path}")
-    model = _load_model()
-    allowed = _allowed_class_ids(model)
-    res = model.predict(source=img, imgsz=640, conf=0.6, iou=0.45, classes=allowed if allowed else None, verbose=False)[0]
-    # Draw detections
-    if res.boxes is not None and len(res.boxes) > 0:
-        names = model.model.names if hasattr(model, 'model') else getattr(model, 'names', {})
-        for b in res.boxes:
-            xyxy = b.xyxy[0].tolist()
-            x1, y1, x2, y2 = map(int, xyxy)
-            cls_id = int(b.cls.item()) if b.cls is not None else -1
-            conf = float(b.conf.item()) if b.conf is not None else 0.0
-            cls_name = names.get(cls_id, str(cls_id))
-            if not _is_priority_vehicle(cls_name):
-                continue
-            # Filter tiny boxes (likely false positives)
-            h, w = img.shape[:2]
-            box_area = max(0, (x2 - x1)) * max(0, (y2 - y1))
-            if box_area < 0.005 * (w * h):  # <0.5% of image area
-                continue
-            label = f"{cls_name} {conf:.2f}"
-            _draw_labelled_box(img, x1, y1, x2, y2, label)
+    model = _resolve_model(model)
+    classes = _class_table(model)
+    allowed = classes.classes[1]
+    res = model.predict(source=img, imgsz=IMGSZ, conf=CONF, iou=IOU, classes=allowed if allowed else None, verbose=False)[0]
+    detections = _draw_detections(img, res, classes)
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
     cv2.imwrite(output_path, img)
+    return {"detections": detections}
 
 
-def annotate_video(input_path: str, output_path: str) -> None:
-    cap = cv2.VideoCapture(input_path)
-    if not cap.isOpened():
-        raise RuntimeError(f"Could not open video: {input_path}")
+_DONE = object()
+
+
+def _put(q: queue.Queue, item, stop: threading.Event) -> bool:
+    """Blocking put that gives up once another stage has failed."""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def _get(q: queue.Queue, stop: threading.Event):
+    while not stop.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            pass
+    return _DONE
+
+
+def run_pipeline(items: Iterable, infer: Callable, consume: Callable, depth: Optional[int] = None,
+                 threaded: bool = True) -> None:
+    """Run consume(item, infer(item)) for every item, in order.
+
+    With threaded=True, iterating items (decode) and consume (draw + encode) run
+    on their own threads while infer runs on the caller's thread; bounded FIFO
+    queues of ``depth`` items keep memory flat and preserve order. The first
+    error in any stage stops the others and is re-raised here.
+    """
+    if not threaded:
+        for item in items:
+            consume(item, infer(item))
+        return
+
+    depth = max(1, depth or PIPELINE_DEPTH)
+    inq, outq = queue.Queue(depth), queue.Queue(depth)
+    stop = threading.Event()
+    errors = []
+
+    def fail(e):
+        errors.append(e)
+        stop.set()
 
+    def decode():
+        try:
+            for item in items:
+                if not _put(inq, item, stop):
+                    return
+            _put(inq, _DONE, stop)
+        except BaseException as e:
+            fail(e)
+
+    def encode():
+        try:
+            while True:
+                item = _get(outq, stop)
+                if item is _DONE:
+                    return
+                consume(*item)
+        except BaseException as e:
+            fail(e)
+
+    threads = [threading.Thread(target=decode, daemon=True), threading.Thread(target=encode, daemon=True)]
+    for t in threads:
+        t.start()
+    try:
+        while True:
+            item = _get(inq, stop)
+            if item is _DONE:
+                break
+            if not _put(outq, (item, infer(item)), stop):
+                break
+        _put(outq, _DONE, stop)
+    except BaseException as e:
+        fail(e)
+    finally:
+        for t in threads:
+            t.join()
+    if errors:
+        raise errors[0]
+
+
+def iter_batches(cap, batch_size: int):
+    """Yield lists of up to batch_size frames from a cv2.VideoCapture."""
+    while True:
+        batch = []
+        while len(batch) < batch_size:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            batch.append(frame)
+        if batch:
+            yield batch
+        if len(batch) < batch_size:
+            return
+
+
+def _open_writer(output_path: str, fps: float, size):
     # Write H.264/MP4 for better browser compatibility
     # If H.264 is unavailable in your OpenCV build, fallback to MP4V
-    fourcc = cv2.VideoWriter_fourcc(*'avc1')  # H.264
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    out = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*'avc1'), fps, size)
+    if not out.isOpened():
+        out = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, size)
+    return out
+
+
+class FrameDetector:
+    """Per-frame detections for a sequence of frame batches.
+
+    With detect_every=1 every frame goes through the model (one predict() per
+    batch). With detect_every=K the model only sees every K-th frame, or an
+    earlier one once a tracked box's confidence decays below redetect_conf;
+    in between, boxes are propagated by a constant-velocity BoxTracker.
+    A MotionGate, if given, vetoes model runs on frames where nothing moved
+    and the previous detections are reused. Call it with consecutive
+    batches, in order.
+    """
+
+    def __init__(self, model, detect_every: int = 1, redetect_conf: float = REDETECT_CONF,
+                 decay: float = TRACK_DECAY, gate: Optional[MotionGate] = None):
+        self.model = model
+        self.detect_every = max(1, detect_every)
+        self.redetect_conf = redetect_conf
+        # Tracked boxes are held to the same confidence threshold as detections
+        self.tracker = BoxTracker(decay=decay, drop_below=CONF)
+        self.gate = gate
+        # The class filter depends only on the model: compute it once, not per frame
+        self.allowed = _model_classes(model)[1] or None
+        self.frames = 0
+        self.detected = 0      # frames that went through the model
+        self.predict_calls = 0
+        self.model_seconds = 0.0
+        self._last = (np.empty((0, 4)), np.empty(0), np.empty(0))
+
+    def _predict(self, frames: list) -> list:
+        t0 = time.perf_counter()
+        self.predict_calls += 1
+        self.detected += len(frames)
+        results = self.model.predict(source=frames, imgsz=IMGSZ, conf=CONF, iou=IOU, classes=self.allowed, verbose=False)
+        out = [_result_arrays(r) for r in results]
+        self.model_seconds += time.perf_counter() - t0
+        return out
+
+    def _wants_model(self, frame) -> bool:
+        return self.gate is None or self.gate.moved(frame)
+
+    def __call__(self, batch: list) -> List[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        tracking = self.detect_every > 1
+        start = self.frames
+        # Scheduled frames that pass the gate share one predict() call
+        keyframes = [i for i in range(len(batch)) if (start + i) % self.detect_every == 0]
+        due = [i for i in keyframes if self._wants_model(batch[i])]
+        detected = dict(zip(due, self._predict([batch[i] for i in due]))) if due else {}
+        out = []
+        for i, frame in enumerate(batch):
+            det = detected.get(i)
+            if det is None and i not in keyframes and tracking and len(self.tracker) \
+                    and self.tracker.min_conf * self.tracker.decay < self.redetect_conf:
+                if self._wants_model(frame):
+                    det = self._predict([frame])[0]
+                else:
+                    out.append(self._last)  # static scene: keep the boxes where they are
+                    self.frames += 1
+                    continue
+            if det is not None:
+                if tracking:
+                    self.tracker.update(*det)
+                self._last = det
+            elif i in keyframes:
+                det = self._last  # gated keyframe: nothing moved, reuse the previous detections
+            else:
+                det = self._last = self.tracker.predict()
+            out.append(det)
+            self.frames += 1
+        return out
+
+    def stats(self) -> dict:
+        """Model and motion-gate counters; saved_s estimates the model time the gate avoided."""
+        skipped = self.gate.skipped if self.gate else 0
+        per_frame = self.model_seconds / self.detected if self.detected else 0.0
+        gate_s = self.gate.seconds if self.gate else 0.0
+        return {
+            "detected_frames": self.detected,
+            "model_seconds": self.model_seconds,
+            "gate_checked": self.gate.checked if self.gate else 0,
+            "gate_skipped": skipped,
+            "gate_hit_rate": self.gate.hit_rate if self.gate else 0.0,
+            "gate_seconds": gate_s,
+            "saved_s": skipped * per_frame - gate_s,
+        }
+
+
+def annotate_video(input_path: str, output_path: str, model=None, batch_size: Optional[int] = None,
+                   pipelined: bool = True, detect_every: Optional[int] = None,
+                   motion_gate: Optional[bool] = None,
+                   progress: Optional[Callable[[int, int], None]] = None) -> dict:
+    """Annotate a video, running one predict() call per batch_size frames.
+
+    Decoding and drawing/encoding overlap with inference (see run_pipeline)
+    unless pipelined=False; detect_every > 1 tracks boxes between detector
+    runs and motion_gate skips static frames (see FrameDetector). After each
+    written batch progress(frames_done, frames_total) is called (total is 0
+    when the container does not say); an exception raised there aborts the
+    run. Returns {"frames", "seconds", "fps"}, FrameDetector.stats() and
+    "detections": the drawn boxes of every frame that has any.
+    """
+    batch_size = max(1, batch_size or VIDEO_BATCH)
+    cap = cv2.VideoCapture(input_path)
+    if not cap.isOpened():
+        raise RuntimeError(f"Could not open video: {input_path}")
     fps = cap.get(cv2.CAP_PROP_FPS)
     if not fps or fps <= 1:
         fps = 20.0
     w = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
     h = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    out = cv2.VideoWriter(output_path, fourcc, fps, (w, h))
-    if not out.isOpened():
-        # fallback to mp4v if avc1 not available
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        out = cv2.VideoWriter(output_path, fourcc, fps, (w, h))
+    total = max(0, int(cap.get(cv2.CAP_PROP_FRAME_COUNT)))
+    out = _open_writer(output_path, fps, (w, h))
 
-    model = _load_model()
-    names = model.model.names if hasattr(model, 'model') else getattr(model, 'names', {})
-    frame_idx = 0
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-        allowed = _allowed_class_ids(model)
-        res = model.predict(source=frame, imgsz=640, conf=0.6, iou=0.45, classes=allowed if allowed else None, verbose=False)[0]
-        if res.boxes is not None and len(res.boxes) > 0:
-            for b in res.boxes:
-                xyxy = b.xyxy[0].tolist()
-                x1, y1, x2, y2 = map(int, xyxy)
-                cls_id = int(b.cls.item()) if b.cls is not None else -1
-                conf = float(b.conf.item()) if b.conf is not None else 0.0
-                cls_name = names.get(cls_id, str(cls_id))
-                if not _is_priority_vehicle(cls_name):
-                    continue
-                # Filter tiny boxes
-                box_area = max(0, (x2 - x1)) * max(0, (y2 - y1))
-                if box_area < 0.005 * (w * h):
-                    continue
-                label = f"{cls_name} {conf:.2f}"
-                _draw_labelled_box(frame, x1, y1, x2, y2, label)
-        out.write(frame)
-        frame_idx += 1
+    model = _resolve_model(model)
+    classes = _class_table(model)
+    gate = MotionGate() if (MOTION_GATE if motion_gate is None else motion_gate) else None
+    detector = FrameDetector(model, detect_every or DETECT_EVERY, gate=gate)
 
-    out.release()
-    cap.release()
-
-    cap.release()
-    out.release()
+    frame_boxes = []
+    index = [0]
 
+    def write(batch, detections):
+        for frame, det in zip(batch, detections):
+            drawn = _draw_boxes(frame, *det, classes)
+            if drawn:
+                frame_boxes.append({"frame": index[0], "boxes": drawn})
+            index[0] += 1
+            out.write(frame)
+        if progress is not None:
+            progress(index[0], total)
 
+    t0 = time.perf_counter()
+    try:
+        run_pipeline(iter_batches(cap, batch_size), detector, write, threaded=pipelined)
+    finally:
+        out.release()
+        cap.release()
+    seconds = time.perf_counter() - t0
+    return {"frames": detector.frames, "seconds": seconds,
+            "fps": detector.frames / seconds if seconds > 0 else 0.0, **detector.stats(),
+            "detections": frame_boxes}
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Streaming analytics over session CSVs (results_*.csv)
+
+Reads each file in fixed-size row chunks so memory stays bounded no matter
+how large the logs are, and spreads files over worker processes.
+
+Usage:
+    python results_analytics.py results/*.csv
+    python results_analytics.py results/ --workers 8 --chunk-rows 50000 --json
+"""
+
+import argparse
+import csv
+import glob
+import json
+import os
+import time
+from datetime import datetime
+from multiprocessing import Pool
+from typing import Dict, Iterator, List, Optional
+
+# Distance-at-trigger histogram: 10 m bins up to 300 m, plus an overflow bin
+DIST_BIN_M = 10
+DIST_BINS = 30
+# Consecutive fixes further apart than this are treated as separate approaches
+MAX_GAP_S = 30.0
+
+
+def iter_chunks(path: str, chunk_rows: int = 10000) -> Iterator[List[dict]]:
+    """Yield lists of at most chunk_rows rows (as dicts) from a session CSV."""
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        chunk = []
+        for row in reader:
+            chunk.append(row)
+            if len(chunk) >= chunk_rows:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+class SessionStats:
+    """Mergeable aggregates; only per-vehicle and per-direction state is kept."""
+
+    def __init__(self):
+        self.rows = 0
+        self.events: Dict[str, int] = {}
+        self.vehicles: Dict[str, dict] = {}
+        self.trigger_hist = [0] * (DIST_BINS + 1)
+        self.trigger_count = 0
+        self.trigger_sum = 0.0
+        self.trigger_min: Optional[float] = None
+        self.trigger_max: Optional[float] = None
+        self.dwell: Dict[str, float] = {}
+        self.dwell_count: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        self.first_ts: Optional[float] = None
+        self.last_ts: Optional[float] = None
+        # Streaming state carried across chunks of one file
+        self._ctrl_key: Optional[str] = None
+        self._ctrl_ts: Optional[float] = None
+        self._ts_text = None
+        self._ts_value = 0.0
+        self._day_cache: Dict[str, float] = {}
+
+    def _parse_ts(self, text: str) -> Optional[float]:
+        # strptime on every row dominates the run time; parse each date once
+        # and add the time of day arithmetically ('YYYY-MM-DD HH:MM:SS')
+        if text == self._ts_text:
+            return self._ts_value
+        try:
+            day = self._day_cache.get(text[:10])
+            if day is None:
+                day = self._day_cache[text[:10]] = datetime.strptime(text[:10], '%Y-%m-%d').timestamp()
+            value = day + int(text[11:13]) * 3600 + int(text[14:16]) * 60 + int(text[17:19])
+        except (TypeError, ValueError):
+            return None
+        self._ts_text, self._ts_value = text, value
+        return value
+
+    def _vehicle(self, vid: str) -> dict:
+        v = self.vehicles.get(vid)
+        if v is None:
+            v = self.vehicles[vid] = {
+                'fixes': 0, 'approaches': 0, 'priority_s': 0.0,
+                '_in_priority': False, '_ts': None,
+            }
+        return v
+
+    def _record_trigger(self, dist: float):
+        self.trigger_count += 1
+        self.trigger_sum += dist
+        self.trigger_min = dist if self.trigger_min is None else min(self.trigger_min, dist)
+        self.trigger_max = dist if self.trigger_max is None else max(self.trigger_max, dist)
+        self.trigger_hist[min(DIST_BINS, int(dist // DIST_BIN_M))] += 1
+
+    def _close_dwell(self, ts: float):
+        if self._ctrl_key is not None and self._ctrl_ts is not None:
+            self.dwell[self._ctrl_key] = self.dwell.get(self._ctrl_key, 0.0) + max(0.0, ts - self._ctrl_ts)
+            self.dwell_count[self._ctrl_key] = self.dwell_count.get(self._ctrl_key, 0) + 1
+
+    def _controller_change(self, ts: float, mode: str, direction: str):
+        key = f"{mode} {direction}"
+        if key == self._ctrl_key:
+            return
+        self._close_dwell(ts)
+        self._ctrl_key, self._ctrl_ts = key, ts
+
+    def update(self, chunk: List[dict]):
+        for row in chunk:
+            ts = self._parse_ts(row.get('timestamp'))
+            if ts is None:
+                continue
+            self.rows += 1
+            # min/max: backfilled rows carry their original, earlier timestamps
+            self.first_ts = ts if self.first_ts is None else min(self.first_ts, ts)
+            self.last_ts = ts if self.last_ts is None else max(self.last_ts, ts)
+            etype = row.get('event_type') or 'UNKNOWN'
+            self.events[etype] = self.events.get(etype, 0) + 1
+
+            if etype == 'VEHICLE_DETECTION':
+                v = self._vehicle(row.get('vehicle_id') or 'UNKNOWN')
+                v['fixes'] += 1
+                if row.get('server_status') == 'backfill':
+                    # History uploaded after the fact: logged after the live rows with
+                    # older timestamps and never triggers priority, so it must not
+                    # enter the per-vehicle time ordering
+                    continue
+                in_priority = row.get('priority_triggered') == 'True'
+                prev_ts = v['_ts']
+                continuing = prev_ts is not None and ts - prev_ts <= MAX_GAP_S
+                if v['_in_priority'] and continuing:
+                    v['priority_s'] += ts - prev_ts
+                if in_priority and not (v['_in_priority'] and continuing):
+                    v['approaches'] += 1
+                    try:
+                        self._record_trigger(float(row.get('distance_m') or 0))
+                    except ValueError:
+                        pass
+                v['_in_priority'], v['_ts'] = in_priority, ts
+                # Older sessions patched controller state onto vehicle rows
+                if row.get('controller_direction'):
+                    self._controller_change(ts, row.get('controller_mode') or 'unknown', row['controller_direction'])
+            elif etype == 'CONTROLLER_STATE_CHANGE':
+                self._controller_change(ts, row.get('controller_mode') or 'unknown', row.get('controller_direction') or 'unknown')
+            elif etype == 'ERROR':
+                context = row.get('server_status') or 'UNKNOWN'
+                self.errors[context] = self.errors.get(context, 0) + 1
+
+    def finish(self):
+        """Close the open controller dwell interval at the end of the file."""
+        if self.last_ts is not None:
+            self._close_dwell(self.last_ts)
+        self._ctrl_key = self._ctrl_ts = None
+
+    def merge(self, other: 'SessionStats'):
+        self.rows += other.rows
+        for k, n in other.events.items():
+            self.events[k] = self.events.get(k, 0) + n
+        for vid, ov in other.vehicles.items():
+            v = self._vehicle(vid)
+            for k in ('fixes', 'approaches', 'priority_s'):
+                v[k] += ov[k]
+        self.trigger_hist = [a + b for a, b in zip(self.trigger_hist, other.trigger_hist)]
+        self.trigger_count += other.trigger_count
+        self.trigger_sum += other.trigger_sum
+        for attr, pick in (('trigger_min', min), ('trigger_max', max)):
+            mine, theirs = getattr(self, attr), getattr(other, attr)
+            setattr(self, attr, theirs if mine is None else mine if theirs is None else pick(mine, theirs))
+        for k, s in other.dwell.items():
+            self.dwell[k] = self.dwell.get(k, 0.0) + s
+            self.dwell_count[k] = self.dwell_count.get(k, 0) + other.dwell_count.get(k, 0)
+        for k, n in other.errors.items():
+            self.errors[k] = self.errors.get(k, 0) + n
+        if other.first_ts is not None:
+            self.first_ts = other.first_ts if self.first_ts is None else min(self.first_ts, other.first_ts)
+            self.last_ts = other.last_ts if self.last_ts is None else max(self.last_ts, other.last_ts)
+        return self
+
+    def _trigger_percentile(self, pct: float) -> Optional[float]:
+        if not self.trigger_count:
+            return None
+        target = pct / 100.0 * self.trigger_count
+        seen = 0
+        for i, n in enumerate(self.trigger_hist):
+            seen += n
+            if seen >= target:
+                return float((i + 1) * DIST_BIN_M)
+        return float(len(self.trigger_hist) * DIST_BIN_M)
+
+    def to_dict(self) -> dict:
+        span_h = (self.last_ts - self.first_ts) / 3600.0 if self.first_ts is not None else 0.0
+        total_errors = sum(self.errors.values())
+        return {
+            'rows': self.rows,
+            'span_hours': round(span_h, 3),
+            'events': dict(sorted(self.events.items())),
+            'vehicles': {
+                vid: {'fixes': v['fixes'], 'approaches': v['approaches'], 'time_in_priority_s': round(v['priority_s'], 1)}
+                for vid, v in sorted(self.vehicles.items())
+            },
+            'distance_at_trigger_m': {
+                'count': self.trigger_count,
+                'min': self.trigger_min,
+                'mean': round(self.trigger_sum / self.trigger_count, 1) if self.trigger_count else None,
+                'p50': self._trigger_percentile(50),
+                'p90': self._trigger_percentile(90),
+                'max': self.trigger_max,
+                'histogram': {
+                    (f"{i * DIST_BIN_M}-{(i + 1) * DIST_BIN_M}" if i < DIST_BINS else f">={DIST_BINS * DIST_BIN_M}"): n
+                    for i, n in enumerate(self.trigger_hist) if n
+                },
+            },
+            'controller_dwell': {
+                k: {
+                    'total_s': round(self.dwell[k], 1),
+                    'count': self.dwell_count[k],
+                    'mean_s': round(self.dwell[k] / self.dwell_count[k], 2) if self.dwell_count[k] else None,
+                }
+                for k in sorted(self.dwell)
+            },
+            'errors': {
+                'total': total_errors,
+                'per_1000_events': round(1000.0 * total_errors / self.rows, 2) if self.rows else 0.0,
+                'per_hour': round(total_errors / span_h, 2) if span_h > 0 else None,
+                'by_context': dict(sorted(self.errors.items(), key=lambda kv: -kv[1])),
+            },
+        }
+
+
+def analyze_file(path: str, chunk_rows: int = 10000) -> SessionStats:
+    stats = SessionStats()
+    for chunk in iter_chunks(path, chunk_rows):
+        stats.update(chunk)
+    stats.finish()
+    return stats
+
+
+def _analyze_job(args):
+    path, chunk_rows = args
+    try:
+        return path, analyze_file(path, chunk_rows), None
+    except Exception as e:
+        return path, None, str(e)
+
+
+def analyze(paths: List[str], chunk_rows: int = 10000, workers: Optional[int] = None) -> SessionStats:
+    """Analyze files (one worker task per file) and merge the results."""
+    total = SessionStats()
+    workers = workers or os.cpu_count() or 1
+    jobs = [(p, chunk_rows) for p in paths]
+    if workers <= 1 or len(paths) <= 1:
+        results = map(_analyze_job, jobs)
+        pool = None
+    else:
+        pool = Pool(min(workers, len(paths)))
+        results = pool.imap_unordered(_analyze_job, jobs)
+    try:
+        for path, stats, error in results:
+            if error:
+                print(f"Error analyzing {path}: {error}")
+                continue
+            total.merge(stats)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return total
+
+
+def expand_paths(args: List[str]) -> List[str]:
+    paths = []
+    for a in args:
+        if os.path.isdir(a):
+            paths.extend(sorted(glob.glob(os.path.join(a, 'results_*.csv'))))
+        else:
+            paths.extend(sorted(glob.glob(a)) or [a])
+    return paths
+
+
+def format_report(report: dict) -> str:
+    lines = ['=' * 60, 'SESSION ANALYTICS', f"Rows: {report['rows']} over {report['span_hours']} h"]
+    lines.append('Events: ' + ', '.join(f"{k}={n}" for k, n in report['events'].items()))
+    lines.append('\nPer vehicle:')
+    for vid, v in report['vehicles'].items():
+        lines.append(f"  {vid:<10} fixes={v['fixes']:<7} approaches={v['approaches']:<5} in priority={v['time_in_priority_s']}s")
+    d = report['distance_at_trigger_m']
+    lines.append(f"\nDistance at trigger (m): n={d['count']} min={d['min']} mean={d['mean']} p50<={d['p50']} p90<={d['p90']} max={d['max']}")
+    for bucket, n in d['histogram'].items():
+        lines.append(f"  {bucket:>8} m  {n}")
+    lines.append('\nController dwell:')
+    for key, dw in report['controller_dwell'].items():
+        lines.append(f"  {key:<16} total={dw['total_s']}s count={dw['count']} mean={dw['mean_s']}s")
+    e = report['errors']
+    lines.append(f"\nErrors: {e['total']} ({e['per_1000_events']} per 1000 events, {e['per_hour']} per hour)")
+    for context, n in e['by_context'].items():
+        lines.append(f"  {context}: {n}")
+    lines.append('=' * 60)
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Streaming analytics over results_*.csv session logs")
+    parser.add_argument('paths', nargs='*', default=['results'], help="CSV files, globs or directories (default results/)")
+    parser.add_argument('--chunk-rows', type=int, default=10000, help="Rows held in memory per file (default 10000)")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument('--json', action='store_true', help="Print the report as JSON")
+    args = parser.parse_args()
+
+    paths = expand_paths(args.paths)
+    if not paths:
+        print("No results files found.")
+        return
+    t0 = time.perf_counter()
+    report = analyze(paths, args.chunk_rows, args.workers).to_dict()
+    elapsed = time.perf_counter() - t0
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(format_report(report))
+        print(f"Analyzed {len(paths)} file(s), {report['rows']} rows in {elapsed:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,19 +1,181 @@
+import abc
+import atexit
 import csv
 import json
 import os
+import sqlite3
+import threading
+import time
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+
+
+class EventStore(abc.ABC):
+    """Base class for pluggable event storage backends.
+
+    A backend receives every event the logger records (vehicle, controller,
+    priority and error) as a flat dict. Subclasses implement ``write`` and
+    may buffer; ``flush`` and ``close`` must make buffered events durable.
+    """
+
+    @abc.abstractmethod
+    def write(self, event_type: str, fields: Dict[str, Any]):
+        ...
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class SQLiteEventStore(EventStore):
+    """Shared WAL-mode SQLite store with batched inserts.
+
+    Several processes (server, controller, simulators) may point at the same
+    database file: WAL lets readers run while one writer commits, and each
+    process groups its inserts into one transaction per batch so the
+    per-commit fsync cost is paid once per ``batch_size`` events.
+    Buffered events are flushed when the batch fills, every
+    ``flush_interval`` seconds from a background thread, and at exit.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ts REAL NOT NULL,
+            event_type TEXT NOT NULL,
+            vehicle_id TEXT,
+            direction TEXT,
+            source TEXT,
+            data TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_events_vehicle_ts ON events (vehicle_id, ts);
+        CREATE INDEX IF NOT EXISTS idx_events_type_ts ON events (event_type, ts);
+        CREATE INDEX IF NOT EXISTS idx_events_ts ON events (ts);
+    """
+
+    def __init__(self, path: str, batch_size: int = 200, flush_interval: float = 1.0, source: str = ""):
+        self.path = path
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = flush_interval
+        self.source = source or f"pid{os.getpid()}"
+        parent = os.path.dirname(os.path.abspath(path))
+        os.makedirs(parent, exist_ok=True)
+
+        # Autocommit mode; transactions are opened explicitly per batch
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA busy_timeout=30000")
+        self.conn.executescript(self.SCHEMA)
+
+        self._pending = []
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()  # one transaction at a time on self.conn
+        self._closed = threading.Event()
+        self.dropped = 0  # events written after close(), which are discarded
+        self._flusher = None
+        if flush_interval and flush_interval > 0:
+            self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+            self._flusher.start()
+        atexit.register(self.close)
+
+    def write(self, event_type: str, fields: Dict[str, Any]):
+        row = (
+            fields.get('ts') or time.time(),
+            event_type,
+            fields.get('vehicle_id'),
+            fields.get('direction'),
+            self.source,
+            json.dumps(fields, default=str),
+        )
+        with self._lock:
+            if self._closed.is_set():
+                # Late logging at shutdown must not fail on the closed connection
+                self.dropped += 1
+                if self.dropped == 1:
+                    print(f"Event store {self.path} is closed; dropping {event_type} and later events")
+                return
+            self._pending.append(row)
+            if len(self._pending) < self.batch_size:
+                return
+            batch, self._pending = self._pending, []
+        self._insert(batch)
+
+    def flush(self):
+        with self._lock:
+            batch, self._pending = self._pending, []
+        if batch:
+            self._insert(batch)
+
+    def _insert(self, batch: list):
+        with self._db_lock:
+            self._insert_locked(batch)
+
+    def _insert_locked(self, batch: list):
+        try:
+            # BEGIN IMMEDIATE takes the write lock up front so a concurrent
+            # writer waits on busy_timeout instead of failing mid-transaction
+            self.conn.execute("BEGIN IMMEDIATE")
+            self.conn.executemany(
+                "INSERT INTO events (ts, event_type, vehicle_id, direction, source, data) VALUES (?, ?, ?, ?, ?, ?)",
+                batch,
+            )
+            self.conn.execute("COMMIT")
+        except Exception as e:
+            try:
+                self.conn.execute("ROLLBACK")
+            except Exception:
+                pass
+            print(f"Error writing to event store: {e}")
+
+    def _flush_loop(self):
+        while not self._closed.wait(self.flush_interval):
+            self.flush()
+
+    def close(self):
+        if self._closed.is_set():
+            return
+        with self._lock:
+            self._closed.set()
+        if self._flusher is not None and self._flusher is not threading.current_thread():
+            self._flusher.join()  # so its last batch can't race the connection closing
+        self.flush()
+        try:
+            with self._db_lock:
+                self.conn.close()
+        except Exception:
+            pass
+
+
+def store_from_env(source: str = "") -> Optional[EventStore]:
+    """Build the event store selected by RESULTS_DB (unset = CSV/txt only)."""
+    path = os.getenv("RESULTS_DB")
+    if not path:
+        return None
+    return SQLiteEventStore(
+        path,
+        batch_size=int(os.getenv("RESULTS_DB_BATCH", "200")),
+        flush_interval=float(os.getenv("RESULTS_DB_FLUSH_S", "1.0")),
+        source=source,
+    )
+
 
 class ResultsLogger:
-    def __init__(self, base_dir="."):
+    def __init__(self, base_dir=".", store: Optional[EventStore] = None, role: str = ""):
         self.base_dir = base_dir
+        self.store = store
+        self.role = role
         self.results_dir = os.path.join(base_dir, "results")
         self.ensure_results_dir()
         
-        # Create results files with timestamp
+        # Create results files with timestamp (and process role, so processes
+        # started in the same second don't share a file)
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        self.txt_file = os.path.join(self.results_dir, f"results_{timestamp}.txt")
-        self.csv_file = os.path.join(self.results_dir, f"results_{timestamp}.csv")
+        stem = f"results_{role}_{timestamp}" if role else f"results_{timestamp}"
+        self.txt_file = os.path.join(self.results_dir, f"{stem}.txt")
+        self.csv_file = os.path.join(self.results_dir, f"{stem}.csv")
         
         # Initialize CSV with headers
         self.init_csv()
@@ -31,7 +193,7 @@ class ResultsLogger:
         headers = [
             'timestamp', 'event_type', 'vehicle_id', 'latitude', 'longitude', 
             'speed', 'distance_m', 'bearing', 'direction', 'priority_triggered',
-            'server_status', 'controller_mode', 'controller_direction'
+            'server_status', 'controller_mode', 'controller_direction', 'detail'
         ]
         
         with open(self.csv_file, 'w', newline='', encoding='utf-8') as f:
@@ -44,6 +206,7 @@ class ResultsLogger:
 {'='*60}
 PRIORITY VEHICLE DETECTION - NEW SESSION
 Started: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+Role: {self.role or 'default'}
 Results saved to: {self.txt_file}
 CSV data: {self.csv_file}
 {'='*60}
@@ -51,8 +214,9 @@ CSV data: {self.csv_file}
         self.write_to_txt(session_info)
     
     def log_vehicle_event(self, server_data: Dict[str, Any], vehicle_data: Dict[str, Any] = None):
-        """Log a vehicle detection event"""
-        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        """Log a vehicle detection event (at server_data['ts'] when given, e.g. backfilled fixes)"""
+        ts = server_data.get('ts') or time.time()
+        timestamp = datetime.fromtimestamp(ts).strftime('%Y-%m-%d %H:%M:%S')
         
         # Extract data
         event_type = "VEHICLE_DETECTION"
@@ -84,9 +248,14 @@ Status: {status}
         # Write to CSV
         csv_row = [
             timestamp, event_type, vehicle_id, lat, lon, speed,
-            distance, bearing, direction, priority, status, '', ''
+            distance, bearing, direction, priority, status, '', '', ''
         ]
         self.write_to_csv(csv_row)
+        self.write_to_store(event_type, {
+            'ts': ts, 'vehicle_id': vehicle_id, 'lat': lat, 'lon': lon, 'speed': speed,
+            'distance_m': distance, 'bearing': bearing, 'direction': direction,
+            'priority_triggered': bool(priority), 'status': status,
+        })
     
     def log_controller_event(self, controller_data: Dict[str, Any]):
         """Log traffic controller state changes"""
@@ -103,8 +272,11 @@ Direction: {direction}
 """
         self.write_to_txt(text_log)
         
-        # Update CSV with controller info (find last row and update)
-        self.update_csv_controller(mode, direction)
+        # Controller changes get their own row so every event is an append
+        # (previously the whole CSV was rewritten to patch the last row)
+        self.write_to_csv([timestamp, 'CONTROLLER_STATE_CHANGE', '', '', '', '',
+                           '', '', '', '', '', mode, direction, ''])
+        self.write_to_store('CONTROLLER_STATE_CHANGE', {'mode': mode, 'direction': direction})
     
     def log_priority_trigger(self, direction: str, duration: int):
         """Log when priority is triggered"""
@@ -117,6 +289,9 @@ Duration: {duration} seconds
 {'-'*40}
 """
         self.write_to_txt(text_log)
+        self.write_to_csv([timestamp, 'PRIORITY_TRIGGERED', '', '', '', '',
+                           '', '', direction, True, '', '', '', f"duration={duration}"])
+        self.write_to_store('PRIORITY_TRIGGERED', {'direction': direction, 'duration': duration})
     
     def log_error(self, error_msg: str, context: str = ""):
         """Log errors"""
@@ -129,6 +304,9 @@ Error: {error_msg}
 {'-'*40}
 """
         self.write_to_txt(text_log)
+        self.write_to_csv([timestamp, 'ERROR', '', '', '', '',
+                           '', '', '', '', context, '', '', error_msg])
+        self.write_to_store('ERROR', {'context': context, 'error': error_msg})
     
     def write_to_txt(self, content: str):
         """Write content to text file"""
@@ -147,69 +325,135 @@ Error: {error_msg}
         except Exception as e:
             print(f"Error writing to CSV: {e}")
     
-    def update_csv_controller(self, mode: str, direction: str):
-        """Update the last CSV row with controller info"""
+    def write_to_store(self, event_type: str, fields: Dict[str, Any]):
+        """Forward an event to the storage backend, if one is configured"""
+        if self.store is None:
+            return
         try:
-            # Read all rows
-            rows = []
-            with open(self.csv_file, 'r', newline='', encoding='utf-8') as f:
-                reader = csv.reader(f)
-                rows = list(reader)
-            
-            if len(rows) > 1:  # More than just header
-                # Update last row's controller fields
-                last_row = rows[-1]
-                if len(last_row) >= 12:
-                    last_row[11] = mode      # controller_mode
-                    last_row[12] = direction # controller_direction
-                
-                # Write back all rows
-                with open(self.csv_file, 'w', newline='', encoding='utf-8') as f:
-                    writer = csv.writer(f)
-                    writer.writerows(rows)
+            self.store.write(event_type, fields)
         except Exception as e:
-            print(f"Error updating CSV: {e}")
+            print(f"Error writing to event store: {e}")
     
     def get_summary(self) -> str:
         """Get a summary of the current session"""
-        try:
-            with open(self.txt_file, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            # Count different event types
-            vehicle_events = content.count('VEHICLE_DETECTION')
-            priority_triggers = content.count('PRIORITY_TRIGGERED')
-            errors = content.count('ERROR')
-            
-            summary = f"""
+        return summarize_file(self.txt_file, self.csv_file)
+
+    def close(self):
+        """Flush and close the storage backend"""
+        if self.store is not None:
+            self.store.close()
+
+
+def summarize_file(txt_file: str, csv_file: Optional[str] = None) -> str:
+    """Get a summary of a session from its text log"""
+    try:
+        with open(txt_file, 'r', encoding='utf-8') as f:
+            content = f.read()
+        
+        # Count different event types
+        vehicle_events = content.count('VEHICLE_DETECTION')
+        priority_triggers = content.count('PRIORITY_TRIGGERED')
+        errors = content.count('ERROR')
+        
+        summary = f"""
 {'='*60}
 SESSION SUMMARY
 Total Vehicle Events: {vehicle_events}
 Priority Triggers: {priority_triggers}
 Errors: {errors}
-Results File: {self.txt_file}
-CSV Data: {self.csv_file}
+Results File: {txt_file}
+CSV Data: {csv_file or '-'}
 {'='*60}
 """
-            return summary
-        except Exception as e:
-            return f"Error reading summary: {e}"
+        return summary
+    except Exception as e:
+        return f"Error reading summary: {e}"
+
+
+# -----------------------------------------------------------------------------
+# Session management
+# -----------------------------------------------------------------------------
+# Importing this module has no side effects: the process-wide session (and its
+# results/ files) is created on the first log call. Entry points name their
+# role with configure(role=...) so each process gets its own file pair, or
+# take an explicit handle with start_session().
+_session: Optional[ResultsLogger] = None
+_session_lock = threading.Lock()
+_session_config = {
+    "role": os.getenv("RESULTS_ROLE", ""),
+    "base_dir": os.getenv("RESULTS_BASE_DIR", "."),
+}
+
+
+def configure(role: Optional[str] = None, base_dir: Optional[str] = None):
+    """Set role/base_dir for the lazily created session (no files are created)"""
+    with _session_lock:
+        if role is not None:
+            _session_config["role"] = role
+        if base_dir is not None:
+            _session_config["base_dir"] = base_dir
+
+
+def _new_session_locked(store: Optional[EventStore]) -> ResultsLogger:
+    role = _session_config["role"]
+    if store is None:
+        store = store_from_env(role)
+    return ResultsLogger(_session_config["base_dir"], store=store, role=role)
+
+
+def start_session(role: Optional[str] = None, base_dir: Optional[str] = None,
+                  store: Optional[EventStore] = None) -> ResultsLogger:
+    """Start a new session now and make it the process-wide one"""
+    global _session
+    configure(role, base_dir)
+    with _session_lock:
+        previous = _session
+        _session = session = _new_session_locked(store)
+    if previous is not None:
+        previous.close()
+    return session
+
+
+def end_session():
+    """Close the current session; the next log call starts a fresh one"""
+    global _session
+    with _session_lock:
+        session, _session = _session, None
+    if session is not None:
+        session.close()
+
+
+def get_logger() -> ResultsLogger:
+    """Return the process-wide session, creating it on first use"""
+    global _session
+    session = _session
+    if session is not None:
+        return session
+    with _session_lock:
+        if _session is None:
+            _session = _new_session_locked(None)
+        return _session
+
+
+def __getattr__(name):
+    # Backwards compatibility for code that used the old module-level `logger`
+    if name == "logger":
+        return get_logger()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-# Global logger instance
-logger = ResultsLogger()
 
 # Convenience functions
 def log_vehicle_event(server_data, vehicle_data=None):
-    logger.log_vehicle_event(server_data, vehicle_data)
+    get_logger().log_vehicle_event(server_data, vehicle_data)
 
 def log_controller_event(controller_data):
-    logger.log_controller_event(controller_data)
+    get_logger().log_controller_event(controller_data)
 
 def log_priority_trigger(direction, duration):
-    logger.log_priority_trigger(direction, duration)
+    get_logger().log_priority_trigger(direction, duration)
 
 def log_error(error_msg, context=""):
-    logger.log_error(error_msg, context)
+    get_logger().log_error(error_msg, context)
 
 def get_summary():
-    return logger.get_summary() 
\ No newline at end of file
+    return get_logger().get_summary()
@@ -21,6 +21,14 @@ DEFAULT_PRIORITY_SECONDS = 10      # Duration to keep signal in priority mode
 HOLD_UNTIL_PASS = True             # Keep signal green until vehicle passes
 RELEASE_THRESHOLD_METERS = 150     # Distance beyond which hold is released
 
+# -----------------------------------------------------------------------------
+# 📡 Adaptive Reporting Rate (returned as next_report_s by /api/vehicle)
+# -----------------------------------------------------------------------------
+REPORT_INTERVAL_MIN_S = 1.0        # Inside / near the trigger zone
+REPORT_INTERVAL_MAX_S = 30.0       # Far from the intersection
+REPORT_LEAD_FRACTION = 0.5         # Report again after this share of the time to reach the threshold
+REPORT_FLOOR_SPEED_KMH = 30        # Assume at least this speed (stopped vehicles may pull away)
+
 # -----------------------------------------------------------------------------
 # 🚦 Traffic Controller URLs
 # -----------------------------------------------------------------------------
@@ -0,0 +1,201 @@
+# -----------------------------------------------------------------------------
+# ⏪ Session Replay
+# -----------------------------------------------------------------------------
+# Re-drives the server with the vehicle fixes recorded in results_*.csv files
+# and diffs the server's decisions against what was recorded.
+# - Per-vehicle order and inter-arrival timing are preserved
+# - --speed 1 replays in real time, --speed N runs N× faster, --speed 0 = max
+# - --in-process drives server.server.app through the Flask test client
+#   instead of HTTP (no running server needed)
+#
+# Usage:
+#   python -m server.replay results/results_server_20250101_120000.csv --speed 10
+# -----------------------------------------------------------------------------
+
+import argparse
+import csv
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional
+
+from results_logger import configure as configure_results
+
+DEFAULT_URL = "http://127.0.0.1:5000/api/vehicle"
+TS_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def load_fixes(paths: Iterable[str], vehicle: Optional[str] = None) -> List[dict]:
+    """Read VEHICLE_DETECTION rows from one or more session CSVs, in time order."""
+    fixes = []
+    for path in paths:
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                if row.get("event_type") != "VEHICLE_DETECTION":
+                    continue
+                if row.get("server_status") == "backfill":
+                    continue  # history uploaded after the fact; no live decision to compare
+                if vehicle and row.get("vehicle_id") != vehicle:
+                    continue
+                try:
+                    fixes.append({
+                        "seq": len(fixes),
+                        "ts": datetime.strptime(row["timestamp"], TS_FORMAT).timestamp(),
+                        "id": row["vehicle_id"],
+                        "lat": float(row["latitude"]),
+                        "lon": float(row["longitude"]),
+                        "speed": float(row["speed"] or 0),
+                        "priority_triggered": row.get("priority_triggered") == "True",
+                        "direction": row.get("direction") or None,
+                    })
+                except (KeyError, ValueError):
+                    continue
+    # Stable sort keeps file order for fixes logged within the same second
+    fixes.sort(key=lambda f: (f["ts"], f["seq"]))
+    return fixes
+
+
+def http_sender(url: str) -> Callable[[dict], dict]:
+    """POST fixes over HTTP with one keep-alive session per replay thread."""
+    import requests
+    local = threading.local()
+
+    def send(payload: dict) -> dict:
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        r = session.post(url, json=payload, timeout=10)
+        return r.json()
+    return send
+
+
+def in_process_sender() -> Callable[[dict], dict]:
+    """Drive the Flask app directly through its test client."""
+    from server.server import app
+    local = threading.local()
+
+    def send(payload: dict) -> dict:
+        client = getattr(local, "client", None)
+        if client is None:
+            client = local.client = app.test_client()
+        return client.post("/api/vehicle", json=payload).get_json()
+    return send
+
+
+def replay(fixes: List[dict], send: Callable[[dict], dict], speed: float = 1.0) -> List[dict]:
+    """Replay fixes with one thread per vehicle; return one result per fix.
+
+    Each vehicle's fixes are sent in recorded order. Fix i is due at
+    start + (ts_i - ts_0) / speed; with speed <= 0 fixes are sent back to back.
+    """
+    by_vehicle: Dict[str, List[dict]] = OrderedDict()
+    for fix in fixes:
+        by_vehicle.setdefault(fix["id"], []).append(fix)
+    results: List[Optional[dict]] = [None] * len(fixes)
+    index = {id(fix): i for i, fix in enumerate(fixes)}
+    ts0 = fixes[0]["ts"] if fixes else 0.0
+    start = time.perf_counter()
+
+    def run_vehicle(vehicle_fixes: List[dict]):
+        for fix in vehicle_fixes:
+            due = start + (fix["ts"] - ts0) / speed if speed > 0 else start
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            payload = {"id": fix["id"], "lat": fix["lat"], "lon": fix["lon"], "speed": fix["speed"]}
+            sent = time.perf_counter()
+            try:
+                response, error = send(payload), None
+            except Exception as e:
+                response, error = None, str(e)
+            done = time.perf_counter()
+            results[index[id(fix)]] = {
+                "fix": fix,
+                "response": response,
+                "error": error,
+                "latency_s": done - sent,
+                "slip_s": max(0.0, sent - due),
+            }
+
+    threads = [threading.Thread(target=run_vehicle, args=(vf,), daemon=True) for vf in by_vehicle.values()]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def diff_decisions(results: List[dict]) -> List[dict]:
+    """Fixes whose replayed priority/direction decision differs from the recording."""
+    mismatches = []
+    for r in results:
+        fix, resp = r["fix"], r["response"]
+        if resp is None:
+            mismatches.append({"fix": fix, "reason": f"error: {r['error']}"})
+            continue
+        triggered = resp.get("status") == "priority_triggered"
+        if triggered != fix["priority_triggered"]:
+            mismatches.append({"fix": fix, "reason": f"priority recorded={fix['priority_triggered']} replayed={triggered}"})
+        elif fix["direction"] and resp.get("direction") != fix["direction"]:
+            mismatches.append({"fix": fix, "reason": f"direction recorded={fix['direction']} replayed={resp.get('direction')}"})
+    return mismatches
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[k]
+
+
+def format_report(results: List[dict], mismatches: List[dict], wall_s: float, max_listed: int = 20) -> str:
+    latencies = [r["latency_s"] * 1000 for r in results if r["response"] is not None]
+    slips = [r["slip_s"] * 1000 for r in results]
+    lines = [
+        "=" * 60,
+        "REPLAY REPORT",
+        f"Fixes replayed: {len(results)} in {wall_s:.2f}s ({len(results) / wall_s if wall_s > 0 else 0:,.1f} fixes/s)",
+        f"Latency ms: p50={_percentile(latencies, 50):.1f} p95={_percentile(latencies, 95):.1f} "
+        f"p99={_percentile(latencies, 99):.1f} max={max(latencies, default=0):.1f}",
+        f"Schedule slip ms: p95={_percentile(slips, 95):.1f} max={max(slips, default=0):.1f}",
+        f"Decision mismatches: {len(mismatches)}",
+    ]
+    for m in mismatches[:max_listed]:
+        fix = m["fix"]
+        stamp = datetime.fromtimestamp(fix["ts"]).strftime(TS_FORMAT)
+        lines.append(f"  [{stamp}] {fix['id']} @ {fix['lat']:.6f},{fix['lon']:.6f}: {m['reason']}")
+    if len(mismatches) > max_listed:
+        lines.append(f"  ... {len(mismatches) - max_listed} more")
+    lines.append("=" * 60)
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded vehicle fixes into the server and diff decisions")
+    parser.add_argument("csv", nargs="+", help="Session CSV file(s) (results_*.csv)")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay speed factor; 0 = as fast as possible (default 1.0)")
+    parser.add_argument("--url", default=DEFAULT_URL, help=f"Server vehicle endpoint (default {DEFAULT_URL})")
+    parser.add_argument("--in-process", action="store_true", help="Drive server.server.app directly instead of HTTP")
+    parser.add_argument("--vehicle", default=None, help="Only replay this vehicle ID")
+    args = parser.parse_args()
+
+    configure_results(role="replay")
+    fixes = load_fixes(args.csv, args.vehicle)
+    if not fixes:
+        print("No VEHICLE_DETECTION rows found.")
+        return
+    send = in_process_sender() if args.in_process else http_sender(args.url)
+    span = fixes[-1]["ts"] - fixes[0]["ts"]
+    pace = "max speed" if args.speed <= 0 else f"{args.speed:g}x"
+    print(f"Replaying {len(fixes)} fixes ({span:.0f}s recorded) at {pace}...")
+
+    t0 = time.perf_counter()
+    results = replay(fixes, send, args.speed)
+    wall = time.perf_counter() - t0
+    print(format_report(results, diff_decisions(results), wall))
+
+
+if __name__ == "__main__":
+    main()
@@ -12,9 +12,9 @@ from flask import Flask, request, jsonify
 import requests, time
 from urllib.parse import quote
 from . import config
-from .utils import haversine, initial_bearing, direction_from_bearing
+from .utils import assess_fix, suggest_report_interval
 from .speaker import announce_vehicle_simple, announce_vehicle_detection, announce_in_thread
-from results_logger import log_vehicle_event, log_error
+from results_logger import log_vehicle_event, log_error, configure as configure_results
 from flask_cors import CORS
 
 app = Flask(__name__)
@@ -224,6 +224,20 @@ def turn_off_blynk_alert(vehicle_id=None):
         log_error(str(e), "BLYNK_ALERT_OFF_ERROR")
 
 
+# -----------------------------------------------------------------------------
+# 📡 Helper: report_interval(dist, speed)
+# -----------------------------------------------------------------------------
+# Suggested seconds until the vehicle's next report, returned as
+# next_report_s so clients report densely near the intersection only.
+# -----------------------------------------------------------------------------
+def report_interval(dist, speed):
+    return round(suggest_report_interval(
+        dist, speed, config.THRESHOLD_METERS,
+        getattr(config, "REPORT_INTERVAL_MIN_S", 1.0), getattr(config, "REPORT_INTERVAL_MAX_S", 30.0),
+        getattr(config, "REPORT_LEAD_FRACTION", 0.5), getattr(config, "REPORT_FLOOR_SPEED_KMH", 30),
+    ), 1)
+
+
 # -----------------------------------------------------------------------------
 # 🚗 Endpoint: /api/vehicle [POST]
 # -----------------------------------------------------------------------------
@@ -237,10 +251,11 @@ def vehicle():
     lat, lon = float(data["lat"]), float(data["lon"])
     speed = float(data.get("speed", 0))
 
-    # Calculate distance and direction
-    dist = haversine(lat, lon, config.INTERSECTION["lat"], config.INTERSECTION["lon"])
-    bearing = initial_bearing(lat, lon, config.INTERSECTION["lat"], config.INTERSECTION["lon"])
-    axis = direction_from_bearing(bearing)
+    # Calculate distance and direction, and what the controller should do
+    fix = assess_fix(lat, lon, speed, config.INTERSECTION, config.THRESHOLD_METERS,
+                     getattr(config, "HOLD_UNTIL_PASS", False),
+                     getattr(config, "RELEASE_THRESHOLD_METERS", config.THRESHOLD_METERS + 40))
+    dist, bearing, axis = fix["distance_m"], fix["bearing"], fix["direction"]
 
     print(f"[SERVER] {vid} @ {lat:.6f},{lon:.6f} speed={speed:.1f} → {dist:.1f} m | bearing={bearing:.1f}° → {axis}")
 
@@ -249,7 +264,7 @@ def vehicle():
     # -----------------------------------------------------------------------------
     # 🚨 If vehicle is close enough — trigger priority and send Blynk alert
     # -----------------------------------------------------------------------------
-    if dist < config.THRESHOLD_METERS:
+    if fix["triggered"]:
         triggered = True
         
         # Only send alert if this vehicle doesn't already have an active alert
@@ -304,19 +319,21 @@ def vehicle():
             except:
                 pass
 
+        eta_s = fix["eta_s"]
         try:
-            if getattr(config, "HOLD_UNTIL_PASS", False):
+            if fix["action"] == "hold":
                 # Engage "hold until release" mode
                 r = requests.post(
                     getattr(config, "TRAFFIC_CONTROLLER_HOLD_URL", config.TRAFFIC_CONTROLLER_URL),
-                    json={"direction": axis},
+                    json={"direction": axis, "vehicle_id": vid, "eta_s": eta_s},
                     timeout=5,
                 )
             else:
                 # Engage timed priority mode
                 r = requests.post(
                     config.TRAFFIC_CONTROLLER_URL,
-                    json={"direction": axis, "duration": config.DEFAULT_PRIORITY_SECONDS},
+                    json={"direction": axis, "duration": config.DEFAULT_PRIORITY_SECONDS,
+                          "vehicle_id": vid, "eta_s": eta_s},
                     timeout=5,
                 )
             print("[SERVER] priority → controller:", r.status_code, r.text)
@@ -327,15 +344,16 @@ def vehicle():
     # -----------------------------------------------------------------------------
     # 🕓 If vehicle has passed the intersection — release hold mode and turn off alerts
     # -----------------------------------------------------------------------------
-    elif dist >= config.THRESHOLD_METERS:
+    else:
         # Vehicle is no longer in priority range - turn off alerts (force OFF to be safe)
         turn_off_blynk_alert(vid)  # Ensures V0, V5, V6 are OFF and marks inactive
         
-        if getattr(config, "HOLD_UNTIL_PASS", False) and dist > getattr(config, "RELEASE_THRESHOLD_METERS", config.THRESHOLD_METERS + 40):
+        if fix["action"] == "release":
             try:
+                # Release only this vehicle's hold; others keep their priority
                 r = requests.post(
                     getattr(config, "TRAFFIC_CONTROLLER_RELEASE_URL", config.TRAFFIC_CONTROLLER_URL),
-                    json={},
+                    json={"vehicle_id": vid},
                     timeout=5,
                 )
                 print("[SERVER] release → controller:", r.status_code, r.text)
@@ -360,15 +378,52 @@ def vehicle():
     log_vehicle_event(last_event, data)
 
     # -----------------------------------------------------------------------------
-    # 📤 Respond to vehicle
+    # 📤 Respond to vehicle (next_report_s: dense near the intersection, sparse far out)
     # -----------------------------------------------------------------------------
     return jsonify({
         "status": "priority_triggered" if triggered else "normal",
         "distance_m": dist,
-        "direction": axis
+        "direction": axis,
+        "next_report_s": report_interval(dist, speed),
     })
 
 
+# -----------------------------------------------------------------------------
+# 🗃️ Endpoint: /api/vehicle/batch [POST]
+# -----------------------------------------------------------------------------
+# Backfill for fixes a vehicle buffered while its link was down:
+#   {"id": "AMB001", "fixes": [{"lat", "lon", "speed", "ts"}, ...]}
+# Fixes are logged at their original time for history only; they never
+# trigger priority, alerts or controller calls (live fixes use /api/vehicle).
+# -----------------------------------------------------------------------------
+@app.route("/api/vehicle/batch", methods=["POST"])
+def vehicle_batch():
+    data = request.get_json(force=True)
+    vid = data.get("id", "UNKNOWN")
+    accepted = 0
+    for item in data.get("fixes") or []:
+        try:
+            lat, lon = float(item["lat"]), float(item["lon"])
+            speed = float(item.get("speed", 0))
+            ts = float(item["ts"]) if item.get("ts") is not None else time.time()
+        except (KeyError, TypeError, ValueError):
+            continue
+        fix = assess_fix(lat, lon, speed, config.INTERSECTION, config.THRESHOLD_METERS)
+        log_vehicle_event({
+            "ts": ts,
+            "vehicle": vid,
+            "distance_m": fix["distance_m"],
+            "bearing": fix["bearing"],
+            "direction": fix["direction"],
+            "priority_triggered": False,
+            "status": "backfill",
+        }, {"id": vid, "lat": lat, "lon": lon, "speed": speed})
+        accepted += 1
+
+    print(f"[SERVER] {vid} backfill: {accepted} fixes")
+    return jsonify({"ok": True, "accepted": accepted})
+
+
 # -----------------------------------------------------------------------------
 # 📋 Endpoint: /api/last_event [GET]
 # -----------------------------------------------------------------------------
@@ -394,4 +449,5 @@ def api_last_event():
 # ▶️ Run Flask Server
 # -----------------------------------------------------------------------------
 if __name__ == "__main__":
+    configure_results(role="server")
     app.run(host="0.0.0.0", port=5000)
\ No newline at end of file
@@ -28,4 +28,46 @@ def direction_from_bearing(bearing):
     candidates = {"NS": [0, 180], "EW": [90, 270]}
     def min_delta(targets):
         return min(min(abs(bearing - t), 360-abs(bearing - t)) for t in targets)
-    return "NS" if min_delta(candidates["NS"]) <= min_delta(candidates["EW"]) else "EW"
\ No newline at end of file
+    return "NS" if min_delta(candidates["NS"]) <= min_delta(candidates["EW"]) else "EW"
+
+def assess_fix(lat, lon, speed_kmh, intersection, threshold_m, hold_until_pass=False, release_threshold_m=None):
+    """
+    Decide what one GPS fix means for the intersection (no I/O, so the same
+    rules run in the server and in virtual-time simulations).
+    action is "hold" / "priority" inside threshold_m, "release" beyond
+    release_threshold_m when holding until the vehicle passes, else None.
+    """
+    dist = haversine(lat, lon, intersection["lat"], intersection["lon"])
+    bearing = initial_bearing(lat, lon, intersection["lat"], intersection["lon"])
+    triggered = dist < threshold_m
+    if release_threshold_m is None:
+        release_threshold_m = threshold_m + 40
+    if triggered:
+        action = "hold" if hold_until_pass else "priority"
+    elif hold_until_pass and dist > release_threshold_m:
+        action = "release"
+    else:
+        action = None
+    return {
+        "distance_m": dist,
+        "bearing": bearing,
+        "direction": direction_from_bearing(bearing),
+        # Vehicle ID and ETA let the controller arbitrate overlapping requests
+        "eta_s": dist / (speed_kmh / 3.6) if speed_kmh > 0 else None,
+        "triggered": triggered,
+        "action": action,
+    }
+
+
+def suggest_report_interval(dist_m, speed_kmh, threshold_m, min_s=1.0, max_s=30.0, lead=0.5, floor_kmh=30.0):
+    """
+    Seconds until a vehicle should report again: ``lead`` times the time it
+    needs to reach the trigger threshold (at no less than floor_kmh), clamped
+    to [min_s, max_s]. Reports get denser as the vehicle closes in, and are
+    at min_s inside the threshold (and just outside it, for the release).
+    """
+    gap = dist_m - threshold_m
+    if gap <= 0:
+        return min_s
+    v = max(speed_kmh, floor_kmh) / 3.6
+    return min(max_s, max(min_s, lead * gap / v))
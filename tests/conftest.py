@@ -0,0 +1,18 @@
+import sys, os
+sys.path.append(os.path.abspath("."))
+
+import pytest
+import results_logger
+from vehicle import trajectory
+
+# The annotation dashboard preloads models in the background on import; not in tests
+os.environ.setdefault("PV_PRELOAD", "0")
+
+
+@pytest.fixture(autouse=True, scope="session")
+def _results_session(tmp_path_factory):
+    # Keep test runs from writing session files into the repo's results/
+    results_logger.configure(role="test", base_dir=str(tmp_path_factory.mktemp("results")))
+    trajectory.CACHE_DIR = str(tmp_path_factory.mktemp("trajectories"))
+    yield
+    results_logger.end_session()
@@ -0,0 +1,102 @@
+import sys, os
+sys.path.append(os.path.abspath("."))
+
+from traffic_controller.host import IntersectionHost, create_app
+
+
+class ManualClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _host(n=1000):
+    clock = ManualClock()
+    return IntersectionHost([f"I{i:04d}" for i in range(n)], cycle_ns=5, cycle_ew=4, clock=clock), clock
+
+
+def test_shared_tick_advances_all_intersections():
+    host, clock = _host()
+    clock.now = 5.0
+    assert host.tick() == 1000
+    assert host.summary()["ew_green"] == 1000
+    clock.now = 8.9
+    assert host.tick() == 0
+    clock.now = 9.0
+    assert host.tick() == 1000
+    assert host.state("I0500") == {"id": "I0500", "mode": "normal", "direction": "NS", "priority_until": None}
+
+
+def test_priority_is_per_intersection_and_arbitrated():
+    host, clock = _host(10)
+    host.request("I0003", "EW", None, vehicle_id="FIRT001")
+    host.request("I0003", "NS", 2, vehicle_id="AMB001")
+    assert host.state("I0003")["direction"] == "NS"
+
+    clock.now = 6.0  # every other intersection flips; I0003 stays in priority
+    host.tick()
+    assert host.state("I0002")["direction"] == "EW"
+    assert host.state("I0003")["mode"] == "priority"
+    assert host.state("I0003")["direction"] == "EW"  # ambulance ended, firetruck hold resumes
+
+    host.release("I0003", "FIRT001")
+    assert host.state("I0003")["mode"] == "normal"
+    clock.now = 6.0 + 4.0
+    host.tick()
+    assert host.state("I0003")["direction"] == "NS"
+
+
+def test_routes_keyed_by_intersection_id():
+    host, clock = _host(3)
+    client = create_app(host).test_client()
+    r = client.post("/api/I0001/priority_hold", json={"direction": "EW", "vehicle_id": "AMB001"})
+    assert r.get_json()["granted"]
+    assert client.get("/api/I0001/state").get_json()["mode"] == "priority"
+    assert client.get("/api/I0000/state").get_json()["mode"] == "normal"
+    assert client.get("/api/I9999/state").status_code == 404
+    r = client.post("/api/I0001/priority_release", json={"vehicle_id": "AMB001"})
+    assert r.get_json()["mode"] == "normal"
+    assert client.get("/api/intersections").get_json()["count"] == 3
+
+
+def test_tick_thread_wakes_for_new_deadlines():
+    import time
+    host = IntersectionHost(["A"], cycle_ns=1, cycle_ew=1)
+    host.request("A", "NS", None, vehicle_id="FIRT001")
+    host.start()
+    try:
+        time.sleep(0.3)  # open-ended hold only: the tick thread is in its long sleep
+        host.request("A", "EW", 1, vehicle_id="AMB001")
+        host.release("A", "FIRT001")
+        deadline = time.monotonic() + 3.0
+        while host.state("A")["mode"] == "priority" and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert host.state("A")["mode"] == "normal"
+        assert host.summary()["transitions"] >= 1
+    finally:
+        host.stop()
+
+
+def test_late_ticks_keep_the_phase_schedule():
+    host, clock = _host(2)
+    clock.now = 5.3  # late tick: EW still ends at 9.0, not 9.3
+    host.tick()
+    clock.now = 9.0
+    assert host.tick() == 2
+    clock.now = 40.5  # several NS+EW cycles missed: back on schedule, NS until 41
+    assert host.tick() == 0
+    assert float(host.phase_deadline[0]) == 41.0
+    assert host.state("I0000")["direction"] == "NS"
+    clock.now = 41.0
+    assert host.tick() == 2
+
+
+def test_requests_wake_the_tick_thread_only_for_earlier_deadlines():
+    host, clock = _host(2)
+    host._sleep_until = 3.0  # the tick thread plans to wake at t=3
+    host.request("I0000", "EW", None, vehicle_id="FIRT001")
+    assert not host._wake.is_set()  # open-ended hold: nothing new to wake for
+    host.request("I0001", "EW", 2, vehicle_id="AMB001")
+    assert host._wake.is_set()  # grant ends at t=2, before the planned wake-up
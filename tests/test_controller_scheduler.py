@@ -0,0 +1,92 @@
+import sys, os, threading, time
+sys.path.append(os.path.abspath("."))
+
+from traffic_controller.scheduler import SignalScheduler
+
+
+class Recorder:
+    def __init__(self):
+        self.events = []
+        self.changed = threading.Condition()
+
+    def __call__(self, mode, direction):
+        with self.changed:
+            self.events.append((time.perf_counter(), mode, direction))
+            self.changed.notify_all()
+
+    def wait_for(self, mode, direction, timeout=2.0):
+        with self.changed:
+            self.changed.wait_for(lambda: self.events and self.events[-1][1:] == (mode, direction), timeout)
+            return self.events[-1]
+
+
+def test_hold_and_release_preempt_within_milliseconds():
+    rec = Recorder()
+    sched = SignalScheduler(rec, cycle_ns=0.5, cycle_ew=0.5)
+    sched.start()
+    try:
+        rec.wait_for("normal", "NS")
+        time.sleep(0.1)  # mid-phase: the old loop would sleep through this
+
+        t0 = time.perf_counter()
+        sched.hold("EW")
+        applied_at, mode, direction = rec.wait_for("priority", "EW")
+        hold_latency = applied_at - t0
+
+        # No normal-cycle flips while the hold is active (several phase lengths)
+        n = len(rec.events)
+        time.sleep(1.2)
+        assert len(rec.events) == n
+
+        t0 = time.perf_counter()
+        sched.release()
+        applied_at, mode, direction = rec.wait_for("normal", "EW")
+        release_latency = applied_at - t0
+    finally:
+        sched.stop()
+
+    print(f"preemption latency: hold={hold_latency * 1000:.2f} ms release={release_latency * 1000:.2f} ms")
+    assert hold_latency < 0.05
+    assert release_latency < 0.05
+
+
+def test_timed_priority_ends_on_deadline_and_cycle_resumes():
+    rec = Recorder()
+    sched = SignalScheduler(rec, cycle_ns=0.3, cycle_ew=0.3)
+    sched.start()
+    try:
+        rec.wait_for("normal", "NS")
+        t0 = time.perf_counter()
+        sched.priority("EW", 0.4)
+        applied_at, _, _ = rec.wait_for("normal", "EW")
+        assert 0.35 < applied_at - t0 < 0.5
+        # Normal cycling continues from the priority direction
+        applied_at, _, _ = rec.wait_for("normal", "NS")
+    finally:
+        sched.stop()
+    assert [e[1:] for e in rec.events[:4]] == [
+        ("normal", "NS"), ("priority", "EW"), ("normal", "EW"), ("normal", "NS"),
+    ]
+
+
+def test_requests_do_not_wait_for_interlock_and_priority_keeps_its_time():
+    rec = Recorder()
+
+    def apply(mode, direction):
+        time.sleep(0.3)  # yellow + all-red before the new green shows
+        rec(mode, direction)
+
+    sched = SignalScheduler(apply, cycle_ns=5, cycle_ew=5)
+    sched.start()
+    try:
+        rec.wait_for("normal", "NS")
+        t0 = time.perf_counter()
+        sched.priority("EW", 0.4)
+        returned = time.perf_counter() - t0
+        shown_at, _, _ = rec.wait_for("priority", "EW")
+        ended_at, _, _ = rec.wait_for("normal", "EW")
+    finally:
+        sched.stop()
+    assert returned < 0.05
+    # The full 0.4 s of green after the interlock (ends after its own 0.3 s interlock)
+    assert 0.4 + 0.3 - 0.05 < ended_at - shown_at < 0.4 + 0.3 + 0.2
@@ -0,0 +1,40 @@
+import sys, os, threading, time
+sys.path.append(os.path.abspath("."))
+
+from traffic_controller import traffic_controller as tc
+
+
+def test_state_is_versioned_and_long_poll_wakes_on_change():
+    client = tc.app.test_client()
+    v0 = client.get("/api/state").get_json()["version"]
+
+    # Unchanged state: the request waits for the timeout, then returns as-is
+    t0 = time.perf_counter()
+    same = client.get(f"/api/state?since={v0}&wait=0.2").get_json()
+    assert same["version"] == v0 and time.perf_counter() - t0 >= 0.19
+
+    # Stale version: returns immediately
+    t0 = time.perf_counter()
+    assert client.get(f"/api/state?since={v0 - 1}&wait=5").get_json()["version"] == v0
+    assert time.perf_counter() - t0 < 0.1
+
+    # A hold applied while a watcher is parked wakes it right away
+    result = {}
+
+    def watcher():
+        start = time.perf_counter()
+        result["state"] = tc.app.test_client().get(f"/api/state?since={v0}&wait=5").get_json()
+        result["waited"] = time.perf_counter() - start
+
+    t = threading.Thread(target=watcher)
+    t.start()
+    time.sleep(0.1)
+    try:
+        r = client.post("/api/priority_hold", json={"direction": "EW", "vehicle_id": "AMB001"}).get_json()
+        t.join(2)
+        assert result["state"]["mode"] == "priority" and result["state"]["direction"] == "EW"
+        assert result["state"]["version"] > v0
+        assert r["version"] == result["state"]["version"]
+        assert result["waited"] < 1.0
+    finally:
+        client.post("/api/priority_release", json={})
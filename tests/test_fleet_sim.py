@@ -0,0 +1,49 @@
+import sys, os, asyncio
+sys.path.append(os.path.abspath("."))
+
+from aiohttp import web
+
+from vehicle.fleet_sim import route_variants, run_fleet
+from vehicle.trajectory import NoiseModel
+
+
+def test_route_variants_share_precomputed_trajectories():
+    tables = route_variants(["ambulance"], tick=3.0, variants=4, noise=NoiseModel(sigma_m=3))
+    prefix, pool = tables["ambulance"]
+    assert prefix == "AMB" and len(pool) == 4
+    assert all(len(rows[0]) == 4 for rows in pool)  # lat, lon, speed, valid
+    assert pool[0] != pool[1]  # different seeds
+
+
+def test_fleet_sends_every_fix_over_pooled_client():
+    seen = []
+
+    async def vehicle(request):
+        data = await request.json()
+        seen.append(data["id"])
+        return web.json_response({"status": "normal"})
+
+    async def scenario():
+        app = web.Application()
+        app.router.add_post("/api/vehicle", vehicle)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        try:
+            return await run_fleet(f"http://127.0.0.1:{port}/api/vehicle", count=500,
+                                   routes=["ambulance", "scenario_ew"], interval=0.05, jitter=0.01,
+                                   connections=20, ramp=0.1, tick=3.0, variants=2,
+                                   noise=NoiseModel(dropout_rate=0.2))
+        finally:
+            await runner.cleanup()
+
+    report = asyncio.run(scenario())
+    tables = route_variants(["ambulance", "scenario_ew"], 3.0, 2, 0, NoiseModel(dropout_rate=0.2))
+    # Dropped-out fixes are never sent
+    expected = sum(125 * sum(1 for row in rows if row[3]) for _, pool in tables.values() for rows in pool)
+    assert report["sent"] == report["ok"] == len(seen) == expected
+    assert len(set(seen)) == 500
+    assert report["latency_ms"]["p50"] > 0
+    assert report["send_rate"] > 0
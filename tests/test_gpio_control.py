@@ -0,0 +1,57 @@
+import sys, os
+sys.path.append(os.path.abspath("."))
+
+from traffic_controller.gpio_control import FakeBackend, SignalOutput
+
+
+class FakeTime:
+    def __init__(self):
+        self.now = 0.0
+
+    def clock(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def _output(yellow_s=3.0, all_red_s=1.0):
+    t = FakeTime()
+    backend = FakeBackend(clock=t.clock)
+    return SignalOutput(backend, yellow_s=yellow_s, all_red_s=all_red_s, sleep=t.sleep), backend, t
+
+
+def test_only_changed_pins_are_written():
+    out, backend, _ = _output()
+    assert out.set_phase(ns_green=True) == 6  # first write initialises every pin
+    assert out.set_phase(ns_green=True) == 0
+    assert out.set_phase(ns_green=True) == 0
+    assert backend.count() == 6
+
+
+def test_phase_change_goes_through_yellow_and_all_red():
+    out, backend, t = _output()
+    out.set_phase(ns_green=True)
+    backend.writes.clear()
+    start = t.now
+
+    assert out.set_phase(ew_green=True) == 6
+    assert [(ts - start, name, v) for ts, name, v in backend.writes] == [
+        (0.0, "NS_GREEN", 0), (0.0, "NS_YELLOW", 1),   # yellow
+        (3.0, "NS_YELLOW", 0), (3.0, "NS_RED", 1),     # all red
+        (4.0, "EW_RED", 0), (4.0, "EW_GREEN", 1),      # new green
+    ]
+    # Transition latency: request -> conflicting green on
+    assert backend.writes[-1][0] - start == 4.0
+
+
+def test_greens_never_overlap():
+    out, backend, _ = _output(yellow_s=0, all_red_s=0)
+    levels = {}
+    for ns in (True, False, True, False, True):
+        out.set_phase(ns_green=ns, ew_green=not ns)
+    for _, name, value in backend.writes:
+        levels[name] = value
+        assert not (levels.get("NS_GREEN") and levels.get("EW_GREEN"))
+    # Each flip without interlock: 2 offs + 2 ons
+    assert backend.count() == 6 + 4 * 4
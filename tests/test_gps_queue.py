@@ -0,0 +1,104 @@
+import sys, os, csv
+sys.path.append(os.path.abspath("."))
+
+import results_logger
+from server.server import app, last_events_by_vehicle
+from vehicle.gps_gsm_client import FixQueue, FixUploader
+
+
+class Response:
+    def __init__(self, status_code=200, text="{}"):
+        self.status_code = status_code
+        self.text = text
+
+
+class FlakyLink:
+    """Stand-in for requests.post over a GSM link that can drop out."""
+
+    def __init__(self):
+        self.up = True
+        self.calls = []
+
+    def __call__(self, url, json=None, timeout=None):
+        if not self.up:
+            raise ConnectionError("no carrier")
+        self.calls.append((url, json))
+        return Response()
+
+
+def _fix(i):
+    return 12.9698 + i * 1e-5, 77.5945, 40.0, 1000.0 + i
+
+
+def test_backlog_uploads_newest_live_then_batches(tmp_path):
+    link = FlakyLink()
+    uploader = FixUploader(FixQueue(str(tmp_path / "q.jsonl")), "AMB001", "http://s/api/vehicle",
+                           "http://s/api/vehicle/batch", batch_size=50, post=link)
+    link.up = False
+    for i in range(120):
+        uploader.submit(*_fix(i)[:3], ts=_fix(i)[3])
+    assert len(uploader.queue) == 120
+
+    link.up = True
+    uploader.submit(*_fix(120)[:3], ts=_fix(120)[3])
+    # One backfill batch per report, sent after the live fix
+    assert [url.endswith("/batch") for url, _ in link.calls] == [False, True]
+    assert len(uploader.queue) == 70
+    for i in (121, 122, 123):
+        uploader.submit(*_fix(i)[:3], ts=_fix(i)[3])
+    live = [p for url, p in link.calls if url.endswith("/api/vehicle")]
+    batches = [p for url, p in link.calls if url.endswith("/batch")]
+    assert [p["ts"] for p in live] == [1120.0, 1121.0, 1122.0, 1123.0]
+    # 120 older fixes backfilled oldest-first in 3 requests instead of 120
+    assert [len(b["fixes"]) for b in batches] == [50, 50, 20]
+    assert [f["ts"] for b in batches for f in b["fixes"]] == [1000.0 + i for i in range(120)]
+    assert len(uploader.queue) == 0
+
+
+def test_queue_survives_restart_and_is_bounded(tmp_path):
+    path = str(tmp_path / "q.jsonl")
+    q = FixQueue(path, maxlen=5)
+    for i in range(8):
+        q.push({"ts": i})
+    assert q.dropped == 3
+    with open(path, "a") as f:
+        f.write('{"ts": 99')  # torn write from a power cut
+
+    q2 = FixQueue(path, maxlen=5)
+    assert [f["ts"] for f in q2.fixes] == [3, 4, 5, 6, 7]
+    q2.discard_oldest(2)
+    assert [f["ts"] for f in FixQueue(path, maxlen=5).fixes] == [5, 6, 7]
+
+
+def test_spool_is_appended_and_compacted_rarely(tmp_path):
+    path = str(tmp_path / "q.jsonl")
+    q = FixQueue(path, maxlen=10)
+    for i in range(100):
+        q.push({"ts": i})
+        if i % 3 == 0:
+            q.discard_newest()
+    q.discard_oldest(4)
+    # Appends, with a rewrite every ~maxlen lines, instead of one per push/send (~120)
+    assert q.compactions < 20
+    expected = [f["ts"] for f in q.fixes]
+    assert [f["ts"] for f in FixQueue(path, maxlen=10).fixes] == expected
+    with open(path) as f:
+        assert len(f.readlines()) < 2 * 10
+
+
+def test_batch_endpoint_logs_history_only():
+    client = app.test_client()
+    before = dict(last_events_by_vehicle)
+    r = client.post("/api/vehicle/batch", json={"id": "BACKFILL1", "fixes": [
+        {"lat": 12.9715, "lon": 77.5945, "speed": 30, "ts": 1700000000.0},  # inside threshold
+        {"lat": "bad"},
+    ]})
+    assert r.get_json() == {"ok": True, "accepted": 1}
+    assert last_events_by_vehicle == before  # no live state / decision
+
+    with open(results_logger.get_logger().csv_file, newline="", encoding="utf-8") as f:
+        rows = [row for row in csv.DictReader(f) if row["vehicle_id"] == "BACKFILL1"]
+    assert len(rows) == 1
+    assert rows[0]["server_status"] == "backfill"
+    assert rows[0]["priority_triggered"] == "False"
+    assert rows[0]["timestamp"].startswith("2023-11-1")
@@ -0,0 +1,37 @@
+import json, os, subprocess, sys
+
+import pytest
+
+ROOT = os.path.abspath(".")
+# Generous enough for a cold CI box; the point is catching import-time work
+# such as the old eager ResultsLogger() creating files
+IMPORT_BUDGET_S = float(os.getenv("IMPORT_BUDGET_S", "3.0"))
+
+MODULES = [
+    "server.server",
+    "traffic_controller.traffic_controller",
+    "vehicle.vehicle_sim",
+    "vehicle.firetruck_sim",
+    "vehicle.scenario_sim",
+]
+
+PROBE = """
+import importlib, json, sys, time
+t0 = time.perf_counter()
+importlib.import_module(sys.argv[1])
+print(json.dumps({"seconds": time.perf_counter() - t0}))
+"""
+
+
+@pytest.mark.parametrize("module", MODULES)
+def test_import_has_no_side_effects_and_fits_budget(module, tmp_path):
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    env.pop("RESULTS_DB", None)
+    proc = subprocess.run(
+        [sys.executable, "-c", PROBE, module],
+        cwd=tmp_path, env=env, capture_output=True, text=True, timeout=60,
+    )
+    assert proc.returncode == 0, proc.stderr
+    seconds = json.loads(proc.stdout.strip().splitlines()[-1])["seconds"]
+    assert not (tmp_path / "results").exists(), f"importing {module} created results/"
+    assert seconds < IMPORT_BUDGET_S, f"{module} took {seconds:.2f}s to import"
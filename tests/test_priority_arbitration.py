@@ -0,0 +1,137 @@
+import sys, os, random, threading, time
+sys.path.append(os.path.abspath("."))
+
+from traffic_controller.scheduler import SignalScheduler
+
+
+class ManualClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _scheduler():
+    clock, applied = ManualClock(), []
+    sched = SignalScheduler(lambda mode, d: applied.append((mode, d)), cycle_ns=5, cycle_ew=5, clock=clock)
+    sched.sync()
+    return sched, clock, applied
+
+
+def test_higher_class_preempts_and_lower_resumes_after():
+    sched, clock, applied = _scheduler()
+    fire = sched.priority("EW", 20, vehicle_id="FIRT001")
+    assert fire["granted"] and sched.current() == ("priority", "EW")
+
+    clock.now = 2.0
+    amb = sched.priority("NS", 10, vehicle_id="AMB001")
+    assert amb["granted"] and sched.current() == ("priority", "NS")
+
+    clock.now = 12.5  # ambulance ended; firetruck request (until 20) takes over
+    sched.sync()
+    assert sched.current() == ("priority", "EW")
+    clock.now = 20.5
+    sched.sync()
+    assert sched.current() == ("normal", "EW")
+    assert applied == [("normal", "NS"), ("priority", "EW"), ("priority", "NS"), ("priority", "EW"), ("normal", "EW")]
+
+
+def test_release_only_drops_that_vehicles_hold():
+    sched, clock, _ = _scheduler()
+    sched.hold("NS", vehicle_id="AMB001")
+    sched.hold("EW", vehicle_id="FIRT001")
+    assert sched.current() == ("priority", "NS")
+
+    # The firetruck's hold ending must not cancel the ambulance's
+    sched.release("FIRT001")
+    assert sched.current() == ("priority", "NS")
+    sched.release("AMB001")
+    assert sched.current() == ("normal", "NS")
+
+
+def test_same_vehicle_requests_merge_and_extend():
+    sched, clock, _ = _scheduler()
+    sched.priority("NS", 10, vehicle_id="AMB001")
+    clock.now = 8.0
+    sched.priority("NS", 10, vehicle_id="AMB001")
+    assert len(sched.pending()) == 1
+    clock.now = 15.0
+    sched.sync()
+    assert sched.current() == ("priority", "NS")
+    clock.now = 18.0
+    sched.sync()
+    assert sched.current() == ("normal", "NS")
+
+
+def test_eta_breaks_ties_within_a_class():
+    sched, clock, _ = _scheduler()
+    sched.hold("EW", vehicle_id="AMB002", eta=40.0)
+    assert sched.hold("NS", vehicle_id="AMB001", eta=8.0)["granted"]
+    assert sched.current() == ("priority", "NS")
+
+
+def test_stress_overlapping_requests_single_worker():
+    lock = threading.Lock()
+    applying = []
+    overlaps = []
+
+    def apply(mode, direction):
+        if not lock.acquire(blocking=False):
+            overlaps.append((mode, direction))
+            return
+        try:
+            applying.append((mode, direction))
+        finally:
+            lock.release()
+
+    sched = SignalScheduler(apply, cycle_ns=0.05, cycle_ew=0.05)
+    sched.start()
+    baseline_threads = threading.active_count()
+    ids = [f"{p}{i:03d}" for p in ("AMB", "FIRT", "POL", "BUS") for i in range(25)]
+
+    def client(seed):
+        rng = random.Random(seed)
+        for _ in range(60):
+            vid = rng.choice(ids)
+            direction = rng.choice(("NS", "EW"))
+            if rng.random() < 0.3:
+                sched.hold(direction, vehicle_id=vid, eta=rng.uniform(1, 60))
+                if rng.random() < 0.9:
+                    sched.release(vid)
+            else:
+                sched.priority(direction, rng.uniform(0.01, 0.15), vehicle_id=vid, eta=rng.uniform(1, 60))
+
+    workers = [threading.Thread(target=client, args=(n,)) for n in range(8)]
+    for w in workers:
+        w.start()
+    peak_threads = threading.active_count()
+    for w in workers:
+        w.join()
+
+    sched.release()  # drop any holds left without a release
+    time.sleep(0.3)
+    try:
+        assert not overlaps
+        # 480 requests, but no per-request threads: only the 8 clients + worker
+        assert peak_threads <= baseline_threads + len(workers)
+        assert sched.winner() is None
+        assert sched.current()[0] == "normal"
+    finally:
+        sched.stop()
+
+
+def test_controller_endpoints_arbitrate_by_vehicle():
+    from traffic_controller import traffic_controller as tc
+    client = tc.app.test_client()
+    try:
+        r = client.post("/api/priority_hold", json={"direction": "EW", "vehicle_id": "FIRT001"}).get_json()
+        assert r["granted"] and r["active_direction"] == "EW"
+        r = client.post("/api/priority_hold", json={"direction": "NS", "vehicle_id": "AMB001"}).get_json()
+        assert r["granted"] and r["active_direction"] == "NS"
+        r = client.post("/api/priority_release", json={"vehicle_id": "FIRT001"}).get_json()
+        assert r["count"] == 1 and r["mode"] == "priority"
+        assert [q["key"] for q in client.get("/api/priority_queue").get_json()] == ["AMB001"]
+    finally:
+        client.post("/api/priority_release", json={})
+    assert tc.state["mode"] == "normal"
@@ -0,0 +1,623 @@
+import sys, os
+sys.path.append(os.path.abspath("."))
+
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+from pv_annotation import utils
+
+W, H = 160, 120
+
+
+class FakeBoxes:
+    def __init__(self, rows):
+        self.rows = np.asarray(rows, dtype=np.float32).reshape(-1, 6)  # x1 y1 x2 y2 conf cls
+        self.xyxy = self.rows[:, :4]
+        self.conf = self.rows[:, 4]
+        self.cls = self.rows[:, 5]
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __iter__(self):
+        for r in self.rows:
+            yield FakeBoxes([r])
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.boxes = FakeBoxes(rows)
+
+
+class FakeModel:
+    """Detects an ambulance wherever the frame is bright, plus a tiny box and a car."""
+    names = {0: "car", 1: "ambulance_on"}
+
+    def __init__(self):
+        self.calls = []
+
+    def predict(self, source, classes=None, **kw):
+        frames = source if isinstance(source, list) else [source]
+        self.calls.append((len(frames), classes))
+        results = []
+        for f in frames:
+            ys, xs = np.nonzero(f[..., 0] > 128)
+            rows = [[0, 0, 3, 3, 0.9, 1], [0, 0, W, H, 0.9, 0]]
+            if len(xs):
+                rows.append([xs.min(), ys.min(), xs.max(), ys.max(), 0.8, 1])
+            results.append(FakeResult(rows))
+        return results
+
+
+def make_video(path, n=10, step=8):
+    out = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"mp4v"), 10, (W, H))
+    for i in range(n):
+        frame = np.zeros((H, W, 3), np.uint8)
+        x = 10 + step * i
+        frame[30:90, x:x + 50] = 255
+        out.write(frame)
+    out.release()
+    return str(path)
+
+
+def read_frames(path):
+    cap = cv2.VideoCapture(str(path))
+    frames = []
+    while True:
+        ok, f = cap.read()
+        if not ok:
+            break
+        frames.append(f)
+    cap.release()
+    return frames
+
+
+def test_batched_video_matches_frame_by_frame(tmp_path):
+    video = make_video(tmp_path / "in.mp4", n=10)
+    single, batched = FakeModel(), FakeModel()
+    r1 = utils.annotate_video(video, str(tmp_path / "o1.mp4"), model=single, batch_size=1)
+    r4 = utils.annotate_video(video, str(tmp_path / "o4.mp4"), model=batched, batch_size=4)
+    assert r1["frames"] == r4["frames"] == 10
+    assert [n for n, _ in single.calls] == [1] * 10
+    assert [n for n, _ in batched.calls] == [4, 4, 2]
+    # Class filter computed once from the model names
+    assert all(classes == [1] for _, classes in batched.calls)
+    a, b = read_frames(tmp_path / "o1.mp4"), read_frames(tmp_path / "o4.mp4")
+    assert len(a) == len(b) == 10
+    assert all(np.array_equal(x, y) for x, y in zip(a, b))
+
+
+def test_image_draws_only_priority_boxes(tmp_path):
+    img = np.zeros((H, W, 3), np.uint8)
+    img[30:90, 40:90] = 255
+    src, dst = str(tmp_path / "in.png"), str(tmp_path / "out" / "in.png")
+    cv2.imwrite(src, img)
+    utils.annotate_image(src, dst, model=FakeModel())
+    out = cv2.imread(dst)
+    # Ambulance box outline drawn in green; the tiny box and the car are filtered out
+    green = (out[..., 1] == 255) & (out[..., 0] == 0) & (out[..., 2] == 0)
+    assert green[:, 40:].any()
+    assert not green[100:, :].any()
+
+
+def test_pipeline_keeps_order_and_bounds_memory():
+    import threading, time
+    in_flight, peak, lock = [0], [0], threading.Lock()
+
+    def items():
+        for i in range(50):
+            with lock:
+                in_flight[0] += 1
+                peak[0] = max(peak[0], in_flight[0])
+            yield i
+
+    seen = []
+
+    def consume(item, result):
+        time.sleep(0.001)  # slow encoder: decode must wait, not pile up
+        seen.append((item, result))
+        with lock:
+            in_flight[0] -= 1
+
+    utils.run_pipeline(items(), lambda i: i * i, consume, depth=2)
+    assert seen == [(i, i * i) for i in range(50)]
+    # depth in each queue + one item in each of the three stages
+    assert peak[0] <= 2 * 2 + 3
+
+
+def test_pipeline_reraises_stage_errors():
+    def consume(item, result):
+        if item == 3:
+            raise ValueError("encoder failed")
+
+    with pytest.raises(ValueError, match="encoder failed"):
+        utils.run_pipeline(iter(range(100)), lambda i: i, consume, depth=1)
+
+    def broken():
+        yield 1
+        raise OSError("decode failed")
+
+    with pytest.raises(OSError, match="decode failed"):
+        utils.run_pipeline(broken(), lambda i: i, lambda *a: None)
+
+
+def test_pipelined_video_matches_serial(tmp_path):
+    video = make_video(tmp_path / "in.mp4", n=9)
+    r1 = utils.annotate_video(video, str(tmp_path / "s.mp4"), model=FakeModel(), batch_size=2, pipelined=False)
+    r2 = utils.annotate_video(video, str(tmp_path / "p.mp4"), model=FakeModel(), batch_size=2)
+    assert r1["frames"] == r2["frames"] == 9
+    a, b = read_frames(tmp_path / "s.mp4"), read_frames(tmp_path / "p.mp4")
+    assert all(np.array_equal(x, y) for x, y in zip(a, b)) and len(a) == len(b) == 9
+
+
+def test_tracker_propagates_at_constant_velocity():
+    from pv_annotation.tracking import BoxTracker
+    tr = BoxTracker(decay=0.9)
+    tr.update([[0, 0, 10, 10]], [1], [0.8])
+    tr.predict(), tr.predict()
+    # Re-detected 3 frames later, 3 px to the right: velocity 1 px/frame
+    tr.update([[3, 0, 13, 10], [50, 50, 60, 60]], [1, 1], [0.8, 0.7])
+    boxes, cls, conf = tr.predict()
+    assert np.allclose(boxes[0], [4, 0, 14, 10]) and np.allclose(boxes[1], [50, 50, 60, 60])
+    assert np.allclose(conf, [0.72, 0.63]) and tr.min_conf == pytest.approx(0.63)
+    # A detection of another class never inherits the track's motion
+    tr.update([[5, 0, 15, 10]], [0], [0.9])
+    assert not tr.velocity.any()
+
+
+def test_tracker_drops_tracks_below_threshold():
+    from pv_annotation.tracking import BoxTracker
+    tr = BoxTracker(decay=0.9, drop_below=0.6)
+    tr.update([[0, 0, 10, 10], [50, 50, 60, 60]], [1, 1], [0.9, 0.65])
+    boxes, cls, conf = tr.predict()  # 0.81 and 0.585
+    assert len(tr) == 1 and np.allclose(boxes, [[0, 0, 10, 10]]) and np.allclose(conf, [0.81])
+    tr.predict(), tr.predict(), tr.predict()  # 0.9 * 0.9**4 = 0.59
+    assert len(tr) == 0 and tr.min_conf == 1.0
+
+
+def test_detect_every_k_tracks_between_keyframes(tmp_path):
+    video = make_video(tmp_path / "in.mp4", n=12, step=4)
+    frames = read_frames(video)
+    full = utils.FrameDetector(FakeModel(), 1)
+    sparse = utils.FrameDetector(FakeModel(), 4, redetect_conf=0.1)
+    ref, got = full(frames[:6]) + full(frames[6:]), sparse(frames[:6]) + sparse(frames[6:])
+    assert sparse.detected == 3 and full.detected == 12
+    for (rb, rc, _), (gb, gc, _) in zip(ref[4:], got[4:]):
+        # The moving ambulance (last box) stays within a few px of full-rate detection
+        assert gc[-1] == rc[-1] == 1
+        assert np.abs(gb[-1] - rb[-1]).max() <= 3
+
+    # Decaying confidence forces an early detection
+    eager = utils.FrameDetector(FakeModel(), 8, redetect_conf=0.75)
+    eager(frames)
+    assert eager.detected > 2
+
+    r = utils.annotate_video(video, str(tmp_path / "k.mp4"), model=FakeModel(), batch_size=4, detect_every=4)
+    assert r["frames"] == 12 and r["detected_frames"] == 3
+
+
+def test_motion_gate_skips_static_frames(tmp_path):
+    from pv_annotation.motion import MotionGate
+    gate = MotionGate()
+    rng = np.random.default_rng(0)
+    base = rng.integers(0, 255, (H, W, 3), dtype=np.uint8)
+    noisy = np.clip(base.astype(int) + rng.integers(-3, 4, base.shape), 0, 255).astype(np.uint8)
+    moved = base.copy()
+    moved[40:80, 40:80] = 255 - moved[40:80, 40:80]
+    assert [gate.moved(f) for f in (base, base, noisy, moved, moved)] == [True, False, False, True, False]
+    assert gate.hit_rate == pytest.approx(3 / 5)
+
+    # 5 frames of a moving ambulance, then a parked one for 10 frames
+    video = str(tmp_path / "hold.mp4")
+    out = cv2.VideoWriter(video, cv2.VideoWriter_fourcc(*"mp4v"), 10, (W, H))
+    for i in range(15):
+        frame = np.zeros((H, W, 3), np.uint8)
+        x = 10 + 8 * min(i, 4)
+        frame[30:90, x:x + 50] = 255
+        out.write(frame)
+    out.release()
+    model = FakeModel()
+    r = utils.annotate_video(video, str(tmp_path / "g.mp4"), model=model, batch_size=4, motion_gate=True)
+    assert r["frames"] == 15 and r["gate_checked"] == 15
+    assert r["detected_frames"] == 5 and r["gate_skipped"] == 10
+    plain = utils.annotate_video(video, str(tmp_path / "p.mp4"), model=FakeModel(), batch_size=4, motion_gate=False)
+    assert plain["detected_frames"] == 15 and plain["gate_checked"] == 0
+    a, b = read_frames(tmp_path / "g.mp4"), read_frames(tmp_path / "p.mp4")
+    assert all(np.array_equal(x, y) for x, y in zip(a, b))
+
+
+def test_onnx_postprocess_decodes_and_suppresses():
+    from pv_annotation.onnx_backend import letterbox, postprocess, preprocess
+    frame = np.zeros((320, 640, 3), np.uint8)
+    canvas, r, pad = letterbox(frame, 640)
+    assert canvas.shape == (640, 640, 3) and r == 1.0 and pad == (0, 160)
+    blob, metas = preprocess([frame, frame], 320)
+    assert blob.shape == (2, 3, 320, 320) and metas[0] == (0.5, (0, 80), (320, 640))
+
+    # 3 classes, 4 anchors as (cx, cy, w, h, s0, s1, s2) in 320 px letterbox space
+    anchors = np.array([
+        [100, 120, 40, 40, 0.0, 0.9, 0.0],   # kept
+        [102, 121, 40, 40, 0.0, 0.8, 0.0],   # same class, overlaps: suppressed
+        [101, 120, 40, 40, 0.0, 0.0, 0.7],   # other class: kept
+        [200, 200, 20, 20, 0.1, 0.0, 0.0],   # below conf
+    ], dtype=np.float32)
+    out = np.stack([anchors.T, anchors.T])
+    xyxy, cls, conf = postprocess(out, metas, conf=0.25, iou=0.45)[0]
+    assert cls.tolist() == [1, 2] and np.allclose(conf, [0.9, 0.7])
+    # Back to frame pixels: remove the 80 px pad, undo the 0.5 scale
+    assert np.allclose(xyxy[0], [160, 40, 240, 120])
+    only2 = postprocess(out, metas, conf=0.25, iou=0.45, classes=[2])[0]
+    assert only2[1].tolist() == [2]
+
+
+def test_registry_warms_caches_and_evicts_lru(monkeypatch):
+    from pv_annotation import registry as registry_mod
+    loaded, warmed = [], []
+
+    def loader(weights):
+        loaded.append(weights)
+        model = FakeModel()
+        model.path = weights
+        return model
+
+    monkeypatch.setattr(registry_mod, "model_bytes", lambda model, weights: 1)
+    reg = registry_mod.ModelRegistry({"a": "a.pt", "b": "b.pt", "c": "c.pt"}, loader, utils._model_classes,
+                                     warm=lambda m: warmed.append(m.path), max_bytes=2)
+    (a,) = reg.preload()
+    assert a.name == "a" and warmed == ["a.pt"]
+    assert a.names == {0: "car", 1: "ambulance_on"} and a.allowed == [1]
+    assert reg.get("a") is a and loaded == ["a.pt"]
+    reg.get("b")
+    reg.get("a")          # a is now most recently used
+    reg.get("c")          # over the cap: evicts b, not a
+    assert reg.loaded() == ["a", "c"] and reg.evictions == 1
+    reg.get("b")
+    assert loaded == ["a.pt", "b.pt", "c.pt", "b.pt"]
+    with pytest.raises(KeyError):
+        reg.get("missing")
+
+
+def test_registry_loads_outside_the_lock_and_only_once(monkeypatch):
+    import threading, time
+    from pv_annotation import registry as registry_mod
+    release, loaded = threading.Event(), []
+
+    def loader(weights):
+        loaded.append(weights)
+        if weights == "slow.pt":
+            assert release.wait(10)
+        if weights == "bad.pt":
+            raise RuntimeError("download failed")
+        return FakeModel()
+
+    monkeypatch.setattr(registry_mod, "model_bytes", lambda model, weights: 1)
+    reg = registry_mod.ModelRegistry({"fast": "fast.pt", "slow": "slow.pt", "bad": "bad.pt"}, loader,
+                                     utils._model_classes)
+    fast = reg.get("fast")
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(reg.get("slow"))) for _ in range(2)]
+    for t in threads:
+        t.start()
+    while "slow.pt" not in loaded:
+        time.sleep(0.01)
+    # While "slow" loads, loaded models and the listing stay available
+    assert reg.get("fast") is fast and [e.name for e in reg.entries()] == ["fast"]
+    release.set()
+    for t in threads:
+        t.join(10)
+    assert len(results) == 2 and results[0] is results[1]
+    assert loaded == ["fast.pt", "slow.pt"] and reg.loads == 2
+    for _ in range(2):  # a failed load is reported and retried on the next request
+        with pytest.raises(RuntimeError):
+            reg.get("bad")
+    assert loaded.count("bad.pt") == 2
+
+
+def test_model_classes_are_cached_per_model():
+    model = FakeModel()
+    first = utils._model_classes(model)
+    model.names = {0: "ambulance"}
+    assert utils._model_classes(model) is first
+    assert utils._model_classes(FakeModel())[1] == [1]
+
+
+def test_result_cache_hits_and_evicts_lru(tmp_path):
+    from pv_annotation.result_cache import ResultCache
+    src = tmp_path / "in.png"
+    src.write_bytes(b"image bytes")
+    out = tmp_path / "out.png"
+    out.write_bytes(b"x" * 100)
+    cache = ResultCache(str(tmp_path / "cache"))
+    params = {"model": "custom", "conf": 0.6}
+    k1 = cache.key(str(src), params)
+    assert k1 == cache.key(str(src), dict(params))
+    assert k1 != cache.key(str(src), dict(params, conf=0.5))
+    assert cache.get(k1) is None and cache.misses == 1
+    entry = cache.put(k1, str(out), [{"label": "ambulance_on"}])
+    assert cache.get(k1)["output"] == entry["output"] == f"{k1}/out.png"
+    with open(os.path.join(cache.root, entry["detections"])) as f:
+        assert f.read() == '[{"label": "ambulance_on"}]'
+    cache.max_bytes = int(cache.size() * 2.5)  # room for two entries
+    os.utime(os.path.join(cache.root, k1, "meta.json"), (1, 1))  # k1 least recently used
+    k2, k3 = "b" * 32, "c" * 32
+    cache.put(k2, str(out), [{"label": "ambulance_on"}])
+    cache.put(k3, str(out), [{"label": "ambulance_on"}])  # over the cap: evicts k1
+    assert cache.get(k1) is None and cache.get(k2) and cache.get(k3)
+    assert cache.size() <= cache.max_bytes
+
+
+def test_app_serves_repeated_upload_from_cache(tmp_path, monkeypatch):
+    pytest.importorskip("flask")
+    from pv_annotation import app as app_mod
+    from pv_annotation.result_cache import ResultCache
+    calls = []
+
+    def annotate(in_path, out_path, model=None):
+        calls.append(in_path)
+        return utils.annotate_image(in_path, out_path, model=FakeModel())
+
+    monkeypatch.setattr(app_mod, "UPLOAD_DIR", str(tmp_path / "uploads"))
+    monkeypatch.setattr(app_mod, "OUTPUT_DIR", str(tmp_path / "outputs"))
+    monkeypatch.setattr(app_mod, "CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(app_mod, "RESULT_CACHE", ResultCache(str(tmp_path / "cache")))
+    monkeypatch.setattr(app_mod, "annotate_image", annotate)
+    monkeypatch.setattr(app_mod, "annotation_params", lambda model, kind: {"model": model, "kind": kind})
+    os.makedirs(app_mod.UPLOAD_DIR)
+    os.makedirs(app_mod.OUTPUT_DIR)
+
+    img = np.zeros((H, W, 3), np.uint8)
+    img[30:90, 40:90] = 255
+    data = cv2.imencode(".png", img)[1].tobytes()
+    client = app_mod.app.test_client()
+    import io
+    pages = [client.post("/analyze", data={"file": (io.BytesIO(data), name)},
+                         content_type="multipart/form-data").get_data(as_text=True)
+             for name in ("a.png", "b.png")]
+    assert len(calls) == 1
+    assert "served from cache" not in pages[0] and "served from cache" in pages[1]
+    assert "/files/cache/" in pages[0] and "/files/cache/" in pages[1]
+    assert os.listdir(tmp_path / "outputs") == []  # the cache holds the only copy
+    key = os.listdir(tmp_path / "cache")[0]
+    detections = client.get(f"/files/cache/{key}/detections.json").get_json()
+    assert [d["label"] for d in detections] == ["ambulance_on"]
+
+
+class SlowModel(FakeModel):
+    def predict(self, source, **kw):
+        import time
+        time.sleep(0.05)
+        return super().predict(source, **kw)
+
+
+def wait_for(job, timeout=60):
+    import time
+    deadline = time.time() + timeout
+    while job.active and time.time() < deadline:
+        time.sleep(0.02)
+    return job
+
+
+def test_jobs_report_progress_and_cancel(tmp_path):
+    import time
+    from pv_annotation.jobs import CANCELLED, DONE, JobManager
+    video = make_video(tmp_path / "in.mp4", n=12)
+    done = []
+    manager = JobManager(workers=2, processes=False, on_done=lambda job: done.append(len(job.stats["detections"])))
+    try:
+        ok = manager.submit(video, str(tmp_path / "ok.mp4"), model=FakeModel())
+        slow = manager.submit(video, str(tmp_path / "slow.mp4"), model=SlowModel())
+        while slow.frames_done == 0 and slow.active:
+            time.sleep(0.01)
+        assert manager.cancel(slow.id)
+        assert wait_for(ok).status == DONE and wait_for(slow).status == CANCELLED
+        assert ok.frames_done == ok.frames_total == 12 and ok.info()["progress"] == 1.0
+        assert done == [12] and "detections" not in ok.stats
+        assert os.path.exists(ok.out_path) and not os.path.exists(slow.out_path)
+        assert not manager.cancel(ok.id)
+        assert [j.id for j in manager.jobs()] == [slow.id, ok.id]
+    finally:
+        manager.shutdown()
+
+
+def test_jobs_ignore_progress_after_finishing(tmp_path):
+    import time
+    from pv_annotation.jobs import DONE, JobManager
+    video = make_video(tmp_path / "in.mp4", n=4)
+    manager = JobManager(workers=1, processes=False)
+    try:
+        job = wait_for(manager.submit(video, str(tmp_path / "o.mp4"), model=FakeModel()))
+        assert job.status == DONE
+        manager._events.put((job.id, 1, 4))  # a progress event handled after _finish
+        while not manager._events.empty():
+            time.sleep(0.01)
+        time.sleep(0.05)
+        assert job.status == DONE and job.frames_done == 4
+    finally:
+        manager.shutdown()
+
+
+def test_jobs_run_in_worker_processes(tmp_path, monkeypatch):
+    from pv_annotation.jobs import DONE, FAILED, JobManager
+    monkeypatch.setenv("PV_PRELOAD", "0")
+    video = make_video(tmp_path / "in.mp4", n=6)
+    manager = JobManager(workers=2)
+    try:
+        jobs = [manager.submit(video, str(tmp_path / f"o{i}.mp4"), model=FakeModel()) for i in range(2)]
+        bad = manager.submit(str(tmp_path / "missing.mp4"), str(tmp_path / "x.mp4"), model=FakeModel())
+        assert [wait_for(j).status for j in jobs] == [DONE, DONE]
+        assert all(j.stats["frames"] == 6 for j in jobs)
+        assert wait_for(bad).status == FAILED and "Could not open video" in bad.error
+    finally:
+        manager.shutdown()
+
+
+def test_app_runs_video_uploads_as_jobs(tmp_path, monkeypatch):
+    pytest.importorskip("flask")
+    import io
+    from pv_annotation import app as app_mod
+    from pv_annotation.jobs import JobManager
+    from pv_annotation.result_cache import ResultCache
+
+    def run_video(job_id, in_path, out_path, model, events, cancel):
+        return utils.annotate_video(in_path, out_path, model=FakeModel(),
+                                    progress=lambda done, total: events.put((job_id, done, total)))
+
+    monkeypatch.setattr("pv_annotation.jobs._run_video", run_video)
+    for name in ("uploads", "outputs"):
+        os.makedirs(tmp_path / name)
+    monkeypatch.setattr(app_mod, "UPLOAD_DIR", str(tmp_path / "uploads"))
+    monkeypatch.setattr(app_mod, "OUTPUT_DIR", str(tmp_path / "outputs"))
+    monkeypatch.setattr(app_mod, "CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(app_mod, "RESULT_CACHE", ResultCache(str(tmp_path / "cache")))
+    monkeypatch.setattr(app_mod, "annotation_params", lambda model, kind: {"model": model, "kind": kind})
+    manager = JobManager(workers=1, processes=False, on_done=app_mod._job_done)
+    monkeypatch.setattr(app_mod, "_JOBS", manager)
+    client = app_mod.app.test_client()
+    data = open(make_video(tmp_path / "in.mp4", n=8), "rb").read()
+
+    def upload():
+        return client.post("/analyze", data={"file": (io.BytesIO(data), "clip.mp4")},
+                           content_type="multipart/form-data", headers={"Accept": "application/json"})
+    try:
+        resp = upload()
+        assert resp.status_code == 202
+        job = resp.get_json()
+        assert job["status"] in ("queued", "running", "done")
+        wait_for(manager.get(job["id"]))
+        status = client.get(job["status_url"]).get_json()
+        assert status["status"] == "done" and status["frames_done"] == 8
+        assert client.get(job["result_url"]).status_code == 200
+        assert client.get(status["detections_url"]).get_json()[0]["frame"] == 0
+        assert os.listdir(tmp_path / "outputs") == []
+        # Same content again: served from the cache, no new job and no second upload kept
+        again = upload()
+        assert again.status_code == 200 and again.get_json()["cached"] and len(manager.jobs()) == 1
+        assert client.get(again.get_json()["output_url"]).status_code == 200
+        assert len(os.listdir(tmp_path / "uploads")) == 1
+        assert client.get("/jobs/nope").status_code == 404
+    finally:
+        manager.shutdown()
+
+
+def mjpeg_frames(body: bytes) -> list:
+    frames = []
+    for part in body.split(b"--frame\r\n")[1:]:
+        head, jpeg = part.split(b"\r\n\r\n", 1)
+        assert b"Content-Type: image/jpeg" in head
+        frames.append(cv2.imdecode(np.frombuffer(jpeg[:-2], np.uint8), cv2.IMREAD_COLOR))
+    return frames
+
+
+def test_latest_slot_keeps_only_newest_value():
+    from pv_annotation.stream import Latest
+    slot = Latest()
+    for i in range(5):
+        slot.put(i)
+    assert slot.get(0) == (5, 4)
+    assert slot.get(5, timeout=0.01) == (5, None)
+    slot.close()
+    assert slot.get(5) == (5, None)
+
+
+def test_stream_drops_frames_for_slow_viewers(tmp_path):
+    import time
+    from pv_annotation.stream import AnnotatedStream
+    video = make_video(tmp_path / "in.mp4", n=10)
+    fast = AnnotatedStream(video, FakeModel(), realtime=False).start()
+    frames = mjpeg_frames(b"".join(fast.mjpeg()))
+    assert 1 <= len(frames) <= 10 and fast.annotated + fast.dropped == fast.captured == 10
+    # The ambulance box is drawn in green on the streamed frames
+    assert ((frames[-1][..., 1] > 200) & (frames[-1][..., 0] < 60) & (frames[-1][..., 2] < 60)).any()
+
+    slow = AnnotatedStream(video, SlowModel(), realtime=True).start()  # 10 fps source, 20 fps model
+    parts = []
+    for part in slow.mjpeg():
+        parts.append(part)
+        time.sleep(0.35)  # viewer takes ~3 fps
+    assert len(parts) < slow.annotated <= 10
+    # Still ends on the newest frame rather than lagging behind
+    assert np.array_equal(mjpeg_frames(parts[-1])[0], frames[-1])
+    assert slow.finished
+
+
+def test_app_streams_uploaded_video(tmp_path, monkeypatch):
+    pytest.importorskip("flask")
+    from pv_annotation import app as app_mod
+    from pv_annotation.stream import AnnotatedStream, StreamHub
+    os.makedirs(tmp_path / "uploads")
+    make_video(tmp_path / "uploads" / "clip.mp4", n=6)
+    monkeypatch.setattr(app_mod, "UPLOAD_DIR", str(tmp_path / "uploads"))
+    hub = StreamHub(lambda source, model: AnnotatedStream(source, FakeModel(), realtime=False))
+    monkeypatch.setattr(app_mod, "STREAMS", hub)
+    client = app_mod.app.test_client()
+    resp = client.get("/stream?source=clip.mp4")
+    assert resp.mimetype == "multipart/x-mixed-replace"
+    assert len(mjpeg_frames(resp.get_data())) >= 1
+    resp.close()
+    assert hub.streams() == []
+    assert client.get("/stream?source=../app.py").status_code == 404
+    assert client.get("/stream?source=clip.mp4&model=nope").status_code == 400
+
+
+def test_select_boxes_filters_classes_and_tiny_boxes():
+    table = utils._ClassTable({0: "car", 1: "ambulance_on", 3: "firetruck_off"})
+    assert table.mask.tolist() == [False, True, False, True] and table.classes[1] == [1, 3]
+    xyxy = np.array([[10, 10, 60, 60], [10, 10, 60, 60], [0, 0, 3, 3], [5.9, 5.2, 80.7, 90.1],
+                     [10, 10, 60, 60], [10, 10, 60, 60]], dtype=np.float32)
+    cls = np.array([1, 0, 1, 3, 7, -1], dtype=np.float32)  # 7 and -1 are not model classes
+    conf = np.array([0.9, 0.8, 0.7, 0.6, 0.5, 0.4], dtype=np.float32)
+    boxes, ids, scores = utils._select_boxes(xyxy, cls, conf, table.mask, (H, W))
+    assert boxes.tolist() == [[10, 10, 60, 60], [5, 5, 80, 90]] and ids.tolist() == [1, 3]
+    assert np.allclose(scores, [0.9, 0.6])
+    img = np.zeros((H, W, 3), np.uint8)
+    drawn = utils._draw_boxes(img, xyxy, cls, conf, table)
+    assert [d["label"] for d in drawn] == ["ambulance_on", "firetruck_off"]
+    assert utils._select_boxes(np.empty((0, 4)), np.empty(0), np.empty(0), table.mask, (H, W))[0].shape == (0, 4)
+
+
+class FakeStream:
+    def __init__(self, source, model):
+        self.source, self.model = source, model
+        self.viewers, self.finished, self.stopped = 0, False, False
+
+    def start(self):
+        return self
+
+    def stop(self):
+        self.stopped = True
+
+    def mjpeg(self):
+        return iter(())
+
+
+def test_stream_hub_opens_outside_the_lock_and_guards_cameras():
+    import threading, time
+    from pv_annotation.stream import StreamBusy, StreamHub
+    release, opened = threading.Event(), []
+
+    def factory(source, model):
+        opened.append((source, model))
+        if source == "slow.mp4":
+            assert release.wait(10)
+        return FakeStream(source, model)
+
+    hub = StreamHub(factory)
+    viewers = []
+    threads = [threading.Thread(target=lambda: viewers.append(hub.view("slow.mp4", "m"))) for _ in range(2)]
+    for t in threads:
+        t.start()
+    while ("slow.mp4", "m") not in opened:
+        time.sleep(0.01)
+    # A slow open holds up neither other sources nor the listing
+    cam = hub.view("0", "m")
+    assert [s.source for s in hub.streams()] == ["0"]
+    with pytest.raises(StreamBusy):
+        hub.view("0", "other")
+    release.set()
+    for t in threads:
+        t.join(10)
+    assert opened.count(("slow.mp4", "m")) == 1 and len(viewers) == 2
+    assert viewers[0]._stream is viewers[1]._stream and viewers[0]._stream.viewers == 2
+    cam.close()
+    assert hub.view("0", "other")._stream.model == "other"  # free again once its viewers left
@@ -0,0 +1,46 @@
+import sys, os, time
+sys.path.append(os.path.abspath("."))
+
+from results_logger import ResultsLogger
+from server.replay import load_fixes, replay, diff_decisions, in_process_sender
+
+
+def _record(tmp_path, fixes):
+    session = ResultsLogger(base_dir=str(tmp_path), role="recorded")
+    for vid, lat, lon, dist, direction, triggered in fixes:
+        session.log_vehicle_event(
+            {"distance_m": dist, "bearing": 0.0, "direction": direction,
+             "priority_triggered": triggered, "status": "priority_triggered" if triggered else "normal"},
+            {"id": vid, "lat": lat, "lon": lon, "speed": 40.0},
+        )
+    return session.csv_file
+
+
+def test_replay_matches_recorded_decisions(tmp_path):
+    csv_file = _record(tmp_path, [
+        ("AMB001", 12.9698, 77.5945, 200.2, "NS", False),
+        ("FIRT001", 12.9716, 77.5960, 162.6, "EW", False),
+        ("AMB001", 12.9715, 77.5945, 11.1, "NS", True),
+        ("AMB001", 12.9720, 77.5945, 44.5, "NS", False),  # recorded wrongly on purpose
+    ])
+    fixes = load_fixes([csv_file])
+    assert [f["id"] for f in fixes] == ["AMB001", "FIRT001", "AMB001", "AMB001"]
+
+    results = replay(fixes, in_process_sender(), speed=0)
+    mismatches = diff_decisions(results)
+    assert [m["fix"]["seq"] for m in mismatches] == [3]
+    assert all(r["latency_s"] >= 0 for r in results)
+
+
+def test_replay_preserves_inter_arrival_timing():
+    fixes = [
+        {"seq": i, "ts": 1000.0 + 2 * i, "id": "AMB001", "lat": 0.0, "lon": 0.0, "speed": 0.0,
+         "priority_triggered": False, "direction": None}
+        for i in range(3)
+    ]
+    sent_at = []
+    t0 = time.perf_counter()
+    replay(fixes, lambda payload: sent_at.append(time.perf_counter() - t0) or {}, speed=20)
+    # 2 s apart recorded -> 0.1 s apart at 20x
+    assert abs((sent_at[1] - sent_at[0]) - 0.1) < 0.05
+    assert abs((sent_at[2] - sent_at[0]) - 0.2) < 0.05
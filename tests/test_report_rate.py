@@ -0,0 +1,49 @@
+import sys, os
+sys.path.append(os.path.abspath("."))
+
+from server.server import app
+from server.utils import suggest_report_interval
+from vehicle.scenario_sim import AMB_START, INTERSECTION, instance_steps
+from benchmarks.bench_report_rate import make_trip, evaluate
+import random
+
+
+def test_interval_is_dense_near_and_sparse_far():
+    assert suggest_report_interval(50, 40, 120) == 1.0
+    assert suggest_report_interval(5000, 40, 120) == 30.0
+    near, mid = suggest_report_interval(200, 40, 120), suggest_report_interval(600, 40, 120)
+    assert 1.0 < near < mid < 30.0
+    # A stopped vehicle is treated as if moving at the floor speed
+    assert suggest_report_interval(600, 0, 120) == suggest_report_interval(600, 30, 120)
+
+
+def test_vehicle_reply_carries_next_report():
+    client = app.test_client()
+    r = client.post("/api/vehicle", json={"id": "FAR1", "lat": 13.0, "lon": 77.5945, "speed": 50})
+    data = r.get_json()
+    assert data["status"] == "normal"
+    assert data["next_report_s"] == 30.0
+
+
+def test_simulator_honours_next_report():
+    sent = []
+
+    def send(vid, lat, lon, speed):
+        sent.append((lat, lon))
+        return {"next_report_s": 4.0}
+
+    pauses = list(instance_steps("AMB001", AMB_START, INTERSECTION, 10, 1.0, send=send,
+                                 rng=random.Random(0)))
+    # Points 0, 4, 8 and the one at the intersection (10), plus the two beyond it
+    assert len(sent) == 6
+    assert sent[3] == INTERSECTION
+    assert round(sum(pauses[:3])) == 10
+
+
+def test_adaptive_beats_fixed_rate_on_messages_at_same_accuracy():
+    rng = random.Random(1)
+    trips = [make_trip(rng) for _ in range(50)]
+    fixed = evaluate(trips, 1.0, seed=1)
+    adaptive = evaluate(trips, None, seed=1)
+    assert adaptive["messages_per_trip"] < fixed["messages_per_trip"] / 3
+    assert adaptive["trigger_lag_max_s"] <= fixed["trigger_lag_max_s"] + 0.05
@@ -0,0 +1,73 @@
+import csv, sys, os
+sys.path.append(os.path.abspath("."))
+
+from results_analytics import analyze, analyze_file
+
+HEADER = ['timestamp', 'event_type', 'vehicle_id', 'latitude', 'longitude', 'speed', 'distance_m',
+          'bearing', 'direction', 'priority_triggered', 'server_status', 'controller_mode',
+          'controller_direction', 'detail']
+
+
+def _vehicle(ts, vid, dist, triggered):
+    return [ts, 'VEHICLE_DETECTION', vid, 0, 0, 40, dist, 0, 'NS', triggered, '', '', '', '']
+
+
+def _controller(ts, mode, direction):
+    return [ts, 'CONTROLLER_STATE_CHANGE', '', '', '', '', '', '', '', '', '', mode, direction, '']
+
+
+def _write(path, rows):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        w = csv.writer(f)
+        w.writerow(HEADER)
+        w.writerows(rows)
+    return str(path)
+
+
+ROWS = [
+    _controller('2025-01-01 10:00:00', 'normal', 'NS'),
+    _vehicle('2025-01-01 10:00:00', 'AMB001', 200.0, False),
+    _controller('2025-01-01 10:00:05', 'normal', 'EW'),
+    _vehicle('2025-01-01 10:00:06', 'AMB001', 95.0, True),
+    _controller('2025-01-01 10:00:06', 'priority', 'NS'),
+    _vehicle('2025-01-01 10:00:09', 'AMB001', 30.0, True),
+    _vehicle('2025-01-01 10:00:12', 'AMB001', 160.0, False),
+    _controller('2025-01-01 10:00:12', 'normal', 'NS'),
+    [ '2025-01-01 10:00:13', 'ERROR', '', '', '', '', '', '', '', '', 'SERVER_CONTROLLER_COMMUNICATION', '', '', 'refused'],
+    _vehicle('2025-01-01 10:10:00', 'AMB001', 110.0, True),  # new approach after a gap
+    _vehicle('2025-01-01 10:10:02', 'FIRT001', 50.0, True),
+]
+
+
+def test_analytics_metrics(tmp_path):
+    report = analyze_file(_write(tmp_path / 'results_a.csv', ROWS), chunk_rows=2).to_dict()
+    amb = report['vehicles']['AMB001']
+    assert amb['approaches'] == 2
+    assert amb['time_in_priority_s'] == 6.0
+    assert report['distance_at_trigger_m']['count'] == 3
+    assert report['distance_at_trigger_m']['min'] == 50.0
+    assert report['controller_dwell']['normal NS']['total_s'] == 5.0 + (600 + 2 - 12)
+    assert report['controller_dwell']['priority NS']['total_s'] == 6.0
+    assert report['errors']['by_context'] == {'SERVER_CONTROLLER_COMMUNICATION': 1}
+
+
+def test_chunking_and_workers_do_not_change_results(tmp_path):
+    a = _write(tmp_path / 'results_a.csv', ROWS)
+    b = _write(tmp_path / 'results_b.csv', ROWS)
+    whole = analyze_file(a, chunk_rows=10000).to_dict()
+    assert analyze_file(a, chunk_rows=1).to_dict() == whole
+
+    merged = analyze([a, b], chunk_rows=3, workers=2).to_dict()
+    assert merged['vehicles']['AMB001']['approaches'] == 2 * whole['vehicles']['AMB001']['approaches']
+    assert merged['errors']['total'] == 2
+
+
+def test_backfilled_rows_do_not_break_approaches(tmp_path):
+    backfill = [_vehicle(f'2025-01-01 10:0{i}:30', 'AMB001', 300.0, False) for i in range(5)]
+    for row in backfill:
+        row[10] = 'backfill'
+    report = analyze_file(_write(tmp_path / 'results_a.csv', ROWS + backfill), chunk_rows=3).to_dict()
+    amb = report['vehicles']['AMB001']
+    assert amb['fixes'] == 5 + 5
+    assert amb['approaches'] == 2 and amb['time_in_priority_s'] == 6.0
+    assert report['span_hours'] == round((600 + 2) / 3600, 3)
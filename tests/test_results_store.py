@@ -0,0 +1,47 @@
+import sqlite3, sys, os
+import pytest
+sys.path.append(os.path.abspath("."))
+
+from results_logger import EventStore, SQLiteEventStore
+
+
+def test_sqlite_store_batches_and_indexes(tmp_path):
+    path = str(tmp_path / "events.db")
+    store = SQLiteEventStore(path, batch_size=3, flush_interval=0, source="test")
+    reader = sqlite3.connect(path)
+
+    store.write("VEHICLE_DETECTION", {"vehicle_id": "AMB001", "direction": "NS", "distance_m": 80.0})
+    store.write("CONTROLLER_STATE_CHANGE", {"mode": "priority", "direction": "NS"})
+    # Below batch size nothing is committed yet
+    assert reader.execute("SELECT COUNT(*) FROM events").fetchone()[0] == 0
+
+    store.write("ERROR", {"context": "TEST", "error": "boom"})
+    assert reader.execute("SELECT COUNT(*) FROM events").fetchone()[0] == 3
+
+    store.write("PRIORITY_TRIGGERED", {"direction": "EW", "duration": 10})
+    store.close()
+    rows = reader.execute("SELECT event_type, vehicle_id, direction, source FROM events ORDER BY id").fetchall()
+    assert rows[0] == ("VEHICLE_DETECTION", "AMB001", "NS", "test")
+    assert rows[-1] == ("PRIORITY_TRIGGERED", None, "EW", "test")
+
+    assert reader.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    indexed = {r[0] for r in reader.execute("SELECT sql FROM sqlite_master WHERE type = 'index'")}
+    assert any("vehicle_id" in sql for sql in indexed)
+    assert any("event_type" in sql for sql in indexed)
+
+
+def test_sqlite_store_drops_writes_after_close(tmp_path):
+    path = str(tmp_path / "events.db")
+    store = SQLiteEventStore(path, batch_size=1, flush_interval=0.05, source="test")
+    store.write("ERROR", {"context": "TEST", "error": "before"})
+    store.close()
+    store.write("ERROR", {"context": "TEST", "error": "after"})  # e.g. late shutdown logging
+    store.flush()
+    assert store.dropped == 1
+    reader = sqlite3.connect(path)
+    assert reader.execute("SELECT COUNT(*) FROM events").fetchone()[0] == 1
+
+
+def test_event_store_requires_write():
+    with pytest.raises(TypeError):
+        EventStore()
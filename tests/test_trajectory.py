@@ -0,0 +1,76 @@
+import sys, os
+sys.path.append(os.path.abspath("."))
+
+import numpy as np
+from vehicle.trajectory import (M_PER_DEG_LAT, NoiseModel, build_trajectory, route_trajectory,
+                                trajectory_steps, waypoint_steps)
+
+# 1 km due north at a steady 36 km/h (10 m/s)
+LINE = [(12.9700, 77.5946), (12.9700 + 1000 / M_PER_DEG_LAT, 77.5946)]
+
+
+def test_timing_follows_speed_profile():
+    traj = build_trajectory(LINE, [36, 36], tick_s=1.0, cache_dir="")
+    assert abs(traj.duration - 100) <= 1
+    step_m = np.diff(traj.lat) * M_PER_DEG_LAT
+    assert np.allclose(step_m, 10, atol=0.01)
+    assert np.allclose(traj.speed, 36)
+
+
+def test_seeded_noise_is_deterministic_and_cached(tmp_path):
+    noise = NoiseModel(sigma_m=5, dropout_rate=0.05, multipath_rate=0.05)
+    a = build_trajectory(LINE, [36, 36], 0.5, seed=3, noise=noise, cache_dir=str(tmp_path))
+    files = list(tmp_path.glob("*.npy"))
+    assert len(files) == 1
+    b = build_trajectory(LINE, [36, 36], 0.5, seed=3, noise=noise, cache_dir=str(tmp_path))
+    assert np.array_equal(a.data, b.data)
+    assert np.array_equal(np.load(files[0]), a.data)
+    c = build_trajectory(LINE, [36, 36], 0.5, seed=4, noise=noise, cache_dir=str(tmp_path))
+    assert not np.array_equal(a.lat, c.lat)
+    assert len(list(tmp_path.glob("*.npy"))) == 2
+
+
+def test_dropout_and_multipath_bursts():
+    clean = build_trajectory(LINE, [36, 36], 0.1, cache_dir="")
+    dropped = build_trajectory(LINE, [36, 36], 0.1, seed=1, noise=NoiseModel(dropout_rate=0.05, dropout_len=4),
+                               cache_dir="")
+    lost = 1 - dropped.valid.mean()
+    assert 0.05 < lost < 0.4
+    assert len(dropped.fixes()) == dropped.valid.sum()
+
+    bent = build_trajectory(LINE, [36, 36], 0.1, seed=1, noise=NoiseModel(multipath_rate=0.02, multipath_m=30),
+                            cache_dir="")
+    m_per_deg_lon = M_PER_DEG_LAT * np.cos(np.radians(LINE[0][0]))
+    off_m = np.hypot((bent.lat - clean.lat) * M_PER_DEG_LAT, (bent.lon - clean.lon) * m_per_deg_lon)
+    assert (off_m > 1).any() and (off_m == 0).any()
+    assert off_m.max() <= 45.01  # multipath_m * 1.5
+
+
+def test_steps_honour_next_report():
+    traj = route_trajectory([(*LINE[0], 36), (*LINE[1], 36)], 1.0, cache_dir="")
+    sent = []
+
+    def send(vid, lat, lon, speed):
+        sent.append(lat)
+        return {"next_report_s": 10}
+
+    waits = list(trajectory_steps("AMB1", traj, send))
+    assert len(sent) == len(traj) // 10 + (len(traj) % 10 > 0)
+    assert waits[0] == 0 and all(w == 10 for w in waits[1:])
+    assert len(list(trajectory_steps("AMB1", traj, send, adaptive=False))) == len(traj)
+
+
+def test_waypoint_steps_move_by_time_not_by_waypoint():
+    route = [(*LINE[0], 36), (*LINE[1], 36)]  # 1 km, waypoints 100 s apart
+    sent = []
+
+    def send(vid, lat, lon, speed):
+        sent.append(lat)
+        return {"next_report_s": 10}
+
+    waits = list(waypoint_steps("AMB1", route, 100, send))
+    assert waits == [10] * 10 and len(sent) == 11
+    # 10 s of route time per report = 100 m at 36 km/h, ending on the last waypoint
+    assert np.allclose(np.diff(sent) * M_PER_DEG_LAT, 100)
+    assert sent[-1] == LINE[1][0]
+    assert list(waypoint_steps("AMB1", route, 100, send, adaptive=False)) == [100]
@@ -0,0 +1,72 @@
+import sys, os
+sys.path.append(os.path.abspath("."))
+
+from traffic_controller.gpio_control import FakeBackend, SignalOutput
+from traffic_controller.scheduler import SignalScheduler
+from vehicle.scenario_sim import AMB_START, INTERSECTION, instance_steps
+from virtual_day import DaySimulation
+from virtual_time import VirtualLoop
+
+
+def _scheduled(loop, **kwargs):
+    events = []
+    sched = SignalScheduler(lambda mode, d: events.append((loop.now(), mode, d)), clock=loop.clock.now, **kwargs)
+    loop.watch(sched)
+    return sched, events
+
+
+def test_hour_of_normal_cycling_in_virtual_time():
+    loop = VirtualLoop()
+    _, events = _scheduled(loop, cycle_ns=5, cycle_ew=5)
+    loop.run_until(3600)
+    assert len(events) == 721  # initial NS + one flip every 5 s
+    assert [e[0] for e in events[:4]] == [0, 5, 10, 15]
+    assert [e[2] for e in events[:3]] == ["NS", "EW", "NS"]
+    assert loop.now() == 3600
+
+
+def test_timed_priority_in_virtual_time():
+    loop = VirtualLoop()
+    sched, events = _scheduled(loop, cycle_ns=5, cycle_ew=5)
+    loop.call_at(12, sched.priority, "EW", 10)
+    loop.run_until(40)
+    assert (12, "priority", "EW") in events
+    # Priority ends at 22, then EW stays green for a full phase
+    assert (22, "normal", "EW") in events
+    assert (27, "normal", "NS") in events
+
+
+def test_interlock_does_not_shorten_green():
+    loop = VirtualLoop()
+    backend = FakeBackend(clock=loop.clock.now)
+    out = SignalOutput(backend, yellow_s=3, all_red_s=1, sleep=loop.clock.sleep)
+    sched = SignalScheduler(lambda mode, d: out.set_phase(d == "NS", d == "EW"), 5, 5, clock=loop.clock.now)
+    loop.watch(sched)
+    loop.run_until(60)
+    on = [t for t, name, v in backend.writes if name == "EW_GREEN" and v == 1]
+    off = [t for t, name, v in backend.writes if name == "EW_GREEN" and v == 0 and t > on[0]]
+    assert off[0] - on[0] == 5
+
+
+def test_simulator_steps_run_in_virtual_time():
+    loop = VirtualLoop()
+    sent = []
+    steps = instance_steps("AMB001", AMB_START, INTERSECTION, 10, 1.0,
+                           send=lambda vid, lat, lon, speed: sent.append(loop.now()))
+    loop.spawn(steps)
+    loop.run_until(3600)
+    assert len(sent) == 13  # 11 approach points + 2 beyond the intersection
+    assert 10 < sent[-1] < 14
+
+
+def test_day_simulation_is_fast_and_deterministic():
+    a = DaySimulation(hours=24, trips_per_hour=6, seed=7).run()
+    b = DaySimulation(hours=24, trips_per_hour=6, seed=7).run()
+    for s in (a, b):
+        s.pop("wall_s")
+        s.pop("sim_s_per_wall_s")
+    assert a == b
+    assert a["simulated_s"] == 24 * 3600
+    assert a["trips_triggered"] > 50
+    assert a["conflicts"] == 0
+    assert a["pending_requests"] == 0
@@ -0,0 +1,129 @@
+"""
+Arbitration of overlapping priority requests.
+
+Every hold / timed-priority request is an entry in one priority queue
+ordered by (vehicle class, ETA, arrival order); the entry at the top owns
+the green. Semantics:
+
+- A higher-ranked request (ambulance > firetruck > police > other, then
+  earliest ETA, then first come) preempts a lower-ranked one; the lower one
+  stays queued and gets the green once everything above it has ended.
+- Timed requests have an absolute deadline (submit time + duration); one
+  that expires while preempted is dropped, it is not replayed later.
+- A repeat request from the same key (vehicle) merges into its entry: the
+  deadline is extended, ETA and direction updated, arrival order kept.
+- Requests without a vehicle key are keyed by direction, so anonymous
+  same-direction requests merge instead of racing each other.
+"""
+
+import heapq
+import itertools
+import math
+from typing import Dict, List, Optional
+
+VEHICLE_CLASS_RANK = {"ambulance": 0, "firetruck": 1, "police": 2, "other": 3}
+
+
+def vehicle_class(vehicle_id: Optional[str], explicit: Optional[str] = None) -> str:
+    """Classify a request by explicit class or by vehicle ID prefix (AMB001, FIRT001...)."""
+    if explicit and explicit.lower() in VEHICLE_CLASS_RANK:
+        return explicit.lower()
+    vid = (vehicle_id or "").upper()
+    if "AMB" in vid:
+        return "ambulance"
+    if "FIR" in vid:
+        return "firetruck"
+    if "POL" in vid:
+        return "police"
+    return "other"
+
+
+class PriorityRequest:
+    __slots__ = ("key", "direction", "vehicle_class", "eta", "until", "seq", "version")
+
+    def __init__(self, key, direction, vehicle_class, eta, until, seq, version):
+        self.key = key
+        self.direction = direction
+        self.vehicle_class = vehicle_class
+        self.eta = eta
+        self.until = until  # math.inf for holds
+        self.seq = seq
+        self.version = version  # matches this request's live heap entry
+
+    def sort_key(self):
+        return (VEHICLE_CLASS_RANK[self.vehicle_class], self.eta, self.seq)
+
+    def to_dict(self) -> dict:
+        return {
+            "key": self.key,
+            "direction": self.direction,
+            "vehicle_class": self.vehicle_class,
+            "eta_s": None if math.isinf(self.eta) else self.eta,
+            "until": None if math.isinf(self.until) else self.until,
+            "hold": math.isinf(self.until),
+        }
+
+
+class PriorityArbiter:
+    """Heap of outstanding requests with lazy removal of stale entries."""
+
+    def __init__(self):
+        self._heap: List[tuple] = []
+        self._requests: Dict[str, PriorityRequest] = {}
+        self._seq = itertools.count()
+        # Heap entries are validated against a process-unique stamp, so an
+        # entry left over from a released key can't match a re-submitted one
+        self._stamp = itertools.count()
+
+    def __len__(self):
+        return len(self._requests)
+
+    def submit(self, key: str, direction: str, now: float, duration: Optional[float] = None,
+               vehicle_class: str = "other", eta: Optional[float] = None) -> PriorityRequest:
+        """Add or merge a request; duration None means hold until release."""
+        until = math.inf if duration is None else now + max(0.0, float(duration))
+        eta = math.inf if eta is None else float(eta)
+        req = self._requests.get(key)
+        if req is None:
+            req = PriorityRequest(key, direction, vehicle_class, eta, until, next(self._seq), next(self._stamp))
+            self._requests[key] = req
+        else:
+            req.direction = direction
+            req.vehicle_class = vehicle_class
+            req.eta = eta
+            req.until = max(req.until, until)
+            req.version = next(self._stamp)
+        heapq.heappush(self._heap, (req.sort_key(), req.version, req.key))
+        if len(self._heap) > 2 * len(self._requests) + 32:
+            # Repeated merges leave superseded entries behind; rebuild
+            self._heap = [(r.sort_key(), r.version, r.key) for r in self._requests.values()]
+            heapq.heapify(self._heap)
+        return req
+
+    def release(self, key: Optional[str] = None) -> int:
+        """Drop one request, or all of them when key is None; return how many."""
+        if key is None:
+            n = len(self._requests)
+            self._requests.clear()
+            self._heap.clear()
+            return n
+        return 1 if self._requests.pop(key, None) is not None else 0
+
+    def winner(self, now: float) -> Optional[PriorityRequest]:
+        """The request that owns the green at ``now`` (expired/stale entries are discarded)."""
+        while self._heap:
+            _, version, key = self._heap[0]
+            req = self._requests.get(key)
+            if req is None or req.version != version:
+                heapq.heappop(self._heap)
+                continue
+            if req.until <= now:
+                heapq.heappop(self._heap)
+                del self._requests[key]
+                continue
+            return req
+        return None
+
+    def pending(self, now: float) -> List[PriorityRequest]:
+        """Unexpired requests in arbitration order."""
+        return sorted((r for r in self._requests.values() if r.until > now), key=PriorityRequest.sort_key)
@@ -2,9 +2,15 @@
 Hardware abstraction for traffic lights.
 - SIMULATE=True: prints states to console
 - SIMULATE=False: uses RPi.GPIO pins mapping
+
+SignalOutput caches the last value written to every pin and only writes the
+pins that differ. A phase change is applied as one ordered transaction:
+the losing green goes yellow, then all-red, then the new green (pins are
+switched off before others are switched on, so two greens never overlap).
+FakeBackend records timestamped writes for tests.
 """
 
-import os, time
+import os, time, threading
 
 SIMULATE = os.getenv("SIMULATE", "true").lower() == "true"
 
@@ -17,31 +23,133 @@ PINS = {
     "EW_GREEN": 25
 }
 
-if not SIMULATE:
-    try:
+# Interlock timings; default to 0 in SIMULATE so the console demo stays snappy
+YELLOW_SECONDS = float(os.getenv("YELLOW_SECONDS", "0" if SIMULATE else "3"))
+ALL_RED_SECONDS = float(os.getenv("ALL_RED_SECONDS", "0" if SIMULATE else "1"))
+
+
+class PinBackend:
+    """Writes single pin values; subclasses talk to real or fake hardware."""
+
+    def write(self, pin, value):
+        raise NotImplementedError
+
+    def commit(self, pins):
+        """Called once after each batch of writes with the full pin state."""
+        pass
+
+    def cleanup(self):
+        pass
+
+
+class RPiBackend(PinBackend):
+    def __init__(self, pins=PINS):
         import RPi.GPIO as GPIO
+        self.GPIO = GPIO
         GPIO.setmode(GPIO.BCM)
-        for pin in PINS.values():
+        for pin in pins.values():
             GPIO.setup(pin, GPIO.OUT)
             GPIO.output(pin, 0)
+
+    def write(self, pin, value):
+        self.GPIO.output(pin, value)
+
+    def cleanup(self):
+        self.GPIO.cleanup()
+
+
+class ConsoleBackend(PinBackend):
+    def write(self, pin, value):
+        pass
+
+    def commit(self, pins):
+        print(f"[CTRL] NS_GREEN={bool(pins.get('NS_GREEN'))} | EW_GREEN={bool(pins.get('EW_GREEN'))}"
+              + (" | YELLOW" if pins.get("NS_YELLOW") or pins.get("EW_YELLOW") else ""))
+
+
+class FakeBackend(PinBackend):
+    """Records (timestamp, pin name, value) for every write."""
+
+    def __init__(self, pins=PINS, clock=time.monotonic):
+        self.names = {pin: name for name, pin in pins.items()}
+        self.clock = clock
+        self.writes = []
+        self.levels = {}
+
+    def write(self, pin, value):
+        name = self.names[pin]
+        self.writes.append((self.clock(), name, value))
+        self.levels[name] = value
+
+    def count(self, name=None):
+        return sum(1 for _, n, _ in self.writes if name is None or n == name)
+
+
+def _phase_pins(ns_green, ew_green):
+    return {
+        "NS_RED": 0 if ns_green else 1, "NS_YELLOW": 0, "NS_GREEN": 1 if ns_green else 0,
+        "EW_RED": 0 if ew_green else 1, "EW_YELLOW": 0, "EW_GREEN": 1 if ew_green else 0,
+    }
+
+
+class SignalOutput:
+    def __init__(self, backend, pins=PINS, yellow_s=YELLOW_SECONDS, all_red_s=ALL_RED_SECONDS, sleep=time.sleep):
+        self.backend = backend
+        self.pins = pins
+        self.yellow_s = yellow_s
+        self.all_red_s = all_red_s
+        self.sleep = sleep
+        self.levels = {}  # last value written per pin name (unknown until first write)
+        self._lock = threading.Lock()
+
+    def _write(self, target):
+        """Write only the pins that differ; offs before ons."""
+        changed = [(name, v) for name, v in target.items() if self.levels.get(name) != v]
+        changed.sort(key=lambda item: item[1])
+        for name, value in changed:
+            self.backend.write(self.pins[name], value)
+            self.levels[name] = value
+        if changed:
+            self.backend.commit(dict(self.levels))
+        return len(changed)
+
+    def set_phase(self, ns_green=False, ew_green=False):
+        """Move to the given phase through yellow/all-red; return pin writes made."""
+        with self._lock:
+            target = _phase_pins(ns_green, ew_green)
+            losing = [d for d in ("NS", "EW") if self.levels.get(f"{d}_GREEN") == 1 and not target[f"{d}_GREEN"]]
+            writes = 0
+            if losing and (self.yellow_s > 0 or self.all_red_s > 0):
+                yellow = dict(self.levels)
+                for d in losing:
+                    yellow.update({f"{d}_GREEN": 0, f"{d}_YELLOW": 1, f"{d}_RED": 0})
+                if self.yellow_s > 0:
+                    writes += self._write(yellow)
+                    self.sleep(self.yellow_s)
+                writes += self._write(_phase_pins(False, False))
+                if self.all_red_s > 0:
+                    self.sleep(self.all_red_s)
+            writes += self._write(target)
+            return writes
+
+
+def _default_backend():
+    global SIMULATE
+    if SIMULATE:
+        return ConsoleBackend()
+    try:
+        return RPiBackend()
     except Exception as e:
         print("GPIO init failed, falling back to SIMULATE:", e)
         SIMULATE = True
+        return ConsoleBackend()
 
-def set_signal(ns_green=False, ew_green=False):
-    if SIMULATE:
-        print(f"[CTRL] NS_GREEN={ns_green} | EW_GREEN={ew_green}")
-        return
 
-    # Real GPIO
-    GPIO.output(PINS["NS_GREEN"], 1 if ns_green else 0)
-    GPIO.output(PINS["NS_RED"], 0 if ns_green else 1)
-    GPIO.output(PINS["NS_YELLOW"], 0)
-    GPIO.output(PINS["EW_GREEN"], 1 if ew_green else 0)
-    GPIO.output(PINS["EW_RED"], 0 if ew_green else 1)
-    GPIO.output(PINS["EW_YELLOW"], 0)
+output = SignalOutput(_default_backend())
+
+
+def set_signal(ns_green=False, ew_green=False):
+    output.set_phase(ns_green=ns_green, ew_green=ew_green)
 
 def cleanup():
-    if not SIMULATE:
-        import RPi.GPIO as GPIO
-        GPIO.cleanup()
\ No newline at end of file
+    output.backend.cleanup()
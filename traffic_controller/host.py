@@ -0,0 +1,306 @@
+"""
+Multi-intersection controller host.
+
+Runs many simulated intersections in one process (e.g. a whole corridor).
+Phase state lives in NumPy arrays indexed by intersection, and one shared
+tick advances every intersection at once with vectorized comparisons.
+Priority requests use the same arbitration rules as the single-intersection
+controller (see arbiter.py); an arbiter is only created for intersections
+that actually have requests.
+
+Routes are keyed by intersection ID:
+    POST /api/<iid>/priority          {"direction", "duration", "vehicle_id"?, "eta_s"?}
+    POST /api/<iid>/priority_hold     {"direction", "vehicle_id"?, "eta_s"?}
+    POST /api/<iid>/priority_release  {"vehicle_id"?}
+    GET  /api/<iid>/state
+    GET  /api/intersections
+
+Usage:
+    python -m traffic_controller.host --count 2000 --port 5002
+"""
+
+import argparse
+import math
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional
+
+import numpy as np
+from flask import Flask, request, jsonify, abort
+from flask_cors import CORS
+
+from .arbiter import PriorityArbiter, vehicle_class
+from results_logger import log_priority_trigger, configure as configure_results
+
+DIRECTIONS = ("NS", "EW")
+NS, EW = 0, 1
+NORMAL, PRIORITY = 0, 1
+NO_DEADLINE = np.inf
+
+
+class IntersectionHost:
+    """Phase state for N intersections in compact arrays."""
+
+    def __init__(self, ids: Iterable[str], cycle_ns: float = 5, cycle_ew: float = 5,
+                 offsets: Optional[np.ndarray] = None, tick_s: float = 0.1,
+                 clock: Callable[[], float] = time.monotonic):
+        self.ids = list(ids)
+        self.index: Dict[str, int] = {iid: i for i, iid in enumerate(self.ids)}
+        n = len(self.ids)
+        self.clock = clock
+        self.tick_s = tick_s
+
+        # cycle[:, 0] = NS green time, cycle[:, 1] = EW green time
+        self.cycle = np.empty((n, 2), dtype=np.float32)
+        self.cycle[:, NS] = cycle_ns
+        self.cycle[:, EW] = cycle_ew
+        self.direction = np.zeros(n, dtype=np.uint8)
+        self.mode = np.zeros(n, dtype=np.uint8)
+        # Absolute times: end of the current normal phase / current priority grant
+        now = clock()
+        self.phase_deadline = now + self.cycle[:, NS].astype(np.float64)
+        if offsets is not None:
+            self.phase_deadline += np.asarray(offsets, dtype=np.float64)
+        self.priority_until = np.full(n, NO_DEADLINE)
+        self.transitions = 0
+
+        self._arbiters: Dict[int, PriorityArbiter] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        # Set when a request/release moves a deadline before _sleep_until (the
+        # tick thread's planned wake-up), so the thread re-plans its sleep
+        self._wake = threading.Event()
+        self._sleep_until = -np.inf
+        self._thread: Optional[threading.Thread] = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    # ------------------------------------------------------------------
+    # Shared tick
+    # ------------------------------------------------------------------
+    def tick(self, now: Optional[float] = None) -> int:
+        """Advance every intersection to ``now``; return the number of transitions."""
+        now = self.clock() if now is None else now
+        with self._lock:
+            changed = 0
+            # Priority grants that ended: hand over to the next queued request
+            # (rare, so handled per intersection) or resume normal cycling
+            for i in np.flatnonzero((self.mode == PRIORITY) & (self.priority_until <= now)):
+                self._apply_winner_locked(int(i), now)
+                changed += 1
+
+            due = (self.mode == NORMAL) & (self.phase_deadline <= now)
+            if due.any():
+                idx = np.flatnonzero(due)
+                # From the scheduled deadline, not the (late) tick time, so
+                # green-wave offsets don't drift. Missed whole NS+EW cycles are
+                # skipped; a missed single phase is flipped through.
+                deadline = self.phase_deadline[idx]
+                full = self.cycle[idx].sum(axis=1)
+                deadline += np.floor((now - deadline) / full) * full
+                self.direction[idx] ^= 1
+                deadline += self.cycle[idx, self.direction[idx]]
+                missed = deadline <= now
+                if missed.any():
+                    sub = idx[missed]
+                    self.direction[sub] ^= 1
+                    deadline[missed] += self.cycle[sub, self.direction[sub]]
+                self.phase_deadline[idx] = deadline
+                changed += len(idx) - int(missed.sum())
+            self.transitions += changed
+            return changed
+
+    def next_deadline(self) -> float:
+        with self._lock:
+            return self._next_deadline_locked()
+
+    def _next_deadline_locked(self) -> float:
+        if not len(self.ids):
+            return NO_DEADLINE
+        normal = np.where(self.mode == NORMAL, self.phase_deadline, NO_DEADLINE)
+        return float(min(normal.min(), self.priority_until.min()))
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(2.0)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            # Cleared before planning: a change made after this point wakes the wait below
+            self._wake.clear()
+            self.tick()
+            # Sleep until the earliest deadline, but never tick more often than
+            # tick_s: deadlines that fall inside one tick are batched together
+            with self._lock:
+                now = self.clock()
+                self._sleep_until = min(max(now + self.tick_s, self._next_deadline_locked()), now + 60.0)
+            self._wake.wait(max(0.0, self._sleep_until - now))
+
+    # ------------------------------------------------------------------
+    # Priority requests
+    # ------------------------------------------------------------------
+    def _apply_winner_locked(self, i: int, now: float):
+        arbiter = self._arbiters.get(i)
+        winner = arbiter.winner(now) if arbiter is not None else None
+        if winner is not None:
+            self.mode[i] = PRIORITY
+            self.direction[i] = DIRECTIONS.index(winner.direction)
+            self.priority_until[i] = winner.until
+            return
+        if arbiter is not None:
+            del self._arbiters[i]
+        if self.mode[i] == PRIORITY:
+            # Resume with the direction that is green, for a full phase from
+            # when the grant ended (a late tick must not stretch it)
+            self.mode[i] = NORMAL
+            self.phase_deadline[i] = min(now, self.priority_until[i]) + self.cycle[i, self.direction[i]]
+        self.priority_until[i] = NO_DEADLINE
+
+    def _wakes_thread_locked(self, i: int) -> bool:
+        """Whether intersection i's deadline now falls before the tick thread's planned wake-up."""
+        deadline = self.priority_until[i] if self.mode[i] == PRIORITY else self.phase_deadline[i]
+        return bool(deadline < self._sleep_until)
+
+    def request(self, iid: str, direction: str, duration: Optional[float] = None,
+                vehicle_id: Optional[str] = None, vehicle_class_name: Optional[str] = None,
+                eta: Optional[float] = None) -> dict:
+        i = self.index[iid]
+        now = self.clock()
+        with self._lock:
+            arbiter = self._arbiters.setdefault(i, PriorityArbiter())
+            req = arbiter.submit(vehicle_id or f"anon:{direction}", direction, now, duration,
+                                 vehicle_class(vehicle_id, vehicle_class_name), eta)
+            self._apply_winner_locked(i, now)
+            granted = arbiter.winner(now) is req
+            wake = self._wakes_thread_locked(i)
+        if wake:
+            self._wake.set()
+        return dict(req.to_dict(), granted=granted)
+
+    def release(self, iid: str, vehicle_id: Optional[str] = None) -> int:
+        i = self.index[iid]
+        with self._lock:
+            arbiter = self._arbiters.get(i)
+            released = arbiter.release(vehicle_id) if arbiter is not None else 0
+            self._apply_winner_locked(i, self.clock())
+            wake = self._wakes_thread_locked(i)
+        if wake:
+            self._wake.set()
+        return released
+
+    def state(self, iid: str) -> dict:
+        i = self.index[iid]
+        with self._lock:
+            until = float(self.priority_until[i])
+            return {
+                "id": iid,
+                "mode": "priority" if self.mode[i] == PRIORITY else "normal",
+                "direction": DIRECTIONS[self.direction[i]],
+                "priority_until": None if math.isinf(until) else until,
+            }
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {
+                "count": len(self.ids),
+                "priority": int((self.mode == PRIORITY).sum()),
+                "ns_green": int((self.direction == NS).sum()),
+                "ew_green": int((self.direction == EW).sum()),
+                "transitions": self.transitions,
+            }
+
+
+def create_app(host: IntersectionHost) -> Flask:
+    app = Flask(__name__)
+    CORS(app)
+
+    def _index(iid):
+        if iid not in host.index:
+            abort(404, description=f"unknown intersection {iid}")
+        return iid
+
+    def _fields(data):
+        eta = data.get("eta_s")
+        return {
+            "vehicle_id": data.get("vehicle_id"),
+            "vehicle_class_name": data.get("vehicle_class"),
+            "eta": float(eta) if eta is not None else None,
+        }
+
+    @app.route("/api/<iid>/priority", methods=["POST"])
+    def api_priority(iid):
+        _index(iid)
+        data = request.get_json(force=True)
+        direction = data.get("direction", "NS").upper()
+        duration = int(data.get("duration", 10))
+        log_priority_trigger(direction, duration)
+        req = host.request(iid, direction, max(1, duration), **_fields(data))
+        return jsonify({"ok": True, "id": iid, "mode": "priority", "direction": direction,
+                        "duration": duration, "granted": req["granted"]})
+
+    @app.route("/api/<iid>/priority_hold", methods=["POST"])
+    def api_priority_hold(iid):
+        _index(iid)
+        data = request.get_json(force=True)
+        direction = data.get("direction", "NS").upper()
+        log_priority_trigger(direction, 0)
+        req = host.request(iid, direction, None, **_fields(data))
+        return jsonify({"ok": True, "id": iid, "mode": "priority", "direction": direction,
+                        "hold": True, "granted": req["granted"]})
+
+    @app.route("/api/<iid>/priority_release", methods=["POST"])
+    def api_priority_release(iid):
+        _index(iid)
+        data = request.get_json(silent=True) or {}
+        released = host.release(iid, data.get("vehicle_id"))
+        return jsonify(dict(host.state(iid), ok=True, released=released > 0, count=released))
+
+    @app.route("/api/<iid>/state", methods=["GET"])
+    def api_state(iid):
+        _index(iid)
+        return jsonify(host.state(iid))
+
+    @app.route("/api/intersections", methods=["GET"])
+    def api_intersections():
+        return jsonify(host.summary())
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Host many simulated intersections in one process")
+    parser.add_argument("--count", type=int, default=1000, help="Number of intersections (default 1000)")
+    parser.add_argument("--prefix", default="I", help="Intersection ID prefix (default I -> I0000, I0001, ...)")
+    parser.add_argument("--cycle-ns", type=float, default=5, help="NS green seconds (default 5)")
+    parser.add_argument("--cycle-ew", type=float, default=5, help="EW green seconds (default 5)")
+    parser.add_argument("--offset", type=float, default=0.0, help="Green-wave offset between consecutive intersections in seconds")
+    parser.add_argument("--tick", type=float, default=0.1, help="Shared tick resolution in seconds (default 0.1)")
+    parser.add_argument("--port", type=int, default=5002, help="HTTP port (default 5002)")
+    args = parser.parse_args()
+
+    configure_results(role="controller_host")
+    width = max(4, len(str(args.count - 1)))
+    ids = [f"{args.prefix}{i:0{width}d}" for i in range(args.count)]
+    offsets = np.arange(args.count) * args.offset if args.offset else None
+    host = IntersectionHost(ids, args.cycle_ns, args.cycle_ew, offsets=offsets, tick_s=args.tick)
+    host.start()
+    print(f"[HOST] {len(host)} intersections ({ids[0]} .. {ids[-1]}) on port {args.port}")
+    try:
+        create_app(host).run(host="0.0.0.0", port=args.port, threaded=True)
+    finally:
+        host.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Deadline-driven signal scheduler for one intersection.
+
+Replaces the sleep-and-recheck cycle loop: the worker thread sleeps on a
+condition variable until the next phase deadline, and hold/release/priority
+calls wake it right away, so preemption takes effect in milliseconds instead
+of at the end of a sleep. The worker applies the new state, so callers (HTTP
+handlers) never wait for a yellow/all-red interlock; without a running worker
+the caller applies it itself.
+Overlapping requests are arbitrated by a PriorityArbiter (see arbiter.py).
+"""
+
+import math
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+
+from .arbiter import PriorityArbiter, PriorityRequest, vehicle_class
+
+DIRECTIONS = ("NS", "EW")
+
+
+class SignalScheduler:
+    """Decides which (mode, direction) should be shown and when it changes.
+
+    ``apply(mode, direction)`` is called once per transition, never
+    concurrently, and never while the scheduler lock is held; once start()ed
+    it runs on the worker thread, so it may do slow I/O (GPIO, logging,
+    interlocks) without blocking new requests.
+    """
+
+    def __init__(self, apply: Callable[[str, str], None], cycle_ns: float = 5, cycle_ew: float = 5,
+                 clock: Callable[[], float] = time.monotonic):
+        self._apply = apply
+        self._clock = clock
+        self.cycle = {"NS": cycle_ns, "EW": cycle_ew}
+
+        self._cond = threading.Condition()
+        self._apply_lock = threading.Lock()  # serializes apply() calls
+        self._direction = "NS"
+        self._phase_deadline: Optional[float] = None
+        self.arbiter = PriorityArbiter()
+        self._applied: Optional[Tuple[str, str]] = None
+        self._dirty = False
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+
+    # ------------------------------------------------------------------
+    # Requests (any thread)
+    # ------------------------------------------------------------------
+    def request(self, direction: str, duration: Optional[float] = None, vehicle_id: Optional[str] = None,
+                vehicle_class_name: Optional[str] = None, eta: Optional[float] = None) -> dict:
+        """Queue a priority request (duration None = hold until release).
+
+        Returns the request and whether it currently owns the green.
+        """
+        key = vehicle_id or f"anon:{direction}"
+        cls = vehicle_class(vehicle_id, vehicle_class_name)
+        with self._cond:
+            req = self.arbiter.submit(key, direction, self._clock(), duration, cls, eta)
+            self._wake_locked()
+            threaded = self._running
+        if not threaded:
+            self.sync()
+        with self._cond:
+            winner = self.arbiter.winner(self._clock())
+            return dict(req.to_dict(), granted=winner is req)
+
+    def hold(self, direction: str, vehicle_id: Optional[str] = None, **kwargs) -> dict:
+        """Green for ``direction`` until release()."""
+        return self.request(direction, None, vehicle_id, **kwargs)
+
+    def priority(self, direction: str, duration: float, vehicle_id: Optional[str] = None, **kwargs) -> dict:
+        """Green for ``direction`` for ``duration`` seconds, then resume normal."""
+        return self.request(direction, duration, vehicle_id, **kwargs)
+
+    def release(self, vehicle_id: Optional[str] = None) -> int:
+        """Drop one vehicle's request, or every request when vehicle_id is None."""
+        with self._cond:
+            n = self.arbiter.release(vehicle_id)
+            self._wake_locked()
+            threaded = self._running
+        if not threaded:
+            self.sync()
+        return n
+
+    def winner(self) -> Optional[PriorityRequest]:
+        with self._cond:
+            return self.arbiter.winner(self._clock())
+
+    def pending(self) -> List[PriorityRequest]:
+        """Outstanding requests in arbitration order (winner first)."""
+        with self._cond:
+            return self.arbiter.pending(self._clock())
+
+    def current(self) -> Optional[Tuple[str, str]]:
+        """Last applied (mode, direction)."""
+        with self._cond:
+            return self._applied
+
+    # ------------------------------------------------------------------
+    # Decision logic
+    # ------------------------------------------------------------------
+    def _wake_locked(self):
+        self._dirty = True
+        self._cond.notify_all()
+
+    def _advance_locked(self, now: float) -> Tuple[Tuple[str, str], Optional[float]]:
+        """Return the (mode, direction) due at ``now`` and the next deadline."""
+        winner = self.arbiter.winner(now)
+        if winner is not None:
+            self._phase_deadline = None
+            # Lower-ranked requests can only take over once the winner ends
+            return ("priority", winner.direction), None if math.isinf(winner.until) else winner.until
+
+        if self._phase_deadline is None:
+            # Resume with whichever direction is green now, for a full phase
+            if self._applied is not None:
+                self._direction = self._applied[1]
+            self._phase_deadline = now + self.cycle[self._direction]
+        elif now >= self._phase_deadline:
+            self._direction = "EW" if self._direction == "NS" else "NS"
+            self._phase_deadline = now + self.cycle[self._direction]
+        return ("normal", self._direction), self._phase_deadline
+
+    def sync(self) -> Optional[float]:
+        """Apply the state due now if it changed; return the next deadline."""
+        with self._apply_lock:
+            with self._cond:
+                now = self._clock()
+                target, deadline = self._advance_locked(now)
+                granted = self.arbiter.winner(now) if target[0] == "priority" else None
+                changed = target != self._applied
+                self._applied = target
+            if changed:
+                started = self._clock()
+                self._apply(*target)
+                elapsed = self._clock() - started
+                if elapsed > 0:
+                    # apply() may run a yellow/all-red interlock; the green
+                    # (normal or a timed priority) only starts counting once
+                    # it is actually shown
+                    with self._cond:
+                        if target[0] == "normal" and self._phase_deadline is not None:
+                            self._phase_deadline += elapsed
+                            deadline = self._phase_deadline
+                        elif granted is not None and not math.isinf(granted.until):
+                            granted.until += elapsed
+                            deadline = granted.until
+        return deadline
+
+    # ------------------------------------------------------------------
+    # Worker thread
+    # ------------------------------------------------------------------
+    def start(self):
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 2.0):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while True:
+            deadline = self.sync()
+            with self._cond:
+                if not self._running:
+                    return
+                if self._dirty:
+                    self._dirty = False
+                    continue
+                timeout = None if deadline is None else max(0.0, deadline - self._clock())
+                self._cond.wait_for(lambda: self._dirty or not self._running, timeout)
+                self._dirty = False
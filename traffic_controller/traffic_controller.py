@@ -1,91 +1,107 @@
 from flask import Flask, request, jsonify
-import threading, time, os
+import threading
 from . import gpio_control as hw
-from results_logger import log_priority_trigger, log_controller_event
+from .scheduler import SignalScheduler
+from results_logger import log_priority_trigger, log_controller_event, configure as configure_results
 from flask_cors import CORS
 
 app = Flask(__name__)
 CORS(app)  # enable CORS for all routes
 
-priority_mode = False
-state = {"mode": "normal", "direction": "NS"}
-hold_active = False  # when True, remain in priority until explicitly released
+# "version" increases on every applied transition; watchers long-poll
+# /api/state?since=<version> and are woken through state_changed
+state = {"mode": "normal", "direction": "NS", "version": 0}
+state_changed = threading.Condition()
 
 CYCLE_NS = 5
 CYCLE_EW = 5
+MAX_STATE_WAIT_S = 30
 
-def normal_cycle():
-    global priority_mode, state
-    while True:
-        if not priority_mode:
-            state.update({"mode": "normal", "direction": "NS"})
-            hw.set_signal(ns_green=True, ew_green=False)
-            log_controller_event(state)
-            time.sleep(CYCLE_NS)
-            if priority_mode:  # re-check
-                continue
-            state.update({"mode": "normal", "direction": "EW"})
-            hw.set_signal(ns_green=False, ew_green=True)
-            log_controller_event(state)
-            time.sleep(CYCLE_EW)
-        else:
-            time.sleep(0.5)
+def apply_state(mode, direction):
+    """Drive the lights for a scheduler transition and record it."""
+    hw.set_signal(ns_green=(direction=="NS"), ew_green=(direction=="EW"))
+    # Publish only once the lights show the new state
+    with state_changed:
+        state.update({"mode": mode, "direction": direction, "version": state["version"] + 1})
+        snapshot = dict(state)
+        state_changed.notify_all()
+    log_controller_event(snapshot)
+
+def wait_for_state(since, timeout):
+    """Return the state once its version differs from ``since`` (or on timeout)."""
+    with state_changed:
+        state_changed.wait_for(lambda: state["version"] != since, timeout)
+        return dict(state)
+
+# One scheduler owns the lights: it wakes at phase deadlines and immediately
+# on hold/release/priority requests, so no thread polls or sleeps through them.
+# Overlapping requests are queued and arbitrated by vehicle class, ETA and
+# arrival order (see arbiter.py) instead of racing each other.
+scheduler = SignalScheduler(apply_state, cycle_ns=CYCLE_NS, cycle_ew=CYCLE_EW)
+
+def _request_fields(data):
+    eta = data.get("eta_s")
+    return {
+        "vehicle_id": data.get("vehicle_id"),
+        "vehicle_class_name": data.get("vehicle_class"),
+        "eta": float(eta) if eta is not None else None,
+    }
 
-def trigger_priority(direction="NS", duration=10):
-    global priority_mode, state
-    priority_mode = True
-    state.update({"mode": "priority", "direction": direction})
+def trigger_priority(direction="NS", duration=10, **request_fields):
     print(f"[CTRL] PRIORITY for {direction} for {duration}s")
-    
-    # Log the priority trigger
     log_priority_trigger(direction, duration)
-    log_controller_event(state)
-    
-    hw.set_signal(ns_green=(direction=="NS"), ew_green=(direction=="EW"))
-    time.sleep(max(1, int(duration)))
-    print("[CTRL] Priority ended; resuming normal.")
-    priority_mode = False
+    return scheduler.priority(direction, max(1, int(duration)), **request_fields)
 
 @app.route("/api/priority", methods=["POST"])
 def api_priority():
     data = request.get_json(force=True)
     direction = data.get("direction", "NS").upper()
     duration = int(data.get("duration", 10))
-    threading.Thread(target=trigger_priority, args=(direction, duration), daemon=True).start()
-    return jsonify({"ok": True, "mode": "priority", "direction": direction, "duration": duration})
+    req = trigger_priority(direction, duration, **_request_fields(data))
+    return jsonify({"ok": True, "mode": "priority", "direction": direction, "duration": duration,
+                    "granted": req["granted"], "active_direction": state["direction"],
+                    "version": state["version"]})
 
 @app.route("/api/state", methods=["GET"])
 def api_state():
-    return jsonify(state)
+    # ?since=<version>&wait=<s>: block until the state moves past <version>
+    since = request.args.get("since", type=int)
+    if since is None:
+        with state_changed:
+            return jsonify(dict(state))
+    wait = min(max(request.args.get("wait", 0, type=float), 0.0), MAX_STATE_WAIT_S)
+    return jsonify(wait_for_state(since, wait))
+
+@app.route("/api/priority_queue", methods=["GET"])
+def api_priority_queue():
+    return jsonify([r.to_dict() for r in scheduler.pending()])
 
 # --- Hold-until-release endpoints (optional integration) ---
 @app.route("/api/priority_hold", methods=["POST"])
 def api_priority_hold():
-    global priority_mode, state, hold_active
     data = request.get_json(force=True)
     direction = data.get("direction", "NS").upper()
-    hold_active = True
-    priority_mode = True
-    state.update({"mode": "priority", "direction": direction})
     print(f"[CTRL] PRIORITY HOLD engaged for {direction}")
     log_priority_trigger(direction, 0)
-    log_controller_event(state)
-    hw.set_signal(ns_green=(direction=="NS"), ew_green=(direction=="EW"))
-    return jsonify({"ok": True, "mode": "priority", "direction": direction, "hold": True})
+    req = scheduler.hold(direction, **_request_fields(data))
+    return jsonify({"ok": True, "mode": "priority", "direction": direction, "hold": True,
+                    "granted": req["granted"], "active_direction": state["direction"],
+                    "version": state["version"]})
 
 @app.route("/api/priority_release", methods=["POST"])
 def api_priority_release():
-    global priority_mode, state, hold_active
-    hold_active = False
-    priority_mode = False
-    # state will be updated by normal cycle shortly; log transition
-    print("[CTRL] PRIORITY HOLD released; resuming normal cycle")
-    log_controller_event({"mode": "normal", "direction": state.get("direction", "NS")})
-    return jsonify({"ok": True, "released": True, "mode": "normal"})
+    data = request.get_json(silent=True) or {}
+    vehicle_id = data.get("vehicle_id")
+    # Without a vehicle_id every outstanding request is released (old behaviour)
+    released = scheduler.release(vehicle_id)
+    print(f"[CTRL] PRIORITY HOLD released ({vehicle_id or 'all'}); mode now {state['mode']}")
+    return jsonify({"ok": True, "released": released > 0, "count": released, "mode": state["mode"],
+                    "version": state["version"]})
 
 if __name__ == "__main__":
+    configure_results(role="controller")
     try:
-        threading.Thread(target=normal_cycle, daemon=True).start()
+        scheduler.start()
         app.run(host="0.0.0.0", port=5001)
     finally:
         hw.cleanup()
\ No newline at end of file
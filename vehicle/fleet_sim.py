@@ -0,0 +1,222 @@
+"""
+Fleet simulator: thousands of vehicles in one asyncio event loop.
+
+Every vehicle drives one of the existing route tables (vehicle_sim.route,
+firetruck_sim.route, or the scenario_sim approach vectors) as a precomputed
+trajectory (trajectory.py): sampled at the table speeds every --interval
+seconds, with optional noise, dropout and multipath. A few cached variants
+per route are shared by all vehicles. Fixes go over one pooled keep-alive
+aiohttp client. Each vehicle is its own coroutine that sends a fix, waits
+for the reply and sleeps until its next (jittered) slot, like a real unit;
+a next_report_s in the reply skips ahead along the route (--fixed-rate
+turns that off).
+
+Reports the achieved send rate, server latency percentiles and schedule lag
+(how far sends fell behind their slot because the server or client was
+saturated).
+
+Usage:
+    python -m vehicle.fleet_sim --count 10000 --interval 3 --jitter 0.4 --connections 200
+    python -m vehicle.fleet_sim --count 2000 --routes scenario_ns scenario_ew --noise-m 4 --dropout 0.05 --laps 3
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import aiohttp
+import numpy as np
+
+from vehicle import vehicle_sim, firetruck_sim
+from vehicle.scenario_sim import AMB_START, FIR_START, INTERSECTION
+from vehicle.trajectory import NoiseModel, add_noise_args, noise_from_args, route_trajectory
+
+SERVER_URL = "http://127.0.0.1:5000/api/vehicle"
+
+# name -> (vehicle ID prefix, [(lat, lon, speed_kmh), ...])
+ROUTES: Dict[str, Tuple[str, List[Tuple[float, float, float]]]] = {
+    "ambulance": ("AMB", vehicle_sim.route),
+    "firetruck": ("FIRT", firetruck_sim.route),
+    "scenario_ns": ("AMB", [(*AMB_START, 30), (*INTERSECTION, 50)]),
+    "scenario_ew": ("FIRT", [(*FIR_START, 30), (*INTERSECTION, 50)]),
+}
+
+
+def route_variants(names: Iterable[str], tick: float, variants: int = 8, seed: int = 0,
+                   noise: Optional[NoiseModel] = None) -> Dict[str, Tuple[str, List[list]]]:
+    """Precompute ``variants`` noisy trajectories per route, sampled every ``tick`` route seconds.
+
+    Each variant is a list of [lat, lon, speed, valid] rows; vehicles share them
+    round-robin, so 10k vehicles cost only len(names) * variants arrays (cached).
+    """
+    tables = {}
+    for name in names:
+        prefix, route = ROUTES[name]
+        tables[name] = (prefix, [route_trajectory(route, tick, seed + k, noise).data[:, 1:].tolist()
+                                 for k in range(max(1, variants))])
+    return tables
+
+
+class FleetStats:
+    def __init__(self):
+        self.sent = 0
+        self.ok = 0
+        self.errors: Dict[str, int] = {}
+        self.latencies: List[float] = []
+        self.lags: List[float] = []
+
+    def record(self, latency_s: float, lag_s: float, error: Optional[str] = None):
+        self.sent += 1
+        self.lags.append(lag_s)
+        if error is None:
+            self.ok += 1
+            self.latencies.append(latency_s)
+        else:
+            self.errors[error] = self.errors.get(error, 0) + 1
+
+    def report(self, wall_s: float, vehicles: int) -> dict:
+        lat = np.asarray(self.latencies) * 1000
+        lag = np.asarray(self.lags) * 1000
+
+        def pct(a, p):
+            return float(np.percentile(a, p)) if a.size else 0.0
+
+        return {
+            "vehicles": vehicles,
+            "sent": self.sent,
+            "ok": self.ok,
+            "errors": dict(self.errors),
+            "wall_s": wall_s,
+            "send_rate": self.sent / wall_s if wall_s > 0 else 0.0,
+            "latency_ms": {"p50": pct(lat, 50), "p95": pct(lat, 95), "p99": pct(lat, 99),
+                           "max": float(lat.max()) if lat.size else 0.0},
+            "lag_ms": {"p95": pct(lag, 95), "max": float(lag.max()) if lag.size else 0.0},
+        }
+
+
+async def run_vehicle(session: aiohttp.ClientSession, url: str, vehicle_id: str,
+                      points: List[list], stats: FleetStats, interval: float,
+                      jitter: float, laps: int, stop_at: float, start_delay: float, rng: random.Random,
+                      adaptive: bool = True, tick: Optional[float] = None):
+    tick = tick or interval  # route seconds between points (> interval = faster playback)
+    loop = asyncio.get_running_loop()
+    await asyncio.sleep(start_delay)
+    due = loop.time()
+    for _ in range(laps):
+        i = 0
+        while i < len(points):
+            lat, lon, speed, valid = points[i]
+            if loop.time() >= stop_at:
+                return
+            if not valid:
+                # GPS dropout: nothing to send this slot
+                i += 1
+                due += interval
+                await asyncio.sleep(max(0.0, due - loop.time()))
+                continue
+            lag = max(0.0, loop.time() - due)
+            payload = {"id": vehicle_id, "lat": lat, "lon": lon, "speed": speed}
+            t0 = time.perf_counter()
+            error = None
+            reply = None
+            try:
+                async with session.post(url, json=payload) as r:
+                    body = await r.read()
+                    if r.status != 200:
+                        error = f"HTTP {r.status}"
+                    elif adaptive:
+                        reply = json.loads(body or b"{}")
+            except asyncio.TimeoutError:
+                error = "timeout"
+            except aiohttp.ClientError as e:
+                error = type(e).__name__
+            except ValueError:
+                pass  # not JSON: keep the fixed interval
+            stats.record(time.perf_counter() - t0, lag, error)
+            # Points are one tick of route time apart; honour next_report_s by skipping ahead
+            skip = 1
+            if reply and reply.get("next_report_s"):
+                skip = max(1, int(round(reply["next_report_s"] / tick)))
+                if i < len(points) - 1:
+                    skip = min(skip, len(points) - 1 - i)
+            i += skip
+            due += max(0.1, skip * interval + rng.uniform(-jitter, jitter))
+            await asyncio.sleep(max(0.0, due - loop.time()))
+
+
+async def run_fleet(url: str = SERVER_URL, count: int = 1000, routes: Iterable[str] = ("ambulance", "firetruck"),
+                    interval: float = 3.0, jitter: float = 0.4, laps: int = 1, duration: Optional[float] = None,
+                    connections: int = 100, ramp: Optional[float] = None, timeout: float = 5.0,
+                    seed: int = 0, adaptive: bool = True, variants: int = 8,
+                    noise: Optional[NoiseModel] = None, tick: Optional[float] = None) -> dict:
+    """Run ``count`` vehicles (round-robin over ``routes``) and return the report."""
+    rng = random.Random(seed)
+    routes = list(routes)
+    tables = route_variants(routes, tick or interval, variants, seed, noise)
+    ramp = interval if ramp is None else ramp
+    width = max(3, len(str(count)))
+    stats = FleetStats()
+
+    connector = aiohttp.TCPConnector(limit=connections)
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+        loop = asyncio.get_running_loop()
+        stop_at = loop.time() + duration if duration else float("inf")
+        tasks = []
+        for i in range(count):
+            prefix, pool = tables[routes[i % len(routes)]]
+            points = pool[(i // len(routes)) % len(pool)]
+            tasks.append(run_vehicle(session, url, f"{prefix}{i:0{width}d}", points, stats, interval, jitter,
+                                     laps, stop_at, rng.uniform(0, ramp), random.Random(rng.random()), adaptive, tick))
+        t0 = time.perf_counter()
+        await asyncio.gather(*tasks)
+        wall_s = time.perf_counter() - t0
+    return stats.report(wall_s, count)
+
+
+def format_report(r: dict) -> str:
+    lat, lag = r["latency_ms"], r["lag_ms"]
+    lines = [
+        "=" * 60,
+        "FLEET REPORT",
+        f"Vehicles: {r['vehicles']:,} | fixes sent: {r['sent']:,} ({r['ok']:,} ok) in {r['wall_s']:.2f}s "
+        f"→ {r['send_rate']:,.1f} fixes/s",
+        f"Latency ms: p50={lat['p50']:.1f} p95={lat['p95']:.1f} p99={lat['p99']:.1f} max={lat['max']:.1f}",
+        f"Schedule lag ms: p95={lag['p95']:.1f} max={lag['max']:.1f}",
+    ]
+    if r["errors"]:
+        lines.append("Errors: " + ", ".join(f"{k}={v}" for k, v in sorted(r["errors"].items())))
+    lines.append("=" * 60)
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate many vehicles over one asyncio loop")
+    parser.add_argument("--url", default=SERVER_URL, help=f"Vehicle endpoint (default {SERVER_URL})")
+    parser.add_argument("--count", type=int, default=1000, help="Number of vehicles (default 1000)")
+    parser.add_argument("--routes", nargs="+", default=["ambulance", "firetruck"], choices=sorted(ROUTES),
+                        help="Route tables, assigned round-robin (default ambulance firetruck)")
+    parser.add_argument("--interval", type=float, default=3.0, help="Seconds between points per vehicle (default 3.0)")
+    parser.add_argument("--jitter", type=float, default=0.4, help="Random jitter added/subtracted to interval (default 0.4)")
+    parser.add_argument("--laps", type=int, default=1, help="Times each vehicle drives its route (default 1)")
+    parser.add_argument("--duration", type=float, default=None, help="Stop after this many seconds")
+    parser.add_argument("--tick", type=float, default=None, help="Route seconds between points (default = interval; larger plays routes faster)")
+    parser.add_argument("--variants", type=int, default=8, help="Distinct noisy trajectories per route (default 8)")
+    parser.add_argument("--connections", type=int, default=100, help="Keep-alive connection pool size (default 100)")
+    parser.add_argument("--ramp", type=float, default=None, help="Spread vehicle start times over this many seconds (default = interval)")
+    parser.add_argument("--timeout", type=float, default=5.0, help="Per-request timeout seconds (default 5)")
+    add_noise_args(parser)
+    parser.add_argument("--fixed-rate", action="store_true", help="Ignore the server's next_report_s")
+    args = parser.parse_args()
+
+    print(f"Fleet simulator: {args.count} vehicles on {', '.join(args.routes)} → {args.url}")
+    report = asyncio.run(run_fleet(args.url, args.count, args.routes, args.interval, args.jitter, args.laps,
+                                   args.duration, args.connections, args.ramp, args.timeout, args.seed,
+                                   not args.fixed_rate, args.variants, noise_from_args(args), args.tick))
+    print(format_report(report))
+
+
+if __name__ == "__main__":
+    main()
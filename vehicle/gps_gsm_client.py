@@ -2,25 +2,194 @@
 Raspberry Pi vehicle client for GSM+GPS modules.
 - SIMULATE=True will emit a demo route without using serial.
 - Set SIMULATE=False and configure SERIAL_PORT for real module.
+
+Fixes are store-and-forward: every fix goes into a bounded queue mirrored
+to FIX_QUEUE_PATH, so GSM drop-outs (or a reboot) don't lose them. When the
+link is up the newest fix is sent to /api/vehicle for the live decision and
+the older ones are backfilled in batches through /api/vehicle/batch.
 """
 
-import time, requests, os
+import time, requests, os, json
+from collections import deque, namedtuple
 
 # ==== CONFIG ====
 SERVER_URL = os.getenv("SERVER_URL", "http://127.0.0.1:5000/api/vehicle")
+SERVER_BATCH_URL = os.getenv("SERVER_BATCH_URL", SERVER_URL.rstrip("/") + "/batch")
 VEHICLE_ID = os.getenv("VEHICLE_ID", "AMB001")
 SIMULATE = os.getenv("SIMULATE", "true").lower() == "true"
 
 SERIAL_PORT = os.getenv("SERIAL_PORT", "/dev/ttyUSB2")
 BAUD_RATE = int(os.getenv("BAUD_RATE", "115200"))
 
-def send_to_server(lat, lon, speed):
-    payload = {"id": VEHICLE_ID, "lat": lat, "lon": lon, "speed": speed}
-    try:
-        r = requests.post(SERVER_URL, json=payload, timeout=5)
+FIX_QUEUE_PATH = os.getenv("FIX_QUEUE_PATH", "fix_queue.jsonl")
+FIX_QUEUE_MAX = int(os.getenv("FIX_QUEUE_MAX", "1000"))    # oldest fixes are dropped beyond this
+FIX_BATCH_SIZE = int(os.getenv("FIX_BATCH_SIZE", "50"))    # fixes per backfill request
+
+
+class FixQueue:
+    """Bounded FIFO of unsent fixes, mirrored to a small JSON-lines file.
+
+    The file is append-only: sent fixes are recorded as short marker lines
+    instead of rewriting it, and it is compacted down to the queued fixes
+    only once it holds twice the queue bound in lines.
+    """
+
+    def __init__(self, path=FIX_QUEUE_PATH, maxlen=FIX_QUEUE_MAX):
+        self.path = path
+        self.fixes = deque(maxlen=maxlen)
+        self.dropped = 0
+        self.compactions = 0
+        self._lines = 0  # lines in the file, queued fixes plus markers
+        self._load()
+
+    def __len__(self):
+        return len(self.fixes)
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        torn = False
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                self._lines += 1
+                try:
+                    item = json.loads(line)
+                except ValueError:
+                    torn = True  # torn last line after a power cut
+                    continue
+                sent = item.get("_sent")
+                if sent == "newest":
+                    if self.fixes:
+                        self.fixes.pop()
+                elif sent == "oldest":
+                    for _ in range(min(item.get("n", 0), len(self.fixes))):
+                        self.fixes.popleft()
+                else:
+                    self.fixes.append(item)
+        if torn:
+            self._save()  # so the next append doesn't land on the torn line
+
+    def _save(self):
+        if not self.path:
+            return
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.writelines(json.dumps(fix) + "\n" for fix in self.fixes)
+            os.replace(tmp, self.path)
+            self._lines = len(self.fixes)
+            self.compactions += 1
+        except OSError as e:
+            print("Error saving fix queue:", e)
+
+    def _append(self, item):
+        if not self.path:
+            return
+        try:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(item) + "\n")
+            self._lines += 1
+        except OSError as e:
+            print("Error saving fix queue:", e)
+        if self._lines >= 2 * max(self.fixes.maxlen or 0, 1):
+            self._save()
+
+    def push(self, fix):
+        if len(self.fixes) == self.fixes.maxlen:
+            self.dropped += 1
+        self.fixes.append(fix)
+        self._append(fix)
+
+    def newest(self):
+        return self.fixes[-1] if self.fixes else None
+
+    def oldest(self, n):
+        return [self.fixes[i] for i in range(min(n, len(self.fixes)))]
+
+    def discard_newest(self):
+        self.fixes.pop()
+        self._append({"_sent": "newest"})
+
+    def discard_oldest(self, n):
+        n = min(n, len(self.fixes))
+        for _ in range(n):
+            self.fixes.popleft()
+        self._append({"_sent": "oldest", "n": n})
+
+
+class FixUploader:
+    """Sends queued fixes: newest first for the live decision, then one backfill batch."""
+
+    def __init__(self, queue, vehicle_id=VEHICLE_ID, url=SERVER_URL, batch_url=SERVER_BATCH_URL,
+                 batch_size=FIX_BATCH_SIZE, post=requests.post):
+        self.queue = queue
+        self.vehicle_id = vehicle_id
+        self.url = url
+        self.batch_url = batch_url
+        self.batch_size = batch_size
+        self.post = post
+        self.round_trips = 0
+        self.next_report_s = None  # server's suggested interval from the last live reply
+
+    def submit(self, lat, lon, speed, ts=None):
+        self.queue.push({"lat": lat, "lon": lon, "speed": speed, "ts": ts if ts is not None else time.time()})
+        return self.flush()
+
+    def _send(self, url, payload):
+        """POST; True = delivered (or rejected for good), False = keep it queued."""
+        self.round_trips += 1
+        r = self.post(url, json=payload, timeout=5)
+        if 400 <= r.status_code < 500:
+            print("Server rejected", payload, "->", r.status_code, r.text)
+            return True, r
+        return r.status_code < 400, r
+
+    def flush(self):
+        """Upload what the link allows; returns the live /api/vehicle response, if any."""
+        fix = self.queue.newest()
+        if fix is None:
+            return None
+        payload = dict(fix, id=self.vehicle_id)
+        try:
+            ok, r = self._send(self.url, payload)
+        except Exception as e:
+            print(f"Error POST ({len(self.queue)} fixes queued):", e)
+            return None
+        if not ok:
+            print(f"POST -> {r.status_code} ({len(self.queue)} fixes queued)")
+            return None
         print("POST", payload, "->", r.status_code, r.text)
-    except Exception as e:
-        print("Error POST:", e)
+        self.queue.discard_newest()
+        try:
+            self.next_report_s = r.json().get("next_report_s")
+        except (ValueError, AttributeError):
+            self.next_report_s = None
+
+        # Link is up: backfill one batch of history, oldest first. One per report
+        # keeps a long outage's backlog from delaying the next live fix.
+        batch = self.queue.oldest(self.batch_size)
+        if batch:
+            try:
+                ok, _ = self._send(self.batch_url, {"id": self.vehicle_id, "fixes": batch})
+            except Exception as e:
+                print(f"Error backfilling ({len(self.queue)} fixes queued):", e)
+                ok = False
+            if ok:
+                self.queue.discard_oldest(len(batch))
+        return r
+
+
+_uploader = None
+
+def get_uploader():
+    """Create the queue (loading any fixes left from a previous run) on first use."""
+    global _uploader
+    if _uploader is None:
+        _uploader = FixUploader(FixQueue())
+    return _uploader
+
+def send_to_server(lat, lon, speed):
+    return get_uploader().submit(lat, lon, speed)
 
 def run_simulated():
     route = [
@@ -30,14 +199,21 @@ def run_simulated():
         (12.9716, 77.5945, 41),
         (12.9717, 77.5946, 36),
     ]
+    from vehicle.trajectory import waypoint_steps
+
+    def send(vid, lat, lon, speed):
+        send_to_server(lat, lon, speed)
+        return {"next_report_s": get_uploader().next_report_s}
+
+    # Waypoints 3 s of driving apart; next_report_s moves along the route by time
     while True:
-        for lat, lon, speed in route:
-            send_to_server(lat, lon, speed)
-            time.sleep(3)
+        for step in waypoint_steps(VEHICLE_ID, route, 3, send):
+            time.sleep(step)
+        time.sleep(3)
 
 def parse_cgnsinf(resp: str):
-    # +CGNSINF: 1,1,UTC,lat,lon,alt,speed,...
-    if "+CGNSINF" not in resp:
+    # +CGNSINF: 1,1,UTC,lat,lon,alt,speed,...  (+UGNSINF URCs use the same fields)
+    if "+CGNSINF" not in resp and "+UGNSINF" not in resp:
         return None
     parts = resp.strip().split(",")
     if len(parts) < 7:
@@ -45,9 +221,172 @@ def parse_cgnsinf(resp: str):
     fix_ok = parts[1] == "1"
     if not fix_ok:
         return None
-    lat = float(parts[3]); lon = float(parts[4]); speed = float(parts[6])
+    try:
+        lat = float(parts[3]); lon = float(parts[4]); speed = float(parts[6] or 0)
+    except ValueError:
+        return None
     return lat, lon, speed
 
+def _nmea_degrees(value: str, hemisphere: str):
+    # ddmm.mmmm / dddmm.mmmm -> signed decimal degrees
+    head, _, _ = value.partition(".")
+    deg_len = len(head) - 2
+    degrees = float(value[:deg_len]) + float(value[deg_len:]) / 60.0
+    return -degrees if hemisphere in ("S", "W") else degrees
+
+def parse_nmea_rmc(line: str):
+    # $GNRMC,hhmmss.ss,A,ddmm.mmmm,N,dddmm.mmmm,E,knots,course,ddmmyy,...*CS
+    if not line.startswith("$") or line[3:6] != "RMC":
+        return None
+    body, star, checksum = line[1:].partition("*")
+    if star:
+        calc = 0
+        for ch in body:
+            calc ^= ord(ch)
+        if checksum[:2].upper() != f"{calc:02X}":
+            return None
+    parts = body.split(",")
+    if len(parts) < 8 or parts[2] != "A":
+        return None
+    try:
+        lat = _nmea_degrees(parts[3], parts[4])
+        lon = _nmea_degrees(parts[5], parts[6])
+        speed = float(parts[7] or 0) * 1.852  # knots -> km/h
+    except ValueError:
+        return None
+    return lat, lon, speed
+
+def parse_gnss_line(line: str):
+    """A +CGNSINF/+UGNSINF line or an NMEA RMC sentence -> (lat, lon, speed_kmh) or None."""
+    if line.startswith("$"):
+        return parse_nmea_rmc(line)
+    return parse_cgnsinf(line)
+
+
+# ==== Streaming GNSS ====
+# Instead of polling AT+CGNSINF (0.8 s reply wait + 3 s sleep), the module is
+# told to push every fix as a +UGNSINF URC (AT+CGNSURC) and bytes are parsed
+# as they arrive, so a fix is emitted the moment its line is complete.
+GNSS_URC_RATE = int(os.getenv("GNSS_URC_RATE", "1"))  # URC every N GNSS fixes
+
+
+# rx is time.monotonic() when the fix's line completed (for fix-to-send latency)
+GnssFix = namedtuple("GnssFix", "lat lon speed ts rx")
+
+
+class GnssStream:
+    """Incremental line parser: feed() raw serial bytes, get completed fixes back."""
+
+    MAX_LINE = 512  # drop garbage that never sees a line ending
+
+    def __init__(self, clock=time.monotonic, wall=time.time):
+        self.clock = clock
+        self.wall = wall
+        self._buf = bytearray()
+        self.lines = 0
+        self.fixes = 0
+
+    def feed(self, data: bytes):
+        rx, fixes = self.clock(), []
+        self._buf += data
+        while True:
+            i = self._buf.find(b"\n")
+            if i < 0:
+                if len(self._buf) > self.MAX_LINE:
+                    del self._buf[:]
+                return fixes
+            line = self._buf[:i].decode("ascii", errors="ignore").strip()
+            del self._buf[:i + 1]
+            if not line:
+                continue
+            self.lines += 1
+            parsed = parse_gnss_line(line)
+            if parsed:
+                self.fixes += 1
+                fixes.append(GnssFix(*parsed, self.wall(), rx))
+
+
+def read_fixes(port, stream=None, stop=None):
+    """Yield GnssFix from a serial-like port (read(n), in_waiting) as lines complete."""
+    stream = stream or GnssStream()
+    while stop is None or not stop.is_set():
+        # Block for the first byte (up to the port timeout), then drain what's buffered
+        data = port.read(max(1, getattr(port, "in_waiting", 0)))
+        if data:
+            yield from stream.feed(data)
+
+
+class LatencyStats:
+    """Rolling fix-to-send latency (seconds in, milliseconds out)."""
+
+    def __init__(self, window=1000):
+        self.samples = deque(maxlen=window)
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+
+    def summary(self):
+        ordered = sorted(self.samples)
+        if not ordered:
+            return {"count": 0, "p50_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0}
+        pick = lambda p: ordered[min(len(ordered) - 1, int(p * (len(ordered) - 1) + 0.5))] * 1000
+        return {"count": len(ordered), "p50_ms": pick(0.50), "p95_ms": pick(0.95), "max_ms": ordered[-1] * 1000}
+
+
+def stream_to_server(port, uploader=None, latency=None, stop=None, max_fixes=None, report_every=30):
+    """Forward streamed fixes; returns the LatencyStats.
+
+    A reader thread keeps draining the port while a POST is in flight. When
+    several fixes are waiting, only the newest is sent live; the rest go
+    straight into the store-and-forward queue for backfill. Fixes that arrive
+    before the server's next_report_s has elapsed are not sent.
+    """
+    import queue, threading
+    uploader = uploader or get_uploader()
+    latency = latency or LatencyStats()
+    stop = stop or threading.Event()
+    pending = queue.Queue()
+
+    def reader():
+        for fix in read_fixes(port, stop=stop):
+            pending.put(fix)
+
+    thread = threading.Thread(target=reader, daemon=True)
+    thread.start()
+    sent = skipped = 0
+    next_due = 0.0
+    try:
+        while not stop.is_set() and (max_fixes is None or sent < max_fixes):
+            try:
+                fix = pending.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            while True:
+                try:
+                    newer = pending.get_nowait()
+                except queue.Empty:
+                    break
+                uploader.queue.push({"lat": fix.lat, "lon": fix.lon, "speed": fix.speed, "ts": fix.ts})
+                fix = newer
+            if fix.rx < next_due:
+                skipped += 1
+                continue
+            latency.add(time.monotonic() - fix.rx)
+            print(f"GPS: {fix.lat},{fix.lon} speed={fix.speed:.1f}")
+            uploader.submit(fix.lat, fix.lon, fix.speed, ts=fix.ts)
+            sent += 1
+            # Small margin so a fix landing right on the boundary still counts as due
+            next_due = fix.rx + max(0.0, (uploader.next_report_s or 0) - 0.05)
+            if report_every and sent % report_every == 0:
+                s = latency.summary()
+                print(f"[GNSS] fix→send latency: p50={s['p50_ms']:.1f} ms p95={s['p95_ms']:.1f} ms max={s['max_ms']:.1f} ms"
+                      f" | {skipped} fixes skipped (next_report_s)")
+    finally:
+        stop.set()
+        thread.join(2.0)  # returns within one port read timeout
+    return latency
+
+
 def run_hardware():
     import serial
     ser = serial.Serial(SERIAL_PORT, BAUD_RATE, timeout=1)
@@ -56,19 +395,14 @@ def run_hardware():
         time.sleep(delay)
         return ser.read_all().decode(errors="ignore")
 
-    # power on GNSS
+    # power on GNSS and have it push a +UGNSINF URC for every fix
     at("AT"); at("AT+CPIN?"); at("AT+CGNSPWR=1"); at("AT+CGNSSEQ=RMC")
-    print("Waiting for GPS fix...")
-    while True:
-        resp = at("AT+CGNSINF", 0.8)
-        parsed = parse_cgnsinf(resp)
-        if parsed:
-            lat, lon, speed = parsed
-            print(f"GPS: {lat},{lon} speed={speed}")
-            send_to_server(lat, lon, speed)
-        else:
-            print("No fix yet...")
-        time.sleep(3)
+    at(f"AT+CGNSURC={GNSS_URC_RATE}")
+    print("Streaming GPS fixes...")
+    try:
+        stream_to_server(ser)
+    finally:
+        at("AT+CGNSURC=0")
 
 if __name__ == "__main__":
     if SIMULATE:
@@ -1,7 +1,7 @@
 import time, random, argparse
 import requests
-from typing import Tuple
-from results_logger import log_error
+from typing import Callable, Tuple
+from results_logger import log_error, configure as configure_results
 
 SERVER_URL = "http://127.0.0.1:5000/api/vehicle"
 
@@ -23,34 +23,55 @@ def send_point(vehicle_id: str, lat: float, lon: float, speed_kmh: float):
     payload = {"id": vehicle_id, "lat": lat, "lon": lon, "speed": speed_kmh}
     try:
         r = requests.post(SERVER_URL, json=payload, timeout=5)
-        print("Sent:", payload, "| Server:", r.json())
+        reply = r.json()
+        print("Sent:", payload, "| Server:", reply)
+        return reply
     except Exception as e:
         print("Error sending:", e)
         log_error(str(e), "SCENARIO_SIMULATOR_COMMUNICATION")
+        return None
 
 
-def run_instance(vehicle_id: str, start: Tuple[float, float], end: Tuple[float, float], duration_s: int, tick_s: float):
+def instance_steps(vehicle_id: str, start: Tuple[float, float], end: Tuple[float, float], duration_s: int,
+                   tick_s: float, send: Callable = None, rng: random.Random = random, adaptive: bool = True):
     """Simulate an approach from start -> end across duration_s seconds.
     Generates ~duration_s / tick_s points, then a couple of points beyond to simulate crossing.
+    Calls send(vehicle_id, lat, lon, speed) per point and yields the seconds to wait
+    before the next one, so the same trajectory can run in real or virtual time.
+    With adaptive=True, a next_report_s in send()'s reply skips the points in between.
     """
+    send = send or send_point
     steps = max(1, int(duration_s / tick_s))
-    for i in range(steps + 1):
+    i = 0
+    while i <= steps:
         t = i / steps
         lat = lerp(start[0], end[0], t)
         lon = lerp(start[1], end[1], t)
         # Rough speed profile: faster in middle, slower at start/end
         speed = 30 + 20 * (1 - abs(2 * t - 1))
-        send_point(vehicle_id, lat, lon, speed)
-        time.sleep(tick_s + random.uniform(-0.15, 0.15))
+        reply = send(vehicle_id, lat, lon, speed)
+        skip = 1
+        if adaptive and reply and reply.get("next_report_s"):
+            skip = max(1, int(round(reply["next_report_s"] / tick_s)))
+            if i < steps:
+                skip = min(skip, steps - i)  # still report at the intersection
+        i += skip
+        yield max(0.0, skip * tick_s + rng.uniform(-0.15, 0.15))
 
     # Two extra points beyond the intersection to indicate crossing
     lat = lerp(start[0], end[0], 1.05)
     lon = lerp(start[1], end[1], 1.05)
-    send_point(vehicle_id, lat, lon, 28)
-    time.sleep(tick_s)
+    send(vehicle_id, lat, lon, 28)
+    yield tick_s
     lat = lerp(start[0], end[0], 1.10)
     lon = lerp(start[1], end[1], 1.10)
-    send_point(vehicle_id, lat, lon, 26)
+    send(vehicle_id, lat, lon, 26)
+
+
+def run_instance(vehicle_id: str, start: Tuple[float, float], end: Tuple[float, float], duration_s: int, tick_s: float):
+    """Run instance_steps() against the server in real time."""
+    for pause in instance_steps(vehicle_id, start, end, duration_s, tick_s):
+        time.sleep(pause)
 
 
 def main():
@@ -60,6 +81,7 @@ def main():
     parser.add_argument("--idle", type=int, default=5, help="Idle seconds between instances (default 5)")
     parser.add_argument("--tick", type=float, default=1.0, help="Seconds between points within an instance (default 1.0)")
     args = parser.parse_args()
+    configure_results(role="scenario_sim")
 
     print("Scenario simulator starting... Ctrl+C to stop.")
     # Alternate instances: AMB (NS) then FIRT (EW)
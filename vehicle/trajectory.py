@@ -0,0 +1,229 @@
+"""
+Vectorized trajectory engine for the simulators.
+
+A trajectory is a road polyline plus a speed profile (km/h at each vertex),
+sampled every tick_s seconds along the road, computed in one pass with
+NumPy instead of point-by-point lerp() calls. Optional seeded noise makes it
+look like a real receiver:
+- sigma_m: Gaussian position noise on every fix,
+- multipath: bursts (rate per fix, mean length) where fixes are pulled
+  multipath_m metres off in one direction,
+- dropout: bursts of missing fixes (valid = 0).
+
+Results are cached as .npy files keyed by every input (TRAJECTORY_CACHE,
+default .cache/trajectories), so a fleet of thousands of vehicles reuses a
+handful of precomputed arrays.
+
+Route tables in the simulators ([(lat, lon, speed_kmh), ...]) plug in
+directly via route_trajectory().
+"""
+
+import hashlib
+import json
+import math
+import os
+import time
+from typing import Callable, Iterator, Optional, Sequence, Tuple
+
+import numpy as np
+
+M_PER_DEG_LAT = 111195.0
+CACHE_DIR = os.getenv("TRAJECTORY_CACHE", os.path.join(".cache", "trajectories"))
+_VERSION = 1  # bump when the generator changes so stale cache files are ignored
+
+
+class NoiseModel:
+    def __init__(self, sigma_m: float = 0.0, speed_sigma_kmh: float = 0.0,
+                 dropout_rate: float = 0.0, dropout_len: float = 3.0,
+                 multipath_rate: float = 0.0, multipath_len: float = 2.0, multipath_m: float = 30.0):
+        self.sigma_m = sigma_m
+        self.speed_sigma_kmh = speed_sigma_kmh
+        self.dropout_rate = dropout_rate
+        self.dropout_len = dropout_len
+        self.multipath_rate = multipath_rate
+        self.multipath_len = multipath_len
+        self.multipath_m = multipath_m
+
+    def to_dict(self) -> dict:
+        return dict(vars(self))
+
+
+class Trajectory:
+    """(n, 5) float array with columns t, lat, lon, speed, valid."""
+
+    def __init__(self, data: np.ndarray):
+        self.data = data
+
+    def __len__(self):
+        return len(self.data)
+
+    t = property(lambda self: self.data[:, 0])
+    lat = property(lambda self: self.data[:, 1])
+    lon = property(lambda self: self.data[:, 2])
+    speed = property(lambda self: self.data[:, 3])
+    valid = property(lambda self: self.data[:, 4].astype(bool))
+
+    @property
+    def duration(self) -> float:
+        return float(self.data[-1, 0]) if len(self.data) else 0.0
+
+    def fixes(self) -> np.ndarray:
+        """Valid rows only, columns t, lat, lon, speed."""
+        return self.data[self.valid, :4]
+
+
+def _bursts(rng: np.random.Generator, n: int, rate: float, mean_len: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Per-fix burst mask, and the index of the burst start covering each fix (-1 if none)."""
+    if rate <= 0 or n == 0:
+        return np.zeros(n, dtype=bool), np.full(n, -1)
+    starts = np.flatnonzero(rng.random(n) < rate)
+    lengths = rng.geometric(1.0 / max(1.0, mean_len), size=len(starts))
+    edges = np.zeros(n + 1, dtype=np.int64)
+    np.add.at(edges, starts, 1)
+    np.add.at(edges, np.minimum(starts + lengths, n), -1)
+    active = np.cumsum(edges[:n]) > 0
+    marks = np.full(n, -1)
+    marks[starts] = starts
+    owner = np.maximum.accumulate(marks)
+    return active, np.where(active, owner, -1)
+
+
+def _generate(polyline: np.ndarray, speeds: np.ndarray, tick_s: float, seed: int, noise: NoiseModel) -> np.ndarray:
+    lat0 = polyline[0, 0]
+    m_per_deg_lon = M_PER_DEG_LAT * math.cos(math.radians(lat0))
+    xy = np.column_stack(((polyline[:, 1] - polyline[0, 1]) * m_per_deg_lon,
+                          (polyline[:, 0] - polyline[0, 0]) * M_PER_DEG_LAT))
+    s_vertex = np.concatenate(([0.0], np.cumsum(np.hypot(*np.diff(xy, axis=0).T))))
+    total = s_vertex[-1]
+
+    # Time along the road from the speed profile on a ~1 m grid: dt = ds / v
+    grid = np.linspace(0.0, total, max(2, int(total) + 1))
+    v = np.maximum(np.interp(grid, s_vertex, speeds), 1.0) / 3.6
+    t_grid = np.concatenate(([0.0], np.cumsum(np.diff(grid) * 2.0 / (v[:-1] + v[1:]))))
+
+    t = np.arange(0.0, t_grid[-1] + 1e-9, tick_s)
+    s = np.interp(t, t_grid, grid)
+    lat = np.interp(s, s_vertex, polyline[:, 0])
+    lon = np.interp(s, s_vertex, polyline[:, 1])
+    speed = np.interp(s, grid, v * 3.6)
+    valid = np.ones(len(t))
+
+    rng = np.random.default_rng(seed)
+    n = len(t)
+    north = np.zeros(n)
+    east = np.zeros(n)
+    if noise.sigma_m > 0:
+        north += rng.normal(0.0, noise.sigma_m, n)
+        east += rng.normal(0.0, noise.sigma_m, n)
+    active, owner = _bursts(rng, n, noise.multipath_rate, noise.multipath_len)
+    if active.any():
+        # One reflected offset per burst, constant while the burst lasts
+        angle = rng.uniform(0, 2 * math.pi, n)
+        size = noise.multipath_m * rng.uniform(0.5, 1.5, n)
+        north[active] += (size * np.cos(angle))[owner[active]]
+        east[active] += (size * np.sin(angle))[owner[active]]
+    lat = lat + north / M_PER_DEG_LAT
+    lon = lon + east / m_per_deg_lon
+    if noise.speed_sigma_kmh > 0:
+        speed = np.maximum(0.0, speed + rng.normal(0.0, noise.speed_sigma_kmh, n))
+    dropped, _ = _bursts(rng, n, noise.dropout_rate, noise.dropout_len)
+    valid[dropped] = 0.0
+    return np.column_stack((t, lat, lon, speed, valid))
+
+
+def build_trajectory(polyline: Sequence[Tuple[float, float]], speeds_kmh: Sequence[float], tick_s: float = 1.0,
+                     seed: int = 0, noise: Optional[NoiseModel] = None,
+                     cache_dir: Optional[str] = None) -> Trajectory:
+    """Sample a polyline ([(lat, lon), ...]) driven at speeds_kmh (one per vertex) every tick_s.
+
+    cache_dir None uses CACHE_DIR; "" disables caching.
+    """
+    polyline = np.asarray(polyline, dtype=np.float64)
+    speeds = np.broadcast_to(np.asarray(speeds_kmh, dtype=np.float64), (len(polyline),))
+    noise = noise or NoiseModel()
+    if len(polyline) < 2:
+        raise ValueError("a trajectory needs at least two polyline points")
+
+    path = None
+    cache_dir = CACHE_DIR if cache_dir is None else cache_dir
+    if cache_dir:
+        key = json.dumps({"v": _VERSION, "polyline": polyline.tolist(), "speeds": speeds.tolist(),
+                          "tick": tick_s, "seed": seed, "noise": noise.to_dict()}, sort_keys=True)
+        path = os.path.join(cache_dir, hashlib.sha1(key.encode()).hexdigest()[:20] + ".npy")
+        if os.path.exists(path):
+            try:
+                return Trajectory(np.load(path))
+            except (OSError, ValueError):
+                pass  # truncated file: regenerate
+    data = _generate(polyline, speeds, tick_s, seed, noise)
+    if path:
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.tmp.npy"
+            np.save(tmp, data)
+            os.replace(tmp, path)
+        except OSError as e:
+            print("Trajectory cache not written:", e)
+    return Trajectory(data)
+
+
+def route_trajectory(route: Sequence[Tuple[float, float, float]], tick_s: float = 1.0, seed: int = 0,
+                     noise: Optional[NoiseModel] = None, cache_dir: Optional[str] = None) -> Trajectory:
+    """Trajectory along a simulator route table [(lat, lon, speed_kmh), ...]."""
+    table = np.asarray(route, dtype=np.float64)
+    return build_trajectory(table[:, :2], table[:, 2], tick_s, seed, noise, cache_dir)
+
+
+def trajectory_steps(vehicle_id: str, traj: Trajectory, send: Callable, adaptive: bool = True) -> Iterator[float]:
+    """Send every valid fix at its time, yielding the seconds to wait before each
+    (same protocol as scenario_sim.instance_steps). With adaptive=True a
+    next_report_s in send()'s reply skips the fixes in between."""
+    last_t, next_due = 0.0, -math.inf
+    for t, lat, lon, speed in traj.fixes():
+        if t < next_due:
+            continue
+        yield t - last_t
+        last_t = t
+        reply = send(vehicle_id, float(lat), float(lon), float(speed))
+        if adaptive and reply and reply.get("next_report_s"):
+            next_due = t + reply["next_report_s"] - 1e-6
+
+
+def waypoint_steps(vehicle_id: str, route: Sequence[Tuple[float, float, float]], interval: float,
+                   send: Callable, adaptive: bool = True) -> Iterator[float]:
+    """Drive a route table whose waypoints are `interval` seconds of driving apart,
+    yielding the seconds to wait after each fix (same protocol as
+    scenario_sim.instance_steps). A next_report_s in send()'s reply moves that
+    far along the route, interpolating between waypoints, so reporting more
+    often never makes the vehicle faster; the last waypoint is always sent."""
+    table = np.asarray(route, dtype=np.float64)
+    times = np.arange(len(table)) * interval
+    end = float(times[-1])
+    t = 0.0
+    while True:
+        lat, lon, speed = (float(np.interp(t, times, table[:, col])) for col in range(3))
+        reply = send(vehicle_id, lat, lon, speed)
+        if t >= end - 1e-9:
+            return
+        wait = reply.get("next_report_s") if adaptive and reply else None
+        step = min(wait or interval, end - t)
+        t += step
+        yield step
+
+
+def run_trajectory(vehicle_id: str, traj: Trajectory, send: Callable, adaptive: bool = True):
+    """trajectory_steps() in real time."""
+    for pause in trajectory_steps(vehicle_id, traj, send, adaptive):
+        time.sleep(pause)
+
+
+def add_noise_args(parser):
+    """Shared CLI options for simulators that use trajectories."""
+    parser.add_argument("--noise-m", type=float, default=0.0, help="GPS position noise sigma in metres (default 0)")
+    parser.add_argument("--dropout", type=float, default=0.0, help="Chance per fix that a GPS dropout starts (default 0)")
+    parser.add_argument("--multipath", type=float, default=0.0, help="Chance per fix that a multipath burst starts (default 0)")
+    parser.add_argument("--seed", type=int, default=0, help="Noise seed (default 0)")
+
+
+def noise_from_args(args) -> NoiseModel:
+    return NoiseModel(sigma_m=args.noise_m, dropout_rate=args.dropout, multipath_rate=args.multipath)
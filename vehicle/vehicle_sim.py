@@ -1,5 +1,5 @@
 import requests, time, argparse, random
-from results_logger import log_error
+from results_logger import log_error, configure as configure_results
 
 SERVER_URL = "http://127.0.0.1:5000/api/vehicle"
 DEFAULT_VEHICLE_ID = "AMB001"
@@ -19,17 +19,32 @@ def send_point(vehicle_id: str, lat: float, lon: float, speed: float):
     payload = {"id": vehicle_id, "lat": lat, "lon": lon, "speed": speed}
     try:
         r = requests.post(SERVER_URL, json=payload, timeout=5)
-        print("Sent:", payload, "| Server:", r.json())
+        reply = r.json()
+        print("Sent:", payload, "| Server:", reply)
+        return reply
     except Exception as e:
         print("Error sending:", e)
         log_error(str(e), "VEHICLE_SIMULATOR_COMMUNICATION")
+        return None
 
-def run_route_once(vehicle_id: str, interval: float, jitter: float):
-    for i, (lat, lon, speed) in enumerate(route, 1):
-        print(f"{vehicle_id} point {i}/{len(route)}: {lat:.6f}, {lon:.6f} @ {speed} km/h")
-        send_point(vehicle_id, lat, lon, speed)
-        sleep_s = max(0.1, interval + random.uniform(-jitter, jitter))
-        time.sleep(sleep_s)
+def run_route_once(vehicle_id: str, interval: float, jitter: float, adaptive: bool = True, traj=None):
+    if traj is not None:
+        # Precomputed trajectory: a fix every tick at the route speeds (see trajectory.py)
+        from vehicle.trajectory import run_trajectory
+        run_trajectory(vehicle_id, traj, send_point, adaptive)
+        return
+    from vehicle.trajectory import waypoint_steps
+
+    def send(vid, lat, lon, speed):
+        print(f"{vid}: {lat:.6f}, {lon:.6f} @ {speed:.0f} km/h")
+        return send_point(vid, lat, lon, speed)
+
+    # Waypoints are `interval` seconds of driving apart. The server's suggested
+    # interval (dense near the intersection) moves along the route by time
+    # rather than jumping a whole waypoint per report.
+    for step in waypoint_steps(vehicle_id, route, interval, send, adaptive):
+        time.sleep(max(0.1, step + random.uniform(-jitter, jitter)))
+    time.sleep(interval)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Vehicle simulator")
@@ -37,17 +52,24 @@ if __name__ == "__main__":
     parser.add_argument("--repeat", action="store_true", help="Repeat the route forever")
     parser.add_argument("--interval", type=float, default=3.0, help="Seconds between points (default 3.0)")
     parser.add_argument("--jitter", type=float, default=0.4, help="Random jitter added/subtracted to interval (default 0.4)")
+    parser.add_argument("--fixed-interval", action="store_true", help="Ignore the server's next_report_s and always use --interval")
+    parser.add_argument("--trajectory", action="store_true", help="Drive the route as a trajectory: a fix every --tick seconds at the route speeds")
+    parser.add_argument("--tick", type=float, default=1.0, help="Seconds between trajectory fixes (default 1.0)")
+    from vehicle.trajectory import add_noise_args, noise_from_args, route_trajectory
+    add_noise_args(parser)
     args = parser.parse_args()
+    traj = route_trajectory(route, args.tick, args.seed, noise_from_args(args)) if args.trajectory else None
+    configure_results(role="vehicle_sim")
 
     print("Vehicle simulator starting...")
     if args.repeat:
         print("Repeating route. Press Ctrl+C to stop.")
         try:
             while True:
-                run_route_once(args.vehicle_id, args.interval, args.jitter)
+                run_route_once(args.vehicle_id, args.interval, args.jitter, not args.fixed_interval, traj)
         except KeyboardInterrupt:
             print("Stopped.")
     else:
         print("Sending GPS points to server...")
-        run_route_once(args.vehicle_id, args.interval, args.jitter)
+        run_route_once(args.vehicle_id, args.interval, args.jitter, not args.fixed_interval, traj)
         print("Route complete. Check results/ folder for detailed logs.")
\ No newline at end of file
@@ -6,7 +6,7 @@ Run this script to see the latest results and summary
 
 import os
 import glob
-from results_logger import get_summary
+from results_logger import summarize_file
 
 def list_results_files():
     """List all available results files"""
@@ -40,7 +40,7 @@ def show_latest_results():
     
     # Show summary
     try:
-        summary = get_summary()
+        summary = summarize_file(latest_txt, latest_csv)
         print(summary)
     except Exception as e:
         print(f"Error getting summary: {e}")
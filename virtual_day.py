@@ -0,0 +1,198 @@
+"""
+Simulate a full day of intersection operation in virtual time.
+
+Wires the real pieces together on a VirtualLoop (see virtual_time.py):
+- vehicle trips come from vehicle.scenario_sim.instance_steps (ambulances on
+  the NS approach, firetrucks on the EW approach, Poisson arrivals),
+- every GPS fix goes through the server's decision rules (server.utils.assess_fix
+  with server.config) and becomes a hold / timed priority / release request;
+  the reply carries next_report_s, which the trip honours,
+- the controller is a SignalScheduler driving a SignalOutput (yellow/all-red
+  interlock) on a FakeBackend.
+
+No threads, no sleeps, no HTTP: the same seed always produces the same day.
+
+Usage:
+    python virtual_day.py --hours 24 --trips-per-hour 6 --seed 1
+"""
+
+import argparse
+import random
+import time
+from typing import Dict, Optional
+
+from server import config
+from server.utils import assess_fix, suggest_report_interval
+from traffic_controller.gpio_control import FakeBackend, SignalOutput
+from traffic_controller.scheduler import SignalScheduler
+from vehicle.scenario_sim import AMB_START, FIR_START, INTERSECTION, instance_steps
+from virtual_time import VirtualLoop
+
+# (ID prefix, approach start); trips run start -> intersection -> the mirrored point
+ROUTES = (("AMB", AMB_START), ("FIRT", FIR_START))
+
+
+def _mirror(point, center=INTERSECTION):
+    return (2 * center[0] - point[0], 2 * center[1] - point[1])
+
+
+class DaySimulation:
+    def __init__(self, hours: float = 24, trips_per_hour: float = 6, seed: int = 0,
+                 cycle_ns: float = 5, cycle_ew: float = 5, yellow_s: float = 3, all_red_s: float = 1,
+                 tick_s: float = 1.0, min_duration: int = 10, max_duration: int = 15,
+                 hold_until_pass: Optional[bool] = None, adaptive: bool = True):
+        self.hours = hours
+        self.trips_per_hour = trips_per_hour
+        self.tick_s = tick_s
+        self.durations = (min_duration, max_duration)
+        self.hold_until_pass = getattr(config, "HOLD_UNTIL_PASS", False) if hold_until_pass is None else hold_until_pass
+        self.adaptive = adaptive  # honour next_report_s like the real clients
+        self.rng = random.Random(seed)
+
+        self.loop = VirtualLoop()
+        clock = self.loop.clock
+        self.backend = FakeBackend(clock=clock.now)
+        self.output = SignalOutput(self.backend, yellow_s=yellow_s, all_red_s=all_red_s, sleep=clock.sleep)
+        self.scheduler = SignalScheduler(self._apply, cycle_ns, cycle_ew, clock=clock.now)
+
+        self.trips: Dict[str, dict] = {}
+        self.fixes = 0
+        self.transitions = 0
+        self.priority_phases = 0
+
+    # ------------------------------------------------------------------
+    # Controller side
+    # ------------------------------------------------------------------
+    def _apply(self, mode: str, direction: str):
+        self.output.set_phase(ns_green=direction == "NS", ew_green=direction == "EW")
+        self.transitions += 1
+        if mode == "priority":
+            self.priority_phases += 1
+
+    # ------------------------------------------------------------------
+    # Server side: same rules as /api/vehicle, without Blynk/speaker/HTTP
+    # ------------------------------------------------------------------
+    def _send(self, vid: str, lat: float, lon: float, speed: float):
+        self.fixes += 1
+        fix = assess_fix(lat, lon, speed, config.INTERSECTION, config.THRESHOLD_METERS, self.hold_until_pass,
+                         getattr(config, "RELEASE_THRESHOLD_METERS", config.THRESHOLD_METERS + 40))
+        trip = self.trips[vid]
+        action = fix["action"]
+        if action in ("hold", "priority"):
+            if trip["triggered_at"] is None:
+                trip["triggered_at"] = self.loop.now()
+                trip["direction"] = fix["direction"]
+            if action == "hold":
+                self.scheduler.hold(trip["direction"], vid, eta=fix["eta_s"])
+            else:
+                self.scheduler.priority(trip["direction"], config.DEFAULT_PRIORITY_SECONDS, vid, eta=fix["eta_s"])
+            if trip["green_at"] is None and self.scheduler.current() == ("priority", trip["direction"]):
+                trip["green_at"] = self.loop.now()
+        elif action == "release":
+            self.scheduler.release(vid)
+            trip["released"] = True
+        if trip["direction"] is not None and fix["distance_m"] < trip["closest_m"]:
+            # Signal state when the vehicle is nearest the stop line
+            trip["closest_m"] = fix["distance_m"]
+            trip["green_at_cross"] = self.scheduler.current()[1] == trip["direction"]
+        if self.adaptive:
+            return {"next_report_s": suggest_report_interval(
+                fix["distance_m"], speed, config.THRESHOLD_METERS, config.REPORT_INTERVAL_MIN_S,
+                config.REPORT_INTERVAL_MAX_S, config.REPORT_LEAD_FRACTION, config.REPORT_FLOOR_SPEED_KMH)}
+        return None
+
+    # ------------------------------------------------------------------
+    # Vehicle side
+    # ------------------------------------------------------------------
+    def _arrivals(self):
+        n = 0
+        while True:
+            yield self.rng.expovariate(self.trips_per_hour / 3600.0)
+            n += 1
+            prefix, start = ROUTES[self.rng.randrange(len(ROUTES))]
+            if self.rng.random() < 0.5:
+                start = _mirror(start)
+            vid = f"{prefix}{n:03d}"
+            self.trips[vid] = {"triggered_at": None, "green_at": None, "direction": None,
+                               "closest_m": float("inf"), "green_at_cross": None, "released": False}
+            # Approach time covers start -> intersection, the trip goes on as far again
+            duration = 2 * self.rng.randint(*self.durations)
+            self.loop.spawn(instance_steps(vid, start, _mirror(start), duration, self.tick_s,
+                                           send=self._send, rng=self.rng))
+
+    def run(self) -> dict:
+        t0 = time.perf_counter()
+        self.loop.watch(self.scheduler)
+        if self.trips_per_hour > 0:
+            self.loop.spawn(self._arrivals())
+        self.loop.run_until(self.hours * 3600.0)
+        wall_s = time.perf_counter() - t0
+        return self.summary(wall_s)
+
+    def conflicts(self) -> int:
+        """Number of pin writes after which both approaches showed green."""
+        levels, bad = {}, 0
+        for _, name, value in self.backend.writes:
+            levels[name] = value
+            if levels.get("NS_GREEN") and levels.get("EW_GREEN"):
+                bad += 1
+        return bad
+
+    def summary(self, wall_s: float) -> dict:
+        sim_s = self.loop.now()
+        triggered = [t for t in self.trips.values() if t["triggered_at"] is not None]
+        waits = [t["green_at"] - t["triggered_at"] for t in triggered if t["green_at"] is not None]
+        return {
+            "simulated_s": sim_s,
+            "wall_s": wall_s,
+            "sim_s_per_wall_s": sim_s / wall_s if wall_s > 0 else float("inf"),
+            "events": self.loop.events,
+            "fixes": self.fixes,
+            "transitions": self.transitions,
+            "priority_phases": self.priority_phases,
+            "pin_writes": self.backend.count(),
+            "conflicts": self.conflicts(),
+            "trips": len(self.trips),
+            "trips_triggered": len(triggered),
+            "crossed_on_green": sum(1 for t in triggered if t["green_at_cross"]),
+            "mean_wait_s": sum(waits) / len(waits) if waits else 0.0,
+            "max_wait_s": max(waits) if waits else 0.0,
+            "pending_requests": len(self.scheduler.pending()),
+        }
+
+
+def format_summary(s: dict) -> str:
+    return "\n".join([
+        f"Simulated {s['simulated_s'] / 3600:.1f} h in {s['wall_s']:.2f} s "
+        f"({s['sim_s_per_wall_s']:,.0f} simulated s per wall s, {s['events']:,} events)",
+        f"Signal: {s['transitions']:,} transitions ({s['priority_phases']} priority), "
+        f"{s['pin_writes']:,} pin writes, {s['conflicts']} conflicting greens",
+        f"Trips: {s['trips']} ({s['trips_triggered']} triggered, {s['crossed_on_green']} crossed on green), "
+        f"{s['fixes']:,} GPS fixes",
+        f"Time to priority green: mean {s['mean_wait_s']:.1f} s, max {s['max_wait_s']:.1f} s; "
+        f"{s['pending_requests']} requests still pending",
+    ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a day of intersection operation in virtual time")
+    parser.add_argument("--hours", type=float, default=24, help="Simulated hours (default 24)")
+    parser.add_argument("--trips-per-hour", type=float, default=6, help="Mean emergency trips per hour (default 6)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default 0)")
+    parser.add_argument("--cycle-ns", type=float, default=5, help="NS green seconds (default 5)")
+    parser.add_argument("--cycle-ew", type=float, default=5, help="EW green seconds (default 5)")
+    parser.add_argument("--yellow", type=float, default=3, help="Yellow seconds (default 3)")
+    parser.add_argument("--all-red", type=float, default=1, help="All-red seconds (default 1)")
+    parser.add_argument("--tick", type=float, default=1.0, help="Seconds between GPS fixes (default 1.0)")
+    parser.add_argument("--timed", action="store_true", help="Use timed priority instead of hold-until-pass")
+    parser.add_argument("--fixed-rate", action="store_true", help="Report every tick, ignoring next_report_s")
+    args = parser.parse_args()
+
+    sim = DaySimulation(args.hours, args.trips_per_hour, args.seed, args.cycle_ns, args.cycle_ew,
+                        args.yellow, args.all_red, args.tick, hold_until_pass=False if args.timed else None,
+                        adaptive=not args.fixed_rate)
+    print(format_summary(sim.run()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Virtual time for deterministic simulations.
+
+VirtualClock is a drop-in for time.monotonic / time.sleep: now() only moves
+when the simulation says so, and sleep() advances it instantly. VirtualLoop
+is a single-threaded discrete-event loop on top of it:
+
+- call_at()/call_later() schedule callbacks at virtual times,
+- spawn() runs a generator process; every value it yields is the number of
+  seconds to sleep before it resumes (see vehicle.scenario_sim.instance_steps),
+- watch() drives a SignalScheduler: after every event its sync() is called
+  and a wake-up is scheduled at the deadline it returns, replacing the
+  scheduler's worker thread.
+
+Events at the same time run in the order they were scheduled, so a run is
+fully reproducible.
+"""
+
+import heapq
+import itertools
+from typing import Callable, Generator, List, Optional
+
+
+class VirtualClock:
+    def __init__(self, start: float = 0.0):
+        self._now = float(start)
+
+    def now(self) -> float:
+        return self._now
+
+    __call__ = now
+
+    def advance_to(self, t: float):
+        """Move to ``t``; time never goes backwards."""
+        if t > self._now:
+            self._now = t
+
+    def sleep(self, seconds: float):
+        self._now += max(0.0, seconds)
+
+
+class VirtualLoop:
+    def __init__(self, clock: Optional[VirtualClock] = None):
+        self.clock = clock or VirtualClock()
+        self._queue: List[tuple] = []
+        self._seq = itertools.count()
+        self._watched: dict = {}  # scheduler -> deadline a wake-up is queued for
+        self.events = 0
+
+    def now(self) -> float:
+        return self.clock.now()
+
+    def call_at(self, t: float, fn: Callable, *args):
+        heapq.heappush(self._queue, (t, next(self._seq), fn, args))
+
+    def call_later(self, delay: float, fn: Callable, *args):
+        self.call_at(self.clock.now() + max(0.0, delay), fn, *args)
+
+    def spawn(self, process: Generator, delay: float = 0.0):
+        """Run a generator that yields sleep durations."""
+        self.call_later(delay, self._step, process)
+
+    def _step(self, process: Generator):
+        try:
+            pause = next(process)
+        except StopIteration:
+            return
+        self.call_later(pause or 0.0, self._step, process)
+
+    def watch(self, scheduler):
+        """Drive ``scheduler.sync()`` at its deadlines instead of a worker thread."""
+        self._watched[scheduler] = None
+        self._sync_watched()
+
+    def _sync_watched(self):
+        for scheduler, queued in self._watched.items():
+            deadline = scheduler.sync()
+            if deadline is not None and deadline != queued:
+                self._watched[scheduler] = deadline
+                # The wake-up itself does nothing: the sync after each event applies the change
+                self.call_at(deadline, _noop)
+
+    def run_until(self, t: float) -> int:
+        """Process every event due up to ``t``; return how many ran."""
+        ran = 0
+        while self._queue and self._queue[0][0] <= t:
+            when, _, fn, args = heapq.heappop(self._queue)
+            self.clock.advance_to(when)
+            fn(*args)
+            self._sync_watched()
+            ran += 1
+        self.clock.advance_to(t)
+        self.events += ran
+        return ran
+
+    def run_for(self, seconds: float) -> int:
+        return self.run_until(self.clock.now() + seconds)
+
+
+def _noop():
+    pass